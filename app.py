@@ -1,20 +1,30 @@
 import streamlit as st
-from src.agent import extract_query_info, risk_score_agent
+from src.agent import extract_query_info, risk_score_agent, warm_up
 
 from src.risk_engine import composite_risk_index
 from src.graph_tool import render_person_graph, render_high_risk_network
-from src.transactions import get_transactions
+from src.transactions import get_transactions_page, count_transactions, whatif_window, PAGE_SIZE
+from src.risk_engine import SIGMAS
 from src.simulator import save_and_predict
 from src.date import date_to_step_range
-from src.data_utils import search_prob_amount
+from src.data_utils import search_transaction
+from src.account_risk import account_risk_lookup
+from src.explain import explain_transaction, explanation_lines, warm_explainer
+from src.narrative import GROUP_BY, summarize_risk_list
+from src.tracing import request_trace, summary_rows, start_metrics_server
+from src.monitor import load_snapshot
 import json
+import os
 import time
+from contextlib import contextmanager
 from datetime import datetime
 
 
 # ---------- Basic Setup ----------
 st.set_page_config(page_title="🏦 AI Risk Center", layout="wide")
 st.title("🏦 AI Risk Center")
+warm_up()   # Watsonx client builds in the background; queries use the rule fallback until it is ready
+warm_explainer()   # history + model for the Risk Score explanations, built once per process before the first lookup
 
 # ---------- Helper ----------
 def _get(key, default=""):
@@ -23,12 +33,32 @@ def _get(key, default=""):
 def _set(key, value):
     st.session_state[key] = value
 
+def _account_risk_line(account) -> str:
+    """One-line propagated risk summary for an account (empty if the store is not built)."""
+    info = account_risk_lookup(account)
+    if info is None:
+        return ""
+    return f"{info['account']}: {info['risk_score']:.2f} (percentile {100 * info['percentile']:.1f})"
+
 def json_dumps_pretty(obj):
     try:
         return json.dumps(obj, ensure_ascii=False, indent=2)
     except Exception:
         return str(obj)
 
+# ---------- Tracing ----------
+# Every traced action in this rerun, shown in the performance panel at the bottom.
+run_traces = []
+
+@contextmanager
+def _request(name):
+    with request_trace(name) as trace:
+        yield trace
+    run_traces.append(trace)
+
+if os.getenv("PULSE4_METRICS_PORT"):
+    start_metrics_server(int(os.getenv("PULSE4_METRICS_PORT")))
+
 # ---------- Tips ----------
 st.markdown("""
 ### 💡 You can ask:
@@ -59,7 +89,8 @@ with col1:
     c1, c2 = st.columns([0.5, 0.5])
     with c1:
         if st.button("Analyze", key="btn_analyze"):
-            parsed = extract_query_info(query)
+            with _request("analyze"):
+                parsed = extract_query_info(query)
             st.json(parsed)
 
             # --- Extract values ---
@@ -108,20 +139,30 @@ with tabs[0]:
         if not tx_id:
             st.error("⚠️ Transaction ID cannot be empty.")
         else:
-            # 查询风险得分
-            prob,amount=search_prob_amount(tx_id)
-            print(f"Query result: prob={prob}, amount={amount}")
-            result = composite_risk_index(
-                prob=[prob],  # 默认欺诈概率，或根据实际场景传入
-                amount=[amount],  # 默认交易金额，或根据实际场景传入
-                transaction_id=tx_id,
-                verbose=True
-            )
-            
-            # 输出结果
-            st.success("✅ Risk score calculation completed")
-            ai_text = risk_score_agent(result)
-            st.write(ai_text) 
+            with _request("risk_score"):
+                # 查询风险得分
+                row = search_transaction(tx_id) or {}
+                prob, amount = row.get("fraud_prob_pred"), row.get("amount")
+                print(f"Query result: prob={prob}, amount={amount}")
+                result = composite_risk_index(
+                    prob=[prob],  # 默认欺诈概率，或根据实际场景传入
+                    amount=[amount],  # 默认交易金额，或根据实际场景传入
+                    transaction_id=tx_id,
+                    verbose=True
+                )
+                
+                # 输出结果
+                st.success("✅ Risk score calculation completed")
+                # 账户级传播风险（预计算，O(1) 查询）
+                lines = [l for l in (_account_risk_line(row.get(k)) for k in ("orig_id", "dest_id") if row.get(k) is not None) if l]
+                if lines:
+                    st.caption("🕸 Account propagated risk · " + " · ".join(lines))
+                # 预计算的归因解释（梯度×输入、邻居影响、分位数），按交易缓存
+                expl = explain_transaction(tx_id)
+                if expl is not None:
+                    st.markdown("**🔬 Why the model flags it**\n" + "\n".join(f"- {l}" for l in explanation_lines(expl)))
+                ai_text = risk_score_agent(result, expl)
+                st.write(ai_text) 
 
 # === Tab 2: Risk Graph ===
 with tabs[1]:
@@ -168,12 +209,16 @@ with tabs[1]:
     end_date_time_auto = end_datetime.strftime("%Y-%m-%d %H:%M:%S")
 
     if st.button("Generate Graph", key="btn_graph"):
-        # 判断是否使用日期范围
-        step_range = date_to_step_range(start_date_time_auto, end_date_time_auto)
-        
-        # 生成图形的 HTML 内容
-        html = render_person_graph(name or "241080", role=role, step_range=step_range)
-        
+        with _request("risk_graph"):
+            # 判断是否使用日期范围
+            step_range = date_to_step_range(start_date_time_auto, end_date_time_auto)
+            
+            # 生成图形的 HTML 内容
+            html = render_person_graph(name or "241080", role=role, step_range=step_range)
+            risk_line = _account_risk_line(name or "241080")
+
+        if risk_line:
+            st.caption(f"🕸 Account propagated risk · {risk_line}")
         # 使用 Streamlit 组件显示生成的 HTML 文件
         st.components.v1.html(html, height=600, scrolling=True)
 
@@ -229,18 +274,65 @@ with tabs[1]:
         # 获取对应的步数范围
         start_step2, end_step2 = date_to_step_range(start_date_time_auto2, end_date_time_auto2)
 
-        df = get_transactions(
-            client_name=cname,
-            min_prob=min_prob,
-            start_step=start_step2,
-            end_step=end_step2,
-
-        )
+        # 只加载当前页：按 step 分区预排序的索引做归并，月级窗口也不需要整表排序
+        query = dict(client_name=cname, min_prob=min_prob, start_step=start_step2, end_step=end_step2)
+        with _request("risk_list"):
+            total = count_transactions(**query)
+            n_pages = max(1, -(-total // PAGE_SIZE))
+            # 过滤条件收窄后，会话中保存的页码可能超出新的页数；渲染前先夹到范围内
+            if st.session_state.get("risk_page", 1) > n_pages:
+                st.session_state["risk_page"] = n_pages
+            page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, step=1, key="risk_page")
+            df = get_transactions_page(**query, page=int(page) - 1, page_size=PAGE_SIZE)
+        st.caption(f"{total:,} matching transactions · showing {len(df)} on page {int(page)}")
         st.dataframe(df, use_container_width=True, key="df_list")
 
+        # 阈值 what-if：窗口内概率 / RI 预排序 + 前缀和，拖动滑块或改 σ 只做二分查找
+        with st.expander("📈 Threshold what-if (all accounts in the window)"):
+            with _request("threshold_whatif"):
+                wi = whatif_window(start_step2, end_step2)
+            metric = st.radio("Score", ["prob", "ri"], horizontal=True, key="whatif_metric",
+                              format_func=lambda m: "Fraud probability" if m == "prob" else "Composite RI")
+            sigma = SIGMAS
+            if metric == "ri":
+                cS1, cS2, cS3 = st.columns(3)
+                sigma = (cS1.number_input("σ1 · probability", 0.0, 2.0, SIGMAS[0], 0.05, key="sigma1"),
+                         cS2.number_input("σ2 · amount", 0.0, 2.0, SIGMAS[1], 0.05, key="sigma2"),
+                         cS3.number_input("σ3 · logit", 0.0, 2.0, SIGMAS[2], 0.05, key="sigma3"))
+                threshold = st.slider("RI threshold", -2.0, 3.0, 0.9, 0.05, key="ri_threshold")
+            else:
+                threshold = min_prob
+            hit = wi.flagged(threshold, metric, sigma)
+            cM1, cM2, cM3 = st.columns(3)
+            cM1.metric("Flagged transactions", f"{hit['count']:,}", f"{100 * hit['share']:.2f}% of {wi.total:,}", delta_color="off")
+            cM2.metric("Flagged amount", f"{hit['amount']:,.0f}", f"{100 * hit['amount_share']:.2f}% of volume", delta_color="off")
+            if metric == "ri":
+                cM3.metric("High Risk (RI ≥ 0.9)", f"{wi.risk_levels(sigma)['High Risk']:,}")
+            from src.visualizer import threshold_curve
+            st.plotly_chart(threshold_curve(wi.curve(metric=metric, sigma=sigma), threshold,
+                                            "P(fraud)" if metric == "prob" else "RI"), use_container_width=True)
+
+        # 本页批量叙述：按账户 / 欺诈类型分组，限并发 + token 预算，叙述按 prompt 缓存
+        colN1, colN2 = st.columns(2)
+        with colN1:
+            narrate_by = st.selectbox("Summarize by", GROUP_BY, key="narrate_by")
+        with colN2:
+            narrate_explain = st.checkbox("Include model drivers", value=False, key="narrate_explain")
+        if st.button("Summarize This Page", key="btn_narrate"):
+            with _request("risk_list_summary"):
+                summary = summarize_risk_list(df, by=narrate_by, explain=narrate_explain)
+            s = summary["stats"]
+            st.caption(f"📝 {s['groups']} groups · {s['calls']} LLM calls · {s['cached']} cached · "
+                       f"{s['over_budget']} over the token budget · {s['seconds']:.1f}s")
+            for g in summary["groups"]:
+                with st.expander(f"{g['title']} · max P {g['max_prob']:.3f}", expanded=bool(g["text"])):
+                    if g["text"]:
+                        st.write(g["text"])
+                    st.markdown("\n".join(f"- {line}" for line in g["lines"]))
+
         if st.button("Build High-Risk Network", key="btn_highrisk"):
-            html_name = f"risk_network_{int(start_step2)}to{int(end_step2)}steps.html"
-            html = render_high_risk_network(df, output_html=html_name, risk_threshold=min_prob)
+            with _request("high_risk_network"):
+                html = render_high_risk_network(risk_threshold=min_prob, step_range=(start_step2, end_step2), client_name=cname)
             st.components.v1.html(html, height=650, scrolling=True)
 
     # === Tab 4: Simulated Real-time Data ===
@@ -266,14 +358,59 @@ with tabs[1]:
         colX, colY = st.columns([0.5, 0.5])
         with colX:
             if st.button("Save & Predict", key="btn_sim_save"):
-                result = save_and_predict(sim_text)
-                
-                    
+                with _request("simulate"):
+                    result = save_and_predict(sim_text)
+                if "error" in result:
+                    st.error(result["error"])
+                else:
+                    st.write("Prediction Status:")
+                    st.json(result)
         with colY:
             if st.button("Clear input", key="btn_clear_sim"):
                 st.session_state.pop("sim_json", None)
                 st.rerun()
 
+# ---------- Performance panel ----------
+with st.expander("⏱ Performance", expanded=False):
+    if not run_traces:
+        st.caption("No traced request in this run.")
+    for trace in run_traces:
+        st.markdown(f"**{trace.root.name}** — {trace.duration_ms:.1f} ms")
+        st.code(trace.format_tree(), language="text")
+        if trace.profile:
+            st.caption("Sampled profile (collapsed stacks, top 20)")
+            st.code("\n".join(trace.collapsed_profile().splitlines()[:20]), language="text")
+    rows = summary_rows()
+    if rows:
+        st.caption("All spans since process start")
+        st.dataframe(rows, use_container_width=True)
+
+# ---------- Model monitor panel ----------
+with st.expander("📡 Model monitor", expanded=False):
+    snap = load_snapshot()
+    if snap is None:
+        st.caption("No drift check yet: the scoring service writes metrics/monitor.json on its schedule (--monitor-interval).")
+    else:
+        st.caption(f"Last check {snap['time']} · reference: {snap['reference']}")
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Transactions in window", f"{snap['window_transactions']:,}")
+        m2.metric("Max PSI", "-" if snap["max_psi"] is None else f"{snap['max_psi']:.3f}")
+        m3.metric("Drifted features", len(snap["drifted"]))
+        if snap.get("note"):
+            st.info(snap["note"])
+        if snap["features"]:
+            st.dataframe(snap["features"], use_container_width=True)
+        hist = snap["prob_histogram"]
+        if hist["reference"] is not None:
+            import pandas as pd
+            lows = [0.0] + hist["edges"]
+            st.caption("fraud_prob_pred: window vs reference (share per bin)")
+            st.bar_chart(pd.DataFrame({"window": hist["window"], "reference": hist["reference"]},
+                                      index=[f"{lo:.2f}" for lo in lows]))
+        if snap["latency"]:
+            st.caption("Scoring latency per stage (last 2,048 batches)")
+            st.dataframe([{"stage": k, **v} for k, v in snap["latency"].items()], use_container_width=True)
+
 # ---------- Auto-switch tabs ----------
 intent = _get("intent","")
 if intent == "risk_graph":
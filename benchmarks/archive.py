@@ -0,0 +1,114 @@
+"""
+Disk footprint and cold reads: CSV vs the Parquet archive (src/archive.py).
+
+The synthetic prediction and raw-feature files are archived into a scratch
+root; every read is made cold first (the files' pages are dropped from the OS
+cache with posix_fadvise), then timed:
+
+- csv:     `pd.read_csv` of the whole file, filtered to the window (what a
+           history query costs without the archive);
+- archive: `read_history` for the same window, with the step / probability
+           filters pushed down.
+
+    python -m benchmarks.archive --rows 1000000 --out benchmarks/results/archive.json
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate_dataset  # noqa: E402
+
+DEFAULT_WORKDIR = os.path.join(ROOT, "benchmarks", ".workdir")
+WINDOWS = {"1 day": (240, 263, None), "7 days, P >= 0.9": (240, 407, 0.9), "30 days": (0, 719, None)}
+
+
+def _drop_cache(paths):
+    for p in paths:
+        fd = os.open(p, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def _cold(paths, fn, repeat: int):
+    best = None
+    for _ in range(repeat):
+        _drop_cache(paths)
+        t0 = time.perf_counter()
+        out = fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV vs Parquet archive: size and cold reads")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    parser.add_argument("--out", default=None, help="JSON output path")
+    args = parser.parse_args()
+
+    import pandas as pd
+    from src.archive import archive_closed_days, dataset_name, read_history
+
+    paths = generate_dataset(os.path.join(args.workdir, f"rows_{args.rows}"), args.rows)
+    root = os.path.join(args.workdir, f"archive_{args.rows}")
+    shutil.rmtree(root, ignore_errors=True)
+
+    results = []
+    for kind in ("predictions", "raw_features"):
+        src = paths[kind]
+        t0 = time.perf_counter()
+        entry = archive_closed_days(src, root, include_open=True, verbose=False)
+        build = time.perf_counter() - t0
+        files = sorted(glob.glob(os.path.join(root, dataset_name(src), "*.parquet")))
+        csv_mb = os.path.getsize(src) / 1024 ** 2
+        arc_mb = sum(os.path.getsize(f) for f in files) / 1024 ** 2
+        results.append({"dataset": kind, "rows": sum(d["rows"] for d in entry["days"].values()),
+                        "csv_mb": round(csv_mb, 1), "archive_mb": round(arc_mb, 1),
+                        "ratio": round(csv_mb / arc_mb, 2), "archive_seconds": round(build, 2), "reads": []})
+        for label, (lo, hi, p) in WINDOWS.items():
+            def csv_read():
+                df = pd.read_csv(src)
+                mask = (df["step"] >= lo) & (df["step"] <= hi)
+                if p is not None:
+                    mask &= df["fraud_prob_pred"] >= p
+                return df[mask]
+
+            if p is not None and kind == "raw_features":
+                continue                      # the raw feature set carries no predictions
+            a, t_csv = _cold([src], csv_read, args.repeat)
+            b, t_arc = _cold(files, lambda: read_history(dataset_name(src), lo, hi, p, root=root), args.repeat)
+            assert len(a) == len(b), (label, len(a), len(b))
+            results[-1]["reads"].append({"window": label, "rows": len(b), "csv_s": round(t_csv, 3),
+                                         "archive_s": round(t_arc, 3), "speedup": round(t_csv / t_arc, 1)})
+
+    for r in results:
+        print(f"📊 {r['dataset']}: {r['rows']:,} rows, CSV {r['csv_mb']:,.1f} MB -> archive {r['archive_mb']:,.1f} MB "
+              f"({r['ratio']}x smaller, archived in {r['archive_seconds']:.2f}s)")
+        for q in r["reads"]:
+            print(f"   cold read {q['window']:<18} {q['rows']:>9,} rows  csv {q['csv_s']:>7.3f}s  "
+                  f"archive {q['archive_s']:>7.3f}s  x{q['speedup']}")
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(timespec="seconds"), "rows": args.rows,
+                       "results": results}, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare two benchmark JSON files case by case.
+
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 1.1]
+
+Exits non-zero when any case got slower than `threshold` x the baseline.
+"""
+import argparse
+import json
+import sys
+
+
+def _index(report: dict) -> dict:
+    return {(r["case"], r["rows"]): r for r in report["results"] if "error" not in r}
+
+
+def compare(baseline: dict, candidate: dict, threshold: float = 1.1) -> list:
+    base, cand = _index(baseline), _index(candidate)
+    rows = []
+    for key in sorted(set(base) & set(cand), key=lambda k: (k[1], k[0])):
+        b, c = base[key], cand[key]
+        rows.append({
+            "case": key[0],
+            "rows": key[1],
+            "base_s": b["wall_s"],
+            "cand_s": c["wall_s"],
+            "ratio": c["wall_s"] / b["wall_s"] if b["wall_s"] else float("inf"),
+            "base_rss_mb": b["peak_rss_mb"],
+            "cand_rss_mb": c["peak_rss_mb"],
+            "regressed": b["wall_s"] > 0 and c["wall_s"] / b["wall_s"] > threshold,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.1, help="slowdown ratio counted as a regression")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows = compare(baseline, candidate, args.threshold)
+    print(f"{'case':<26} {'rows':>10} {'base s':>10} {'cand s':>10} {'ratio':>7} {'base MB':>9} {'cand MB':>9}")
+    for r in rows:
+        flag = "  ⚠️" if r["regressed"] else ""
+        print(f"{r['case']:<26} {r['rows']:>10,} {r['base_s']:>10.4f} {r['cand_s']:>10.4f} {r['ratio']:>7.2f} "
+              f"{r['base_rss_mb']:>9,.0f} {r['cand_rss_mb']:>9,.0f}{flag}")
+    sys.exit(1 if any(r["regressed"] for r in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Import-time benchmark for the dashboard's cold start.
+
+Each target is imported in a fresh interpreter (`python -X importtime`), so
+nothing is cached between runs.  Reported per target: median wall time of the
+import (interpreter start-up subtracted), the heaviest top-level packages by
+cumulative import time, and whether the import failed (e.g. a missing
+optional client library).
+
+    python -m benchmarks.import_time --out benchmarks/results/imports.json
+    python -m benchmarks.import_time --targets src.agent,src.graph_tool+src.transactions --repeat 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Everything app.py imports from src, plus the full set in one interpreter.
+APP_MODULES = [
+    "src.agent", "src.risk_engine", "src.graph_tool", "src.transactions", "src.simulator",
+    "src.date", "src.data_utils", "src.account_risk", "src.explain", "src.narrative", "src.monitor", "src.tracing",
+]
+DEFAULT_TARGETS = ["app_modules"] + APP_MODULES
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _statement(target: str) -> str:
+    modules = APP_MODULES if target == "app_modules" else target.split("+")
+    return "; ".join(f"import {m}" for m in modules)
+
+
+def _run(code: str, env: dict):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    lines = [(int(m.group(2)), len(m.group(3)), m.group(4).split(".")[0]) for m in LINE.finditer(proc.stderr)]
+    total, top, stack = 0, {}, []
+    # importtime prints children before their parent; walking backwards gives each line's parent.
+    for cumulative, indent, pkg in reversed(lines):
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        parent = stack[-1][1] if stack else None
+        stack.append((indent, pkg))
+        if indent == 1:
+            total += cumulative
+        if pkg != parent and pkg != "src":                 # time spent entering a third-party package
+            top[pkg] = top.get(pkg, 0) + cumulative
+    error = None
+    if proc.returncode != 0:
+        error = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+    return total / 1e6, top, error
+
+
+def measure(target: str, repeat: int = 3, env: dict = None) -> dict:
+    env = dict(os.environ if env is None else env)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    runs = [_run(_statement(target), env) for _ in range(repeat)]
+    seconds = [r[0] for r in runs]
+    top = runs[-1][1]
+    heaviest = sorted(top.items(), key=lambda kv: -kv[1])[:8]
+    return {
+        "target": target,
+        "import_s": round(statistics.median(seconds), 4),
+        "import_min_s": round(min(seconds), 4),
+        "heaviest": {k: round(v / 1e6, 4) for k, v in heaviest},
+        "error": runs[-1][2],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import times of the dashboard modules")
+    parser.add_argument("--targets", default=",".join(DEFAULT_TARGETS),
+                        help="comma-separated modules; a+b imports both in one interpreter, app_modules is app.py's set")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=None, help="JSON output path")
+    args = parser.parse_args()
+
+    results = []
+    for target in [t.strip() for t in args.targets.split(",") if t.strip()]:
+        res = measure(target, args.repeat)
+        results.append(res)
+        top = ", ".join(f"{k} {v:.2f}s" for k, v in list(res["heaviest"].items())[:4])
+        status = f"⚠️ {res['error']}" if res["error"] else top
+        print(f"   {target:<18} {res['import_s']:>8.3f}s   {status}")
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(timespec="seconds"),
+                       "python": sys.version.split()[0], "repeat": args.repeat, "results": results}, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
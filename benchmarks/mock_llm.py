@@ -0,0 +1,45 @@
+"""
+Local stand-in for the Watsonx Model, for offline benchmarks.
+
+    from benchmarks.mock_llm import MockModel
+    from src.agent import set_model
+    set_model(MockModel(time_scale=0.02))
+"""
+import threading
+import time
+
+from src.agent import estimate_tokens
+
+
+class MockModel:
+    """
+    Same `generate` response shape as the Watsonx Model.
+    A call costs `latency` + prompt tokens / `prefill_tps` + new tokens / `decode_tps`
+    seconds (times `time_scale`), where new tokens = min(max_new_tokens,
+    `natural_tokens`), and at most `concurrency` calls run at once, like the
+    service's per-project limit.  Replies are built from the prompt's "- " fact lines.
+    """
+
+    def __init__(self, latency: float = 0.4, prefill_tps: float = 2000.0, decode_tps: float = 40.0,
+                 natural_tokens: int = 700, concurrency: int = 8, time_scale: float = 1.0):
+        self.latency = latency
+        self.prefill_tps = prefill_tps
+        self.decode_tps = decode_tps
+        self.natural_tokens = natural_tokens
+        self.time_scale = time_scale
+        self.calls = 0
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, params: dict = None) -> dict:
+        params = params or {}
+        n_in = estimate_tokens(prompt)
+        n_out = min(int(params.get("max_new_tokens", 250)), self.natural_tokens)
+        with self._slots:
+            time.sleep(self.time_scale * (self.latency + n_in / self.prefill_tps + n_out / self.decode_tps))
+        with self._lock:
+            self.calls += 1
+        facts = [l.strip()[2:] for l in prompt.splitlines() if l.strip().startswith("- ")]
+        text = ("Mock summary: " + "; ".join(facts))[:4 * n_out] if facts else "Mock report."
+        return {"results": [{"generated_text": text, "generated_token_count": n_out,
+                             "input_token_count": n_in, "stop_reason": "max_tokens"}]}
@@ -0,0 +1,102 @@
+"""
+Sequential risk reports vs batched group narratives (src/narrative.py), offline.
+
+Both paths call the same local MockModel (benchmarks/mock_llm.py), which charges
+Watsonx-like latency: a fixed round trip, prefill per prompt token, decode
+per new token, and at most 8 calls at once.  `--time-scale` shrinks every
+sleep so the run stays short; reported times scale the LLM part back up
+(local work is counted as measured).
+
+- sequential: `risk_score_agent` for each row of the list, one call at a time
+  (max_new_tokens=5000, i.e. the model's natural length);
+- batched: `summarize_risk_list` by account and by fraud type, first with an
+  empty cache, then again (every narrative served from the cache).
+
+    python -m benchmarks.narrative --rows 10000 --top 40 --out benchmarks/results/narrative.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate_dataset  # noqa: E402
+
+DEFAULT_WORKDIR = os.path.join(ROOT, "benchmarks", ".workdir")
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential risk reports vs batched group narratives")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--top", type=int, default=40, help="rows of the risk list to narrate")
+    parser.add_argument("--min-prob", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--time-scale", type=float, default=0.02, help="multiplier on every mock sleep")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    parser.add_argument("--out", default=None, help="JSON output path")
+    args = parser.parse_args()
+
+    from benchmarks.mock_llm import MockModel
+    from src.agent import risk_score_agent, set_model
+    from src.narrative import clear_cache, summarize_risk_list
+    from src.risk_engine import composite_risk_index
+    from src.risk_index import get_risk_index
+
+    paths = generate_dataset(os.path.join(args.workdir, f"rows_{args.rows}"), args.rows)
+    df = get_risk_index(paths["predictions"]).top(args.top, min_prob=args.min_prob)
+    mock = MockModel(time_scale=args.time_scale)
+    set_model(mock)
+    composite_risk_index._A0_cache = float(df["amount"].quantile(0.95))   # same A₀ for both paths, no CSV read
+
+    def sequential():
+        for row in df.itertuples(index=False):
+            result = composite_risk_index([row.fraud_prob_pred], [row.amount], transaction_id=row.transaction_id,
+                                          verbose=False)
+            risk_score_agent(result)
+
+    results = []
+    calls = mock.calls
+    _, seconds = _timed(sequential)
+    seconds /= args.time_scale                  # all but microseconds of it is the mock
+    results.append({"path": "sequential", "calls": mock.calls - calls, "seconds": round(seconds, 2)})
+    for by in ("account", "fraud_type"):
+        clear_cache()
+        for label in ("cold", "cached"):
+            out, seconds = _timed(lambda: summarize_risk_list(df, by=by, model=mock, concurrency=args.concurrency))
+            s = out["stats"]
+            seconds += s["llm_seconds"] * (1 / args.time_scale - 1)
+            results.append({"path": f"batched_{by}_{label}", "calls": s["calls"], "groups": s["groups"],
+                            "cached": s["cached"], "over_budget": s["over_budget"], "tokens": s["tokens"],
+                            "llm_seconds": round(s["llm_seconds"] / args.time_scale, 2), "seconds": round(seconds, 2)})
+
+    base = results[0]["seconds"]
+    print(f"📊 {len(df)} transactions (P >= {args.min_prob}), mock latency x{args.time_scale} (times scaled back)")
+    for r in results:
+        r["speedup"] = round(base / r["seconds"], 1) if r["seconds"] >= 0.01 else None
+        extra = f"  groups {r['groups']:>3}  cached {r['cached']:>3}  budget-skipped {r['over_budget']:>3}" if "groups" in r else ""
+        print(f"   {r['path']:<26} calls {r['calls']:>3}  {r['seconds']:>8.2f}s  {'x' + str(r['speedup']) if r['speedup'] else '-':>7}{extra}")
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(timespec="seconds"), "rows": args.rows,
+                       "top": len(df), "time_scale": args.time_scale, "results": results}, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
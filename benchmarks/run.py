@@ -0,0 +1,364 @@
+"""
+Benchmark runner for the dashboard / inference hot paths.
+
+Each case runs in a fresh process against synthetic data, so its peak RSS is
+its own.  Setup (data loading, model construction) is excluded from the wall
+time; throughput is rows (or calls) processed per second of wall time.
+
+    python -m benchmarks.run --rows 10000,1000000 --out benchmarks/results/main.json
+    python -m benchmarks.compare benchmarks/results/main.json benchmarks/results/branch.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate_dataset  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_WORKDIR = os.path.join(ROOT, "benchmarks", ".workdir")
+
+
+def _point_modules_at(ctx: dict):
+    """Redirect the src modules' prediction file constants to the synthetic file."""
+    from src import data_utils, graph_tool, risk_engine, transactions
+    for mod in (data_utils, graph_tool, risk_engine, transactions):
+        mod.PREDICTIONS_PATH = ctx["predictions"]
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+
+# ==================== Cases ====================
+# Each case does its setup and returns (fn, items): `fn()` is timed and
+# `items` is what throughput is reported in.
+
+def case_get_transactions(ctx):
+    from src.transactions import get_transactions
+    return (lambda: get_transactions(client_name="", min_prob=0.5, start_step=0, end_step=743)), ctx["rows"]
+
+
+def case_risk_list_page(ctx):
+    from src.transactions import count_transactions, get_transactions_page
+    get_transactions_page(min_prob=0.0, start_step=0, end_step=743)        # build the index outside the timing
+
+    def run():
+        count_transactions(min_prob=0.0, start_step=0, end_step=743)
+        return [get_transactions_page(min_prob=0.0, start_step=0, end_step=743, page=p, page_size=200) for p in range(5)]
+    return run, 1000
+
+
+def case_search_prob_amount(ctx):
+    from src.data_utils import search_prob_amount
+    ids = pd.read_csv(ctx["predictions"], usecols=["transaction_id"], nrows=10_000)["transaction_id"]
+    picks = ids.sample(5, random_state=0).astype(str).tolist()
+    return (lambda: [search_prob_amount(t) for t in picks]), len(picks)
+
+
+def case_render_person_graph(ctx):
+    from src.graph_render import FRAGMENTS
+    from src.graph_tool import render_person_graph
+
+    def run():
+        FRAGMENTS.clear()                       # time the render, not the page cache
+        return render_person_graph("1", role="both", step_range=None)
+    return run, ctx["rows"]
+
+
+def _high_risk_df(ctx):
+    from src.transactions import get_transactions
+    return get_transactions(min_prob=0.5, start_step=0, end_step=ctx["window_steps"] - 1)
+
+
+def case_render_high_risk_network(ctx):
+    from src.graph_render import FRAGMENTS
+    from src.graph_tool import render_high_risk_network
+    df = _high_risk_df(ctx)
+
+    def run():
+        FRAGMENTS.clear()                       # time the render, not the page cache
+        return render_high_risk_network(df, risk_threshold=0.5)
+    return run, len(df)
+
+
+def case_classify_fraud_patterns(ctx):
+    import networkx as nx
+    from src.graph_tool import classify_fraud_patterns
+    df = _high_risk_df(ctx)
+    G = nx.Graph()
+    for o, d, p in zip(df["orig_id"].astype(str), df["dest_id"].astype(str), df["fraud_prob_pred"].astype(float)):
+        G.add_edge(o, d, fraud_prob_pred=p, fraud=p > 0.5)
+    return (lambda: classify_fraud_patterns(G, risk_threshold=0.5)), G.number_of_edges()
+
+
+def case_classify_compact(ctx):
+    from src.compact_graph import CompactGraph
+    from src.graph_tool import classify_fraud_patterns
+    from src.temporal_graph import _id_strings
+    df = _high_risk_df(ctx)
+    G = CompactGraph.from_arrays(_id_strings(df["orig_id"]), _id_strings(df["dest_id"]),
+                                 df["fraud_prob_pred"].to_numpy(), df["amount"].to_numpy(), df["transaction_id"].to_numpy())
+    return (lambda: classify_fraud_patterns(G, risk_threshold=0.5)), G.number_of_edges()
+
+
+def case_update_features(ctx):
+    from src.gnn_drive_inference import load_local_csv, update_features
+    history = load_local_csv(ctx["raw_features"])
+    sample = history.sample(min(20, len(history)), random_state=0)
+    records = [{
+        "step": int(r.step), "orig_id": str(r.orig_id), "dest_id": str(r.dest_id), "amount": float(r.amount),
+        "orig_old_balance": float(r.oldbalanceOrg), "orig_new_balance": float(r.newbalanceOrig),
+        "dest_old_balance": float(r.oldbalanceDest), "dest_new_balance": float(r.newbalanceDest),
+    } for r in sample.itertuples()]
+    payload = json.dumps(records)
+    return (lambda: update_features(payload, history)), len(records)
+
+
+def _burst_split(ctx, n: int):
+    """History sorted by step, and its last `n` rows replayed as incoming transactions."""
+    from src.gnn_drive_inference import load_local_csv
+    history = load_local_csv(ctx["raw_features"]).sort_values("step", kind="stable").reset_index(drop=True)
+    return history.iloc[:-n], history.iloc[-n:]
+
+
+def case_burst_index(ctx):
+    import pickle
+    from src.burst_index import BurstIndex
+    history, incoming = _burst_split(ctx, 2000)
+    snapshot = pickle.dumps(BurstIndex().warm_start(history))      # warm-up outside the timing
+    return (lambda: pickle.loads(snapshot).annotate(incoming)), len(incoming)
+
+
+def case_burst_history_scan(ctx):
+    """The same features computed the update_features way: boolean masks over the history frame."""
+    history, incoming = _burst_split(ctx, 20)
+    orig_ids, dest_ids = history["orig_id"].astype(str), history["dest_id"].astype(str)
+
+    def scan(rec):
+        step, orig, dest = rec.step, str(rec.orig_id), str(rec.dest_id)
+        orig_hist = history[orig_ids == orig]
+        pair = orig_hist[(dest_ids[orig_hist.index] == dest) & (orig_hist["amount"].round() == round(rec.amount))
+                         & (orig_hist["step"] > step - 24)]
+        recent = orig_hist[orig_hist["step"] > step - 3]
+        return len(pair), len(recent), recent["dest_id"].astype(str).nunique(), int((orig_hist["step"] == step).sum())
+
+    return (lambda: [scan(r) for r in incoming.itertuples()]), len(incoming)
+
+
+def case_composite_risk_index(ctx):
+    from src.risk_engine import composite_risk_index
+    df = pd.read_csv(ctx["predictions"], usecols=["fraud_prob_pred", "amount"])
+    prob, amount = df["fraud_prob_pred"].to_numpy(), df["amount"].to_numpy()
+    if hasattr(composite_risk_index, "_A0_cache"):
+        del composite_risk_index._A0_cache      # time the cold path including the A₀ scan
+
+    return (lambda: composite_risk_index(prob=prob, amount=amount, verbose=False)), len(prob)
+
+
+def _inference_model(node_dim: int, edge_dim: int, node_sample, edge_sample):
+    """The shipped checkpoint when it loads, otherwise random weights with fitted scalers (timing only)."""
+    from src.gnn_core import EdgeSAGE, load_artifacts, load_model
+    try:
+        artifacts = load_artifacts()
+        return artifacts, load_model(artifacts), "checkpoint"
+    except Exception:
+        from sklearn.preprocessing import StandardScaler
+        artifacts = {
+            "node_scaler": StandardScaler().fit(node_sample),
+            "edge_scaler": StandardScaler().fit(edge_sample),
+        }
+        model = EdgeSAGE(node_dim, edge_dim, 64)
+        model.eval()
+        return artifacts, model, "random"
+
+
+def case_edgesage_inference(ctx):
+    from src.gnn_core import NODE_FEATURE_NAMES, EDGE_FEATURE_NAMES, build_local_graph, predict_proba
+    from src.gnn_drive_inference import load_local_csv
+    df = load_local_csv(ctx["raw_features"])
+    rng = np.random.default_rng(0)
+    artifacts, model, weights = _inference_model(
+        len(NODE_FEATURE_NAMES), len(EDGE_FEATURE_NAMES),
+        rng.random((256, len(NODE_FEATURE_NAMES))), rng.random((256, len(EDGE_FEATURE_NAMES))),
+    )
+    ctx["notes"] = {"weights": weights}
+
+    def run():
+        x, edge_index, edge_attr, _ = build_local_graph(df, artifacts["node_scaler"], artifacts["edge_scaler"])
+        return predict_proba(model, x, edge_index, edge_attr)
+
+    return run, len(df)
+
+
+def case_explain_batch(ctx):
+    from src.dataset_loader import load_dataset
+    from src.explain import Explainer
+    from src.gnn_core import NODE_FEATURE_NAMES, EDGE_FEATURE_NAMES
+    df = load_dataset(ctx["raw_features"])
+    rng = np.random.default_rng(0)
+    artifacts, model, weights = _inference_model(
+        len(NODE_FEATURE_NAMES), len(EDGE_FEATURE_NAMES),
+        rng.random((256, len(NODE_FEATURE_NAMES))), rng.random((256, len(EDGE_FEATURE_NAMES))),
+    )
+    explainer = Explainer(df, model, artifacts)
+    ids = df["transaction_id"].sample(32, random_state=0).tolist()
+    ctx["notes"] = {"weights": weights, "halo_edges": int(sum(e["halo_edges"] for e in explainer.explain(ids)))}
+
+    def run():
+        explainer._cache.clear()                # time the attribution, not the per-id cache
+        return explainer.explain(ids)
+    return run, len(ids)
+
+
+def case_whatif_threshold(ctx):
+    from src.transactions import whatif_window
+    window = whatif_window(0, 743)                      # index + sorted window built outside the timing
+    window.flagged(0.9, sigma=(0.5, 0.4, 0.1))
+    thresholds = np.linspace(0.0, 1.0, 1000)
+
+    def run():
+        for t in thresholds:
+            window.flagged(t)
+            window.flagged(t, sigma=(0.5, 0.4, 0.1))
+    return run, 2 * len(thresholds)
+
+
+def case_temporal_ring_search(ctx):
+    from src.path_search import find_rings
+    from src.temporal_graph import get_temporal_graph
+    tg = get_temporal_graph(ctx["predictions"])       # graph build outside the timing
+    return (lambda: sum(1 for _ in find_rings(tg, 0, 743, k=4))), tg.n_edges
+
+
+CASES = {
+    "get_transactions": case_get_transactions,
+    "risk_list_page": case_risk_list_page,
+    "search_prob_amount": case_search_prob_amount,
+    "render_person_graph": case_render_person_graph,
+    "render_high_risk_network": case_render_high_risk_network,
+    "classify_fraud_patterns": case_classify_fraud_patterns,
+    "classify_compact": case_classify_compact,
+    "update_features": case_update_features,
+    "burst_index": case_burst_index,
+    "burst_history_scan": case_burst_history_scan,
+    "composite_risk_index": case_composite_risk_index,
+    "edgesage_inference": case_edgesage_inference,
+    "explain_batch": case_explain_batch,
+    "whatif_threshold": case_whatif_threshold,
+    "temporal_ring_search": case_temporal_ring_search,
+}
+
+
+def _run_case(name: str, ctx: dict, repeat: int) -> dict:
+    """Executed in a child process."""
+    import contextlib
+    import io
+    os.chdir(ctx["workdir"])
+    _point_modules_at(ctx)
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn, items = CASES[name](ctx)
+        rss_before = _rss_mb()
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+    wall = float(np.median(times))
+    return {
+        "case": name,
+        "rows": ctx["rows"],
+        "items": int(items),
+        "repeat": repeat,
+        "wall_s": round(wall, 6),
+        "wall_min_s": round(min(times), 6),
+        "throughput_per_s": round(items / wall, 1) if wall > 0 else None,
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        **({"notes": ctx["notes"]} if "notes" in ctx else {}),
+    }
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_benchmarks(rows_list, cases, workdir=DEFAULT_WORKDIR, repeat=3, window_steps=24) -> dict:
+    results = []
+    ctx_mp = get_context("spawn")
+    for rows in rows_list:
+        wd = os.path.join(workdir, f"rows_{rows}")
+        t0 = time.perf_counter()
+        paths = generate_dataset(wd, rows)
+        print(f"📦 Synthetic data for {rows:,} rows ready in {time.perf_counter() - t0:.1f}s")
+        for name in cases:
+            ctx = {"workdir": wd, "rows": rows, "window_steps": window_steps, **paths}
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx_mp) as pool:
+                try:
+                    res = pool.submit(_run_case, name, ctx, repeat).result()
+                except Exception as e:
+                    res = {"case": name, "rows": rows, "error": f"{type(e).__name__}: {e}"}
+            results.append(res)
+            if "error" in res:
+                print(f"   ⚠️ {name:<26} {res['error']}")
+            else:
+                print(f"   {name:<26} {res['wall_s']:>10.4f}s  {res['throughput_per_s'] or 0:>14,.0f}/s  "
+                      f"peak {res['peak_rss_mb']:>8,.0f} MB")
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "window_steps": window_steps,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pulse4 hot-path benchmarks")
+    parser.add_argument("--rows", default="10000,100000", help="comma-separated dataset sizes (10k .. 50M)")
+    parser.add_argument("--cases", default="all", help=f"comma-separated subset of: {', '.join(CASES)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--window-steps", type=int, default=24, help="step window for the high-risk network cases")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    parser.add_argument("--out", default=None, help="JSON output path")
+    args = parser.parse_args()
+
+    rows_list = [int(float(r)) for r in args.rows.split(",")]
+    cases = list(CASES) if args.cases == "all" else [c.strip() for c in args.cases.split(",")]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {unknown}")
+
+    report = run_benchmarks(rows_list, cases, args.workdir, args.repeat, args.window_steps)
+    out = args.out or os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Synthetic transaction generator for the benchmarks.
+
+Produces files with the columns of `data/test_predictions_v2.0.csv` and
+`data/dataset_transaction_raw with feature_v2.0.csv` at any size from 10k to
+tens of millions of rows.  Rows are generated and written in chunks, so
+memory stays bounded; account activity follows a Zipf-like distribution so
+that hub accounts (and star-shaped neighbourhoods) exist at every scale.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+MAX_STEP = 744
+CHUNK_ROWS = 1_000_000
+MODES = ["active", "normal", "low_freq", "bursty"]
+
+PREDICTION_COLUMNS = ["transaction_id", "step", "orig_id", "dest_id", "amount", "fraud_prob_pred", "isFraud_pred"]
+
+
+def default_accounts(n_rows: int) -> int:
+    """Roughly 5 transactions per account, as in the monthly dataset."""
+    return max(1000, n_rows // 5)
+
+
+def _accounts(rng, n, n_accounts):
+    # Zipf-like popularity: low ids are hubs.
+    u = rng.random(n)
+    return (n_accounts * u ** 2).astype(np.int64) + 1
+
+
+def _base_chunk(rng, start: int, n: int, n_rows: int, n_accounts: int) -> pd.DataFrame:
+    # Steps increase with the row index so chunks are step-ordered like the real feed.
+    step = np.minimum((np.arange(start, start + n) * MAX_STEP) // n_rows, MAX_STEP - 1)
+    orig = _accounts(rng, n, n_accounts)
+    dest = _accounts(rng, n, n_accounts)
+    dest = np.where(dest == orig, dest % n_accounts + 1, dest)
+    amount = np.round(rng.lognormal(mean=6.0, sigma=1.3, size=n), 2)
+    return pd.DataFrame({
+        "transaction_id": 1_700_000_000 + np.arange(start, start + n, dtype=np.int64),
+        "step": step.astype(np.int64),
+        "orig_id": orig,
+        "dest_id": dest,
+        "amount": amount,
+    })
+
+
+def predictions_chunks(n_rows: int, n_accounts: int = None, seed: int = 42, fraud_rate: float = 0.01):
+    """Yield DataFrame chunks with the test_predictions_v2.0.csv columns."""
+    n_accounts = n_accounts or default_accounts(n_rows)
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_rows, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, n_rows - start)
+        df = _base_chunk(rng, start, n, n_rows, n_accounts)
+        prob = rng.beta(0.3, 6.0, size=n)
+        fraud = rng.random(n) < fraud_rate
+        prob[fraud] = rng.beta(6.0, 0.5, size=int(fraud.sum()))
+        df["fraud_prob_pred"] = np.round(prob, 6)
+        df["isFraud_pred"] = (prob > 0.5).astype(np.int64)
+        yield df[PREDICTION_COLUMNS]
+
+
+def raw_feature_chunks(n_rows: int, n_accounts: int = None, seed: int = 7, fraud_rate: float = 0.01):
+    """Yield DataFrame chunks with the raw feature dataset columns."""
+    n_accounts = n_accounts or default_accounts(n_rows)
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_rows, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, n_rows - start)
+        df = _base_chunk(rng, start, n, n_rows, n_accounts)
+        amt = df["amount"].to_numpy()
+        old_o = np.round(amt * rng.uniform(1.0, 8.0, n), 2)
+        old_d = np.round(rng.lognormal(7.0, 1.5, n), 2)
+        df["oldbalanceOrg"] = old_o
+        df["newbalanceOrig"] = np.round(old_o - amt, 2)
+        df["oldbalanceDest"] = old_d
+        df["newbalanceDest"] = np.round(old_d + amt, 2)
+        df["isFraud"] = (rng.random(n) < fraud_rate).astype(np.int64)
+        df["hour"] = df["step"] % 24
+        df["time_period"] = np.searchsorted([6, 12, 18], df["hour"].to_numpy(), side="right")
+        df["orig_balance_ratio"] = np.abs(old_o - df["newbalanceOrig"]) / (np.abs(old_o) + 1e-6)
+        df["dest_balance_ratio"] = np.abs(old_d - df["newbalanceDest"]) / (np.abs(old_d) + 1e-6)
+        for side in ("orig", "dest"):
+            tx24 = rng.poisson(1.5, n)
+            df[f"{side}_tx_24h"] = tx24
+            df[f"{side}_tx_72h"] = tx24 + rng.poisson(2.0, n)
+            df[f"{side}_tx_168h"] = df[f"{side}_tx_72h"] + rng.poisson(4.0, n)
+            df[f"{side}_avg_amt_24h"] = np.round(amt * rng.uniform(0.5, 1.5, n), 2)
+            df[f"{side}_30d_mean"] = np.round(amt * rng.uniform(0.5, 1.5, n), 2)
+            df[f"{side}_30d_var"] = np.round((amt * rng.uniform(0.1, 1.0, n)) ** 2, 2)
+            df[f"{side}_curr_volatility"] = rng.exponential(0.5, n)
+            df[f"{side}_behavior_mode"] = rng.choice(MODES, n, p=[0.2, 0.5, 0.2, 0.1])
+        yield df
+
+
+def write_csv(chunks, path: str) -> str:
+    """Stream chunks to a CSV file (header once)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    first = True
+    for chunk in chunks:
+        chunk.to_csv(path, mode="w" if first else "a", header=first, index=False)
+        first = False
+    return path
+
+
+def generate_dataset(workdir: str, n_rows: int, seed: int = 42) -> dict:
+    """
+    Write both synthetic files under `workdir/data/` (reusing them if the
+    row count matches) and return their paths.
+    """
+    data_dir = os.path.join(workdir, "data")
+    paths = {
+        "predictions": os.path.join(data_dir, "test_predictions_v2.0.csv"),
+        "raw_features": os.path.join(data_dir, "dataset_transaction_raw with feature_v2.0.csv"),
+    }
+    marker = os.path.join(data_dir, ".rows")
+    if os.path.exists(marker) and open(marker).read().strip() == f"{n_rows}:{seed}" \
+            and all(os.path.exists(p) for p in paths.values()):
+        return paths
+    write_csv(predictions_chunks(n_rows, seed=seed), paths["predictions"])
+    write_csv(raw_feature_chunks(n_rows, seed=seed + 1), paths["raw_features"])
+    with open(marker, "w") as f:
+        f.write(f"{n_rows}:{seed}")
+    return paths
@@ -0,0 +1,141 @@
+"""
+Per-worker memory with and without the shared store (src/shared_store.py).
+
+N worker processes (spawned, so nothing is inherited through fork) each hold
+what a dashboard / scoring worker holds: the risk index and temporal graph of
+the predictions file, the history frame and the EdgeSAGE model, and run a few
+queries so the pages they read are faulted in.  While all N are alive the
+parent reads /proc/<pid>/smaps_rollup:
+
+- USS (private pages): what one more worker really costs;
+- PSS (shared pages split between the processes mapping them).
+
+Modes: `bare` only imports the modules (the interpreter floor), `local`
+builds everything per process, `shared` attaches the published store.
+
+    python -m benchmarks.worker_memory --rows 1000000 --workers 4 --out benchmarks/results/workers.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate_dataset  # noqa: E402
+
+DEFAULT_WORKDIR = os.path.join(ROOT, "benchmarks", ".workdir")
+MODES = ("bare", "local", "shared")
+
+
+def _smaps(pid: int) -> dict:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f.readlines()[1:]:
+            key, value = line.split(":", 1)
+            fields[key] = int(value.split()[0]) / 1024            # kB -> MB
+    return {"rss_mb": fields["Rss"], "pss_mb": fields["Pss"],
+            "uss_mb": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def _worker(mode: str, ctx: dict, ready, done):
+    from src.shared_store import ENV_VAR
+    if mode == "shared":
+        os.environ[ENV_VAR] = ctx["store"]
+    else:
+        os.environ.pop(ENV_VAR, None)
+    from src.dataset_loader import load_dataset
+    from src.gnn_core import load_artifacts, load_model
+    from src.risk_index import get_risk_index
+    from src.shared_store import attached
+    from src.temporal_graph import get_temporal_graph
+
+    t0 = time.perf_counter()
+    if mode != "bare":
+        index = get_risk_index(ctx["predictions"])
+        graph = get_temporal_graph(ctx["predictions"])
+        store = attached()
+        if store is not None:
+            history, model = store.history_frame(ctx["raw_features"]), store.load_model()
+        else:
+            history, model = load_dataset(ctx["raw_features"]), load_model(load_artifacts(ctx["model_dir"]))
+        # A dashboard session's worth of reads
+        index.count(0.5), index.top(100), index.query(0.5, 0, 167), index.query(0.0, None, None, "1")
+        index.find(index.data["transaction_id"][0])
+        graph.summary(0, 743), graph.node_edges("1"), graph.risk_compact(0, 167, 0.5)
+        history.select_dtypes("number").sum()
+        sum(float(p.detach().sum()) for p in model.parameters())
+    ready.put((os.getpid(), time.perf_counter() - t0))
+    done.wait()
+
+
+def measure(mode: str, ctx: dict, workers: int) -> dict:
+    mp = get_context("spawn")
+    ready, done = mp.Queue(), mp.Event()
+    procs = [mp.Process(target=_worker, args=(mode, ctx, ready, done)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    started = [ready.get() for _ in procs]
+    mem = [_smaps(pid) for pid, _ in started]
+    done.set()
+    for p in procs:
+        p.join()
+    n = len(mem)
+    return {
+        "mode": mode,
+        "workers": n,
+        "load_s": round(max(s for _, s in started), 2),
+        "uss_mb": round(sum(m["uss_mb"] for m in mem) / n, 1),
+        "pss_mb": round(sum(m["pss_mb"] for m in mem) / n, 1),
+        "rss_mb": round(sum(m["rss_mb"] for m in mem) / n, 1),
+        "total_pss_mb": round(sum(m["pss_mb"] for m in mem), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory with and without the shared store")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR)
+    parser.add_argument("--model-dir", default=os.path.join(ROOT, "model"))
+    parser.add_argument("--store", default=None, help="store root (default: <workdir>/rows_N/shared_store)")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--out", default=None, help="JSON output path")
+    args = parser.parse_args()
+
+    wd = os.path.join(args.workdir, f"rows_{args.rows}")
+    ctx = {"model_dir": args.model_dir, "store": args.store or os.path.join(wd, "shared_store"),
+           **generate_dataset(wd, args.rows)}
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    if "shared" in modes:
+        from src.shared_store import publish
+        publish(ctx["store"], ctx["predictions"], ctx["raw_features"], args.model_dir,
+                bundles=("predictions", "history", "model"))
+
+    results = []
+    for mode in modes:
+        res = measure(mode, ctx, args.workers)
+        results.append(res)
+        print(f"   {mode:<7} x{res['workers']}  USS {res['uss_mb']:>8.1f} MB  PSS {res['pss_mb']:>8.1f} MB  "
+              f"RSS {res['rss_mb']:>8.1f} MB  load {res['load_s']:.2f}s")
+    floor = next((r["uss_mb"] for r in results if r["mode"] == "bare"), None)
+    if floor is not None:
+        for r in results:
+            r["data_uss_mb"] = round(r["uss_mb"] - floor, 1)       # private memory above the bare interpreter
+        print("   data held privately per worker: " + ", ".join(f"{r['mode']} {r['data_uss_mb']:.1f} MB" for r in results))
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(timespec="seconds"), "rows": args.rows,
+                       "results": results}, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Load test for the local scoring API (src/scoring_service.py).
+
+Fires synthetic transactions at /score (or /score/batch with --batch-size > 1)
+from a pool of concurrent clients and reports p50/p99 latency and throughput.
+
+    python scripts/load_test.py --url http://127.0.0.1:8080 --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+import numpy as np
+
+
+def make_transaction(rng: random.Random) -> dict:
+    amount = round(rng.uniform(10, 50000), 2)
+    orig_old = round(rng.uniform(amount, amount * 5), 2)
+    dest_old = round(rng.uniform(0, 100000), 2)
+    return {
+        "step": rng.randint(1, 744),
+        "orig_id": str(rng.randint(1, 500000)),
+        "dest_id": str(rng.randint(1, 500000)),
+        "amount": amount,
+        "orig_old_balance": orig_old,
+        "orig_new_balance": round(orig_old - amount, 2),
+        "dest_old_balance": dest_old,
+        "dest_new_balance": round(dest_old + amount, 2),
+    }
+
+
+async def _worker(session, url, batch_size, queue, latencies, errors, seed):
+    rng = random.Random(seed)
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        if batch_size > 1:
+            endpoint = f"{url}/score/batch"
+            body = {"transactions": [make_transaction(rng) for _ in range(batch_size)]}
+        else:
+            endpoint = f"{url}/score"
+            body = make_transaction(rng)
+        t0 = time.perf_counter()
+        try:
+            async with session.post(endpoint, json=body) as resp:
+                await resp.read()
+                if resp.status != 200:
+                    errors.append(resp.status)
+                    continue
+        except aiohttp.ClientError as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - t0)
+
+
+async def run_load_test(url: str, n_requests: int, concurrency: int, batch_size: int = 1) -> dict:
+    queue = asyncio.Queue()
+    for i in range(n_requests):
+        queue.put_nowait(i)
+    latencies, errors = [], []
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.get(f"{url}/health") as resp:
+            resp.raise_for_status()
+        t0 = time.perf_counter()
+        await asyncio.gather(*[
+            _worker(session, url, batch_size, queue, latencies, errors, seed=i)
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - t0
+
+    lat_ms = np.array(latencies) * 1000.0 if latencies else np.array([np.nan])
+    return {
+        "requests": n_requests,
+        "ok": len(latencies),
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "batch_size": batch_size,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "transactions_per_s": round(len(latencies) * batch_size / elapsed, 1),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 2),
+        "max_ms": round(float(np.max(lat_ms)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Pulse4 scoring API")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=1)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(args.url.rstrip("/"), args.requests, args.concurrency, args.batch_size))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
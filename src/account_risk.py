@@ -0,0 +1,266 @@
+"""
+Account-level propagated risk (personalized PageRank over the transaction graph).
+
+Accounts are nodes and transactions are undirected, count-weighted edges.
+Restart mass is seeded by high-probability edges: each edge with
+fraud_prob_pred >= SEED_THRESHOLD adds its probability to both endpoints.
+Iterating
+
+    r <- ALPHA * v + (1 - ALPHA) * W @ (r / deg)
+
+with scipy.sparse gives every account's proximity to fraud.  The score
+reported is r / max(r) in [0, 1], together with its percentile.
+
+The job is incremental.  The store keeps the aggregated adjacency, the seed
+mass and the last processed step.  `update` appends new edges and restarts
+the iteration from the previous scores, so a new day needs only a few
+sweeps.  Lookups go through a hashed account index: O(1) per account.
+
+    python -m src.account_risk --rebuild          # full month from the predictions file
+    python -m src.account_risk                    # fold in new daily_data partitions
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREDICTIONS_PATH = os.path.join(BASE_DIR, "data", "test_predictions_v2.0.csv")
+STORE_DIR = os.path.join(BASE_DIR, "account_risk")
+ALPHA = 0.15                 # restart probability
+SEED_THRESHOLD = 0.5
+COLUMNS = ["orig_id", "dest_id", "fraud_prob_pred", "step"]
+
+
+class AccountRisk:
+    def __init__(self, alpha: float = ALPHA, seed_threshold: float = SEED_THRESHOLD):
+        self.alpha = alpha
+        self.seed_threshold = seed_threshold
+        self.nodes = pd.Index([], dtype=object)
+        self.adj = sparse.csr_matrix((0, 0), dtype=np.float64)
+        self.seeds = np.zeros(0)
+        self.scores = np.zeros(0)
+        self.percentile = np.zeros(0)
+        self.max_score = 0.0
+        self.last_step = None
+        self.n_edges = 0
+        self.iterations = 0
+
+    # ---------- build ----------
+    def _codes(self, ids: np.ndarray) -> np.ndarray:
+        codes = self.nodes.get_indexer(ids)
+        new = codes < 0
+        if new.any():
+            fresh = pd.unique(ids[new])
+            self.nodes = self.nodes.append(pd.Index(fresh, dtype=object))
+            codes[new] = self.nodes.get_indexer(ids[new])
+        return codes.astype(np.int64)
+
+    def add_edges(self, df: pd.DataFrame) -> int:
+        """Fold a batch of scored transactions into the adjacency and seed mass."""
+        if df.empty:
+            return 0
+        from .temporal_graph import _id_strings
+        orig = self._codes(_id_strings(df["orig_id"]))
+        dest = self._codes(_id_strings(df["dest_id"]))
+        n = len(self.nodes)
+        ones = np.ones(len(orig))
+        batch = sparse.coo_matrix((ones, (orig, dest)), shape=(n, n)).tocsr()
+        old = self.adj
+        if old.shape[0] < n:
+            old = sparse.csr_matrix((old.data, old.indices, np.append(old.indptr, [old.indptr[-1]] * (n - old.shape[0]))),
+                                    shape=(n, n))
+        self.adj = old + batch + batch.T
+
+        prob = df["fraud_prob_pred"].astype(float).to_numpy()
+        seed = np.where(prob >= self.seed_threshold, prob, 0.0)
+        self.seeds = np.pad(self.seeds, (0, n - len(self.seeds)))
+        self.seeds += np.bincount(orig, weights=seed, minlength=n) + np.bincount(dest, weights=seed, minlength=n)
+        self.scores = np.pad(self.scores, (0, n - len(self.scores)))
+
+        if "step" in df.columns:
+            step = int(df["step"].max())
+            self.last_step = step if self.last_step is None else max(self.last_step, step)
+        self.n_edges += len(df)
+        return len(df)
+
+    def propagate(self, tol: float = 1e-9, max_iter: int = 200) -> int:
+        """Power iteration, warm-started from the current scores; returns the sweep count."""
+        from scipy.stats import rankdata          # ~1s to import; lookups never need it
+        total = self.seeds.sum()
+        if total <= 0:
+            self.scores = np.zeros(len(self.nodes))
+            self.percentile = np.zeros(len(self.nodes))
+            self.max_score = 0.0
+            return 0
+        v = self.seeds / total
+        deg = np.asarray(self.adj.sum(axis=1)).ravel()
+        inv_deg = np.divide(1.0, deg, out=np.zeros_like(deg), where=deg > 0)
+        r = self.scores * (1.0 / self.scores.sum()) if self.scores.sum() > 0 else v.copy()
+        for it in range(1, max_iter + 1):
+            nxt = self.alpha * v + (1 - self.alpha) * (self.adj @ (r * inv_deg))
+            nxt += (1.0 - nxt.sum()) * v           # mass of isolated accounts returns to the seeds
+            delta = np.abs(nxt - r).sum()
+            r = nxt
+            if delta < tol:
+                break
+        self.scores = r
+        self.max_score = float(r.max())
+        self.percentile = rankdata(r, method="max") / len(r)
+        self.iterations = it
+        return it
+
+    # ---------- lookup ----------
+    def lookup(self, account) -> dict:
+        """O(1) score for one account, or None if it never transacted; 123, 123.0 and "123" are the same id."""
+        from .temporal_graph import _id_strings
+        name = _id_strings(pd.Series([account]))[0]
+        try:
+            i = self.nodes.get_loc(name)
+        except KeyError:
+            return None
+        if not len(self.scores):
+            return None
+        return {
+            "account": name,
+            "risk_score": float(self.scores[i] / self.max_score) if self.max_score > 0 else 0.0,
+            "percentile": float(self.percentile[i]),
+            "seed_mass": float(self.seeds[i]),
+        }
+
+    def top(self, k: int = 20) -> pd.DataFrame:
+        order = np.argsort(-self.scores, kind="stable")[:k]
+        return pd.DataFrame({
+            "account": self.nodes.to_numpy()[order],
+            "risk_score": self.scores[order] / (self.max_score or 1.0),
+            "percentile": self.percentile[order],
+            "seed_mass": self.seeds[order],
+        })
+
+    # ---------- persistence ----------
+    def save(self, root: str = STORE_DIR) -> str:
+        """Write the store atomically (tmp folder + rename)."""
+        parent = os.path.dirname(os.path.abspath(root))
+        os.makedirs(parent, exist_ok=True)
+        tmp = f"{root}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        adj = self.adj.tocsr()
+        np.savez(
+            os.path.join(tmp, "arrays.npz"),
+            nodes=self.nodes.to_numpy().astype(str), indptr=adj.indptr, indices=adj.indices, data=adj.data,
+            seeds=self.seeds, scores=self.scores, percentile=self.percentile,
+        )
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({
+                "alpha": self.alpha, "seed_threshold": self.seed_threshold, "last_step": self.last_step,
+                "accounts": len(self.nodes), "edges": self.n_edges, "iterations": self.iterations,
+                "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }, f, indent=2)
+        old = f"{root}.old"
+        shutil.rmtree(old, ignore_errors=True)
+        if os.path.exists(root):
+            os.replace(root, old)
+        os.replace(tmp, root)
+        shutil.rmtree(old, ignore_errors=True)
+        return root
+
+    @classmethod
+    def load(cls, root: str = STORE_DIR) -> "AccountRisk":
+        with open(os.path.join(root, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = np.load(os.path.join(root, "arrays.npz"))
+        store = cls(meta["alpha"], meta["seed_threshold"])
+        store.nodes = pd.Index(arrays["nodes"].astype(object))
+        n = len(store.nodes)
+        store.adj = sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=(n, n))
+        store.seeds, store.scores, store.percentile = arrays["seeds"], arrays["scores"], arrays["percentile"]
+        store.max_score = float(store.scores.max()) if len(store.scores) else 0.0
+        store.last_step, store.n_edges, store.iterations = meta["last_step"], meta["edges"], meta["iterations"]
+        return store
+
+
+# ==================== Batch jobs ====================
+def rebuild(path: str = PREDICTIONS_PATH, root: str = STORE_DIR, alpha: float = ALPHA,
+            seed_threshold: float = SEED_THRESHOLD) -> AccountRisk:
+    """Full-month build from the predictions file."""
+    t0 = time.perf_counter()
+    store = AccountRisk(alpha, seed_threshold)
+    from .archive import load_history
+    store.add_edges(load_history(path, COLUMNS))
+    t_build = time.perf_counter() - t0
+    sweeps = store.propagate()
+    store.save(root)
+    print(f"✅ Account risk for {len(store.nodes):,} accounts / {store.n_edges:,} edges: "
+          f"graph {t_build:.1f}s, {sweeps} sweeps, total {time.perf_counter() - t0:.1f}s")
+    return store
+
+
+def update(root: str = STORE_DIR, frames=None, folder: str = "daily_data") -> AccountRisk:
+    """Fold new transactions (default: daily partitions after the stored last_step) into the store."""
+    t0 = time.perf_counter()
+    store = AccountRisk.load(root)
+    if frames is None:
+        from .state_checkpoint import iter_pending_daily_frames
+        frames = iter_pending_daily_frames(store.last_step, folder)
+    added = sum(store.add_edges(day) for day in frames)
+    if not added:
+        print(f"✅ Account risk already up to date (last step {store.last_step})")
+        return store
+    sweeps = store.propagate()
+    store.save(root)
+    print(f"✅ Added {added:,} edges up to step {store.last_step}: {sweeps} sweeps in {time.perf_counter() - t0:.1f}s")
+    return store
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_account_risk(root: str = STORE_DIR):
+    """Cached store for lookups (reloaded when the job rewrites it); None if not built yet."""
+    meta = os.path.join(root, "meta.json")
+    if not os.path.exists(meta):
+        return None
+    mtime = os.path.getmtime(meta)
+    with _cache_lock:
+        hit = _cache.get(root)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+    store = AccountRisk.load(root)
+    with _cache_lock:
+        _cache[root] = (mtime, store)
+    return store
+
+
+def account_risk_lookup(account, root: str = STORE_DIR) -> dict:
+    store = get_account_risk(root)
+    return store.lookup(account) if store is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Account-level propagated risk (personalized PageRank)")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild from the full predictions file")
+    parser.add_argument("--predictions", default=PREDICTIONS_PATH)
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--folder", default="daily_data", help="daily partitions for incremental updates")
+    parser.add_argument("--alpha", type=float, default=ALPHA)
+    parser.add_argument("--seed-threshold", type=float, default=SEED_THRESHOLD)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.rebuild or not os.path.exists(os.path.join(args.store, "meta.json")):
+        store = rebuild(args.predictions, args.store, args.alpha, args.seed_threshold)
+    else:
+        store = update(args.store, folder=args.folder)
+    print(store.top(args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,37 @@
 import os
 import re
 import json
+import threading
+import time
 from dotenv import load_dotenv
-from ibm_watsonx_ai.foundation_models import Model
+from .tracing import span, traced
 import datetime
-current_time = datetime.datetime.now()
 # ========== 1️⃣ Load env ==========
 load_dotenv()
 WATSONX_API_KEY = os.getenv("WATSONX_API_KEY")
 WATSONX_URL = os.getenv("WATSONX_URL", "https://us-south.ml.cloud.ibm.com")
 WATSONX_PROJECT_ID = os.getenv("WATSONX_PROJECT_ID")
+WATSONX_INIT_TIMEOUT = float(os.getenv("WATSONX_INIT_TIMEOUT", "10"))   # seconds a request waits for the client
+WATSONX_RETRY_AFTER = 300                                              # seconds before retrying a failed init
+REPORT_MAX_TOKENS = 300                                                # grounded report (with an explanation)
 
-# ========== 2️⃣ Initialize model ==========
+# ========== 2️⃣ Model (initialized on first use) ==========
+# Importing ibm_watsonx_ai and creating the Model contacts the service; doing
+# that at import time made every cold start wait on the network (or hang when
+# Watsonx is unreachable).  The client is now built on a background thread the
+# first time it is needed, and callers wait at most WATSONX_INIT_TIMEOUT before
+# falling back to the rules.
 _model = None
-if WATSONX_API_KEY and WATSONX_PROJECT_ID:
+_init_lock = threading.Lock()
+_init_thread = None
+_init_started_at = None
+_init_failed_at = None
+
+
+def _init_model():
+    global _model, _init_failed_at
     try:
+        from ibm_watsonx_ai.foundation_models import Model
         _model = Model(
             model_id="ibm/granite-3-2-8b-instruct",
             params={"temperature": 0.2, "max_new_tokens": 250},
@@ -23,11 +40,56 @@ if WATSONX_API_KEY and WATSONX_PROJECT_ID:
         )
         print("✅ IBM Watsonx AI model initialized.")
     except Exception as e:
+        _init_failed_at = time.monotonic()
         print(f"⚠️ Failed to initialize Watsonx model: {e}")
-else:
+
+
+def warm_up():
+    """Start client initialization in the background (no-op if done, running, or recently failed)."""
+    global _init_thread, _init_started_at
+    if _model is not None or not (WATSONX_API_KEY and WATSONX_PROJECT_ID):
+        return _init_thread
+    with _init_lock:
+        running = _init_thread is not None and _init_thread.is_alive()
+        recently_failed = _init_failed_at is not None and time.monotonic() - _init_failed_at < WATSONX_RETRY_AFTER
+        if not running and not (_init_thread is not None and recently_failed):
+            _init_thread = threading.Thread(target=_init_model, name="watsonx-init", daemon=True)
+            _init_started_at = time.monotonic()
+            _init_thread.start()
+        return _init_thread
+
+
+def set_model(model):
+    """Install a generator (anything with Watsonx's `generate(prompt=, params=)`), e.g. benchmarks.mock_llm.MockModel."""
+    global _model
+    _model = model
+
+
+def get_model(timeout: float = None):
+    """
+    The Watsonx model, or None (missing credentials, init failed, or not ready
+    `timeout` seconds after init started; a hanging init is waited on once).
+    """
+    if _model is not None:
+        return _model
+    thread = warm_up()
+    if thread is None:
+        return None
+    timeout = WATSONX_INIT_TIMEOUT if timeout is None else timeout
+    thread.join(max(0.0, _init_started_at + timeout - time.monotonic()))
+    return _model
+
+
+if not (WATSONX_API_KEY and WATSONX_PROJECT_ID):
     print("⚠️ Missing Watsonx credentials, fallback rules will be used.")
 
 
+# ========== 2️⃣b Token estimate ==========
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for prompt budgets."""
+    return len(text) // 4 + 1
+
+
 # ========== 3️⃣ Fallback rules ==========
 def _fallback_intent(query: str) -> dict:
     """Rule-based fallback when LLM fails or offline."""
@@ -64,14 +126,17 @@ def _fallback_intent(query: str) -> dict:
 
 
 # ========== 4️⃣ Main LLM extraction ==========
+@traced()
 def extract_query_info(query: str) -> dict:
     """
     Extract structured query info using Watsonx or fallback.
     Return dict with keys:
     intent, name, transaction_id, merchant_id, start_date_time, end_date_time
     """
-    if not _model:
+    model = get_model()
+    if not model:
         return _fallback_intent(query)
+    current_time = datetime.datetime.now()
 
     prompt = f"""
 You are an intent classification assistant for a financial risk analysis system.
@@ -129,7 +194,8 @@ User question: {query,current_time}
 """
 
     try:
-        resp = _model.generate(prompt=prompt)
+        with span("watsonx_generate"):
+            resp = model.generate(prompt=prompt)
         text = resp["results"][0]["generated_text"].strip()
 
         # cleanup & extract JSON
@@ -158,9 +224,25 @@ User question: {query,current_time}
         return _fallback_intent(query)
 
 
-def risk_score_agent(result):
+def _report_prompt(result, explanation: dict) -> str:
+    """Short prompt grounded in the precomputed explanation (src/explain.py)."""
+    from .explain import explanation_lines
+    facts = "\n".join(f"- {line}" for line in explanation_lines(explanation))
+    return f"""You are a bank fraud analyst. Using only the facts below, write a risk note of at most 120 words:
+one sentence with the verdict, up to three bullets on what drives the score, then the action.
+
+Transaction {result['transaction_id']}: P(fraud) {result['input_prob'][0]:.4f}, amount {result['amount'][0]}, \
+RI {result['RI'][0]:.3f} ({result['risk_level'][0]}). Recommended action: {result['recommendation'][0]}
+{facts}
+"""
+
+
+@traced()
+def risk_score_agent(result, attribution: dict = None):
     """
     Generate a detailed risk report as an explanation from a financial expert, including the formula and extended explanation in English.
+    With a precomputed `attribution` (src/explain.py), the prompt carries its attribution lines
+    instead of asking for a long free-form narrative, and the answer is capped at REPORT_MAX_TOKENS.
     """
     try:
         # Extract input data
@@ -218,9 +300,16 @@ def risk_score_agent(result):
         Please generate a detailed financial expert analysis for this transaction, explaining the significance of each metric, and providing relevant recommendations based on the risk score.
         """
         
+        params = {"temperature": 0.3, "max_new_tokens": 5000}
+        if attribution is not None:
+            input_text = _report_prompt(result, attribution)
+            params["max_new_tokens"] = REPORT_MAX_TOKENS
+
         # Call the model to generate a detailed report, increase max_new_tokens for more content
-        if _model:
-            response = _model.generate(prompt=input_text, params={"temperature": 0.3, "max_new_tokens": 5000})  # Increase tokens
+        model = get_model()
+        if model:
+            with span("watsonx_generate"):
+                response = model.generate(prompt=input_text, params=params)
             print(f"🔍 Full model response: {response}")  # Print the full model response to check
             ai_text = response.get("results")[0]["generated_text"].strip()  # Extract the generated text from the response
         else:
@@ -0,0 +1,293 @@
+"""
+Compressed long-term archive of transaction and prediction history.
+
+`archive_closed_days(source)` rewrites every closed day of a CSV (all days
+but the last, which is still being appended to) into its own Parquet file:
+
+    archive/
+        catalog.json
+        test_predictions_v2.0/day_0000.parquet  day_0001.parquet  ...
+
+- rows are parsed with the schema of src/dataset_loader.py (int32 steps,
+  int64 ids), with floats kept at float64 so archived amounts and
+  probabilities are exactly the CSV's values, sorted by step and written
+  with zstd in row groups of ROW_GROUP_ROWS, so the row-group statistics of
+  `step` and `fraud_prob_pred` let readers skip whole groups;
+- ids, steps and the other low-cardinality columns are dictionary encoded,
+  transaction ids (increasing within a day) delta encoded, and the floats
+  byte-stream-split, which zstd compresses far better than plain floats;
+- `catalog.json` lists, per dataset, each day's file with its step range,
+  row count, size and probability range.  Archived days are never rewritten,
+  so the command can run after every closed day.
+
+`read_history(dataset, start_step, end_step, min_prob)` picks the day files
+from the catalog and reads them through pyarrow with the step / probability
+filters pushed down, and `prune_source` drops archived days from the live CSV
+once they are safe in the archive.  Every reader that loads a whole history
+file goes through `load_history` (pd.read_csv) or `with_archive` (used by
+dataset_loader.load_dataset): the archived days before the live file's first
+step come first, then the live rows, so a pruned source still reads as the
+full history.  Archiving alone never changes that union and pruning rewrites
+the source, so caches keyed by the source's mtime stay valid.
+
+    python -m src.archive data/test_predictions_v2.0.csv            # archive closed days
+    python -m src.archive data/test_predictions_v2.0.csv --prune    # ... then keep only the open day in the CSV
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .dataset_loader import CATEGORY_COLUMNS, ID_COLUMNS, INT_COLUMNS, _finalize, arrow_schema, iter_csv_chunks
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARCHIVE_ROOT = os.path.join(BASE_DIR, "archive")
+CATALOG_NAME = "catalog.json"
+STEPS_PER_DAY = 24
+ROW_GROUP_ROWS = 65_536
+ZSTD_LEVEL = 9
+CHUNK_ROWS = 500_000
+DELTA_COLUMNS = ("transaction_id",)
+DICTIONARY_COLUMNS = (set(ID_COLUMNS) | set(INT_COLUMNS) | set(CATEGORY_COLUMNS)) - set(DELTA_COLUMNS)
+
+
+def dataset_name(source: str) -> str:
+    """Archive folder for a source file: its name without extension, spaces replaced."""
+    return os.path.splitext(os.path.basename(source))[0].replace(" ", "_")
+
+
+# ==================== 1️⃣ Catalog ====================
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _catalog_path(root: str) -> str:
+    return os.path.join(root, CATALOG_NAME)
+
+
+def load_catalog(root: str = ARCHIVE_ROOT) -> dict:
+    """{"datasets": {name: {"source", "days": {day: entry}}}}, cached by the catalog's mtime."""
+    path = _catalog_path(root)
+    if not os.path.exists(path):
+        return {"datasets": {}}
+    mtime = os.path.getmtime(path)
+    with _cache_lock:
+        hit = _cache.get(path)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+    with open(path) as f:
+        catalog = json.load(f)
+    with _cache_lock:
+        _cache[path] = (mtime, catalog)
+    return catalog
+
+
+def _save_catalog(root: str, catalog: dict):
+    catalog["updated"] = datetime.now().isoformat(timespec="seconds")
+    tmp = _catalog_path(root) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(catalog, f, indent=2)
+    os.replace(tmp, _catalog_path(root))
+
+
+# ==================== 2️⃣ Archiving ====================
+def _writer(path: str, schema: pa.Schema) -> pq.ParquetWriter:
+    floats = [f.name for f in schema if pa.types.is_floating(f.type)]
+    return pq.ParquetWriter(
+        path, schema, compression="zstd", compression_level=ZSTD_LEVEL,
+        use_dictionary=[f.name for f in schema if f.name in DICTIONARY_COLUMNS],
+        column_encoding={c: "DELTA_BINARY_PACKED" for c in DELTA_COLUMNS if c in schema.names} or None,
+        use_byte_stream_split=floats or False, write_statistics=True,
+    )
+
+
+def archive_closed_days(source: str, root: str = ARCHIVE_ROOT, include_open: bool = False,
+                        chunksize: int = CHUNK_ROWS, verbose: bool = True) -> dict:
+    """
+    Archive every closed day of `source` that is not in the catalog yet.
+    Days are collected per CSV chunk into per-day writers; the last day is
+    only archived with `include_open`.  Returns the dataset's catalog entry.
+    """
+    t0 = time.perf_counter()
+    name = dataset_name(source)
+    folder = os.path.join(root, name)
+    os.makedirs(folder, exist_ok=True)
+    catalog = json.loads(json.dumps(load_catalog(root)))        # private copy, the cached one stays intact
+    entry = catalog["datasets"].setdefault(name, {"source": os.path.abspath(source), "days": {}})
+    done = set(entry["days"])
+
+    writers, stats, last_day, schema = {}, {}, -1, None
+    try:
+        for chunk in iter_csv_chunks(source, chunksize, float_dtype=np.float64):
+            day = chunk["step"].to_numpy() // STEPS_PER_DAY
+            last_day = max(last_day, int(day.max()) if len(day) else -1)
+            for d in np.unique(day):
+                key = f"{int(d):04d}"
+                if key in done:
+                    continue
+                part = chunk[day == d].sort_values("step", kind="stable")
+                table = pa.Table.from_pandas(part, preserve_index=False)
+                if schema is None:
+                    schema = arrow_schema(table.schema, pa.float64())       # fixed by the column maps, ids int64
+                if key not in writers:
+                    writers[key] = _writer(os.path.join(folder, f"day_{key}.parquet.tmp"), schema)
+                    stats[key] = {"rows": 0, "step_min": np.inf, "step_max": -np.inf, "prob_min": np.inf,
+                                  "prob_max": -np.inf}
+                writers[key].write_table(table.cast(schema), row_group_size=ROW_GROUP_ROWS)
+                s = stats[key]
+                s["rows"] += len(part)
+                s["step_min"] = min(s["step_min"], int(part["step"].iloc[0]))
+                s["step_max"] = max(s["step_max"], int(part["step"].iloc[-1]))
+                if "fraud_prob_pred" in part.columns:
+                    s["prob_min"] = min(s["prob_min"], float(part["fraud_prob_pred"].min()))
+                    s["prob_max"] = max(s["prob_max"], float(part["fraud_prob_pred"].max()))
+    finally:
+        for w in writers.values():
+            w.close()
+
+    archived = []
+    for key in sorted(writers):
+        tmp = os.path.join(folder, f"day_{key}.parquet.tmp")
+        if int(key) == last_day and not include_open:
+            os.remove(tmp)
+            continue
+        fname = f"day_{key}.parquet"
+        os.replace(tmp, os.path.join(folder, fname))
+        s = stats[key]
+        entry["days"][key] = {
+            "file": os.path.join(name, fname), "rows": s["rows"], "bytes": os.path.getsize(os.path.join(folder, fname)),
+            "step_min": s["step_min"], "step_max": s["step_max"],
+            "prob_min": None if s["prob_min"] == np.inf else s["prob_min"],
+            "prob_max": None if s["prob_max"] == -np.inf else s["prob_max"],
+            "archived_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        archived.append(key)
+    entry["days"] = dict(sorted(entry["days"].items()))
+    _save_catalog(root, catalog)
+    if verbose:
+        total = sum(d["bytes"] for d in entry["days"].values())
+        print(f"💾 Archived {len(archived)} day(s) of {name} ({len(entry['days'])} in archive, "
+              f"{total / 1024 ** 2:,.1f} MB) in {time.perf_counter() - t0:.2f}s")
+    return entry
+
+
+def archived_steps(dataset: str, root: str = ARCHIVE_ROOT):
+    """(first, last) archived step of the dataset, or None."""
+    days = load_catalog(root)["datasets"].get(dataset, {}).get("days", {})
+    if not days:
+        return None
+    return min(d["step_min"] for d in days.values()), max(d["step_max"] for d in days.values())
+
+
+def prune_source(source: str, root: str = ARCHIVE_ROOT, chunksize: int = CHUNK_ROWS, verbose: bool = True) -> int:
+    """Rewrite `source` without the rows of archived days; returns the number of rows kept."""
+    days = load_catalog(root)["datasets"].get(dataset_name(source), {}).get("days", {})
+    if not days:
+        return -1
+    archived = {int(k) for k in days}
+    tmp, kept = source + ".tmp", 0
+    with open(tmp, "w", newline="") as f:
+        header = True
+        for chunk in pd.read_csv(source, chunksize=chunksize):
+            chunk = chunk[~np.isin(chunk["step"].to_numpy() // STEPS_PER_DAY, list(archived))]
+            chunk.to_csv(f, index=False, header=header)
+            header, kept = False, kept + len(chunk)
+    os.replace(tmp, source)
+    if verbose:
+        print(f"✅ {source}: kept {kept:,} rows of the open day(s)")
+    return kept
+
+
+# ==================== 3️⃣ Queries ====================
+def read_history(dataset: str, start_step: int = None, end_step: int = None, min_prob: float = None,
+                 columns=None, root: str = ARCHIVE_ROOT) -> pd.DataFrame:
+    """
+    Archived rows with start_step <= step <= end_step and fraud_prob_pred >= min_prob.
+    Day files outside the window (or whose max probability is below min_prob)
+    are skipped from the catalog; inside a file the filters skip row groups.
+    """
+    days = load_catalog(root)["datasets"].get(dataset, {}).get("days", {})
+    files = [
+        os.path.join(root, d["file"]) for d in days.values()
+        if (start_step is None or d["step_max"] >= start_step) and (end_step is None or d["step_min"] <= end_step)
+        and (min_prob is None or d["prob_max"] is None or d["prob_max"] >= min_prob)
+    ]
+    if not files:
+        return pd.DataFrame(columns=columns or [])
+    step = ds.field("step")
+    expr = []
+    if start_step is not None:
+        expr.append(step >= start_step)
+    if end_step is not None:
+        expr.append(step <= end_step)
+    if min_prob is not None:
+        expr.append(ds.field("fraud_prob_pred") >= min_prob)
+    flt = None
+    for e in expr:
+        flt = e if flt is None else flt & e
+    table = ds.dataset(files, format="parquet").to_table(columns=columns, filter=flt)
+    return _finalize(table.to_pandas())
+
+
+def with_archive(source: str, live: pd.DataFrame, root: str = ARCHIVE_ROOT) -> pd.DataFrame:
+    """
+    `live` (rows read from `source`, including `step`) preceded by the archived
+    days before its first step, in the live dtypes (integers widened when the
+    archive needs it).  `live` itself when nothing of the source is archived,
+    or when it has no `step` column (such a file was never archived by day).
+    """
+    name = dataset_name(source)
+    entry = load_catalog(root)["datasets"].get(name)
+    if not entry or not entry["days"] or entry["source"] != os.path.abspath(source) or "step" not in live.columns:
+        return live
+    end = int(live["step"].min()) - 1 if len(live) else None
+    if end is not None and min(d["step_min"] for d in entry["days"].values()) > end:
+        return live
+    old = read_history(name, end_step=end, columns=list(live.columns), root=root)
+    if old.empty or not len(live):
+        return old if len(old) else live
+    dtypes = {}
+    for c in live.columns:
+        a, b = live[c].dtype, old[c].dtype
+        both_int = a.kind in "iu" and b.kind in "iu"
+        dtypes[c] = np.promote_types(a, b) if both_int else a
+    return pd.concat([old.astype(dtypes), live.astype(dtypes)], ignore_index=True)
+
+
+def load_history(source: str, columns=None, root: str = ARCHIVE_ROOT) -> pd.DataFrame:
+    """pd.read_csv of `source` (only the `columns` it has, all when None) over the full history, archive included."""
+    wanted = None if columns is None else set(columns) | {"step"}
+    live = pd.read_csv(source, usecols=None if wanted is None else (lambda c: c in wanted))
+    df = with_archive(source, live, root)
+    if columns is not None and "step" not in columns:
+        df = df.drop(columns="step", errors="ignore")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive closed days of a transaction / prediction CSV")
+    parser.add_argument("source")
+    parser.add_argument("--root", default=ARCHIVE_ROOT)
+    parser.add_argument("--include-open", action="store_true", help="archive the last day as well")
+    parser.add_argument("--prune", action="store_true", help="drop archived days from the source CSV afterwards")
+    args = parser.parse_args()
+    src_bytes = os.path.getsize(args.source)
+    entry = archive_closed_days(args.source, args.root, include_open=args.include_open)
+    rows = sum(d["rows"] for d in entry["days"].values())
+    size = sum(d["bytes"] for d in entry["days"].values())
+    print(f"📊 {rows:,} rows in {len(entry['days'])} day files: {size / 1024 ** 2:,.1f} MB "
+          f"(source {src_bytes / 1024 ** 2:,.1f} MB)")
+    if args.prune:
+        prune_source(args.source, args.root)
+
+
+if __name__ == "__main__":
+    main()
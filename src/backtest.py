@@ -0,0 +1,346 @@
+"""
+Backtesting harness: replay the daily partitions through the full pipeline.
+
+Days are read in step order (`iter_pending_daily_frames`) and cut into
+micro-batches of `--batch-steps` steps.  Each batch goes through the same
+stages as the scoring service:
+
+    read      parse the day partition
+    enrich    FeatureStream account windows (sequential: it carries state)
+    score     build_local_graph + EdgeSAGE (predict_proba)
+    risk      composite_risk_index
+    classify  fraud patterns of the day's high-risk graph (once per day)
+
+`--speed` paces the feed in steps per second (0 = as fast as possible).
+With `--workers N`, score + risk run in N spawn processes while the parent
+keeps enriching, with at most 2N batches in flight.  Every stage duration
+goes into a latency histogram (also exported through src/tracing.py), and
+`isFraud` labels, when the partitions carry them, give recall / precision /
+accuracy at 0.5 next to what model/config.json reports for the test split.
+
+The report (JSON, plus a text summary) has a `results` list in the
+benchmarks format, so two runs compare with the regression gate:
+
+    python -m src.backtest --split "data/dataset_transaction_raw with feature_v2.0.csv" --folder backtest/days
+    python -m src.backtest --folder backtest/days --workers 2 --out backtest/report.json
+    python -m benchmarks.compare backtest/baseline.json backtest/report.json
+"""
+import argparse
+import json
+import os
+import resource
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from .gnn_core import BASE_DIR, CONFIG_PATH, MODEL_DIR, MODEL_PATH
+from .tracing import BUCKETS, HISTOGRAMS
+
+STAGES = ("read", "enrich", "score", "risk", "classify", "batch")
+BACKTEST_DIR = os.path.join(BASE_DIR, "backtest")
+LABEL = "isFraud"
+THRESHOLD = 0.5
+BALANCE_COLUMNS = ("oldbalanceOrg", "newbalanceOrig", "oldbalanceDest", "newbalanceDest")
+
+
+# ==================== 1️⃣ Scoring (inline or in a worker) ====================
+_scorer = {}
+
+
+def _init_scorer(model_dir: str, model_path: str, store_root: str = None, threads: int = None):
+    import torch
+    from .gnn_core import load_artifacts, load_model
+    from .risk_engine import composite_risk_index
+    from .shared_store import SharedStore
+    if threads:
+        torch.set_num_threads(threads)
+    store = SharedStore(store_root) if store_root else None
+    if store is not None and store.fresh("model", model_path):
+        _scorer["artifacts"], _scorer["model"] = store.model_artifacts(), store.load_model()
+    else:
+        _scorer["artifacts"] = load_artifacts(model_dir)
+        _scorer["model"] = load_model(_scorer["artifacts"], model_path)
+    # A₀ is read once; when the predictions file is missing keep composite_risk_index's 1.0 fallback
+    # instead of retrying the read (and printing the warning) on every batch.
+    composite_risk_index([0.5], [1.0], verbose=False)
+    if not hasattr(composite_risk_index, "_A0_cache"):
+        composite_risk_index._A0_cache = 1.0
+
+
+def _score_batch(enriched: pd.DataFrame):
+    """(probs, RI, {stage: seconds}) for one enriched batch."""
+    from .gnn_core import build_local_graph, predict_proba
+    from .risk_engine import composite_risk_index
+    art = _scorer["artifacts"]
+    t0 = time.perf_counter()
+    x, edge_index, edge_attr, _ = build_local_graph(enriched, art["node_scaler"], art["edge_scaler"])
+    probs = predict_proba(_scorer["model"], x, edge_index, edge_attr)
+    t1 = time.perf_counter()
+    ri = np.asarray(composite_risk_index(prob=probs, amount=enriched["amount"].astype(float).to_numpy(),
+                                         verbose=False)["RI"])
+    return probs, ri, {"score": t1 - t0, "risk": time.perf_counter() - t1}
+
+
+def _ready(_):
+    time.sleep(0.05)              # long enough for the pool to hand each warm-up task to its own worker
+    return os.getpid()
+
+
+class _Inline:
+    """Executor-shaped wrapper running batches in the calling process."""
+
+    class _Done:
+        def __init__(self, value):
+            self._value = value
+
+        def result(self):
+            return self._value
+
+    def submit(self, fn, *args):
+        return self._Done(fn(*args))
+
+    def shutdown(self, wait=True):
+        pass
+
+
+# ==================== 2️⃣ Metrics ====================
+class StageLatencies:
+    def __init__(self):
+        self.samples = {s: [] for s in STAGES}
+
+    def observe(self, stage: str, seconds: float):
+        self.samples[stage].append(seconds)
+        HISTOGRAMS.observe(f"backtest_{stage}", seconds)
+
+    def summary(self) -> dict:
+        out = {}
+        for stage, values in self.samples.items():
+            if not values:
+                continue
+            v = np.asarray(values)
+            out[stage] = {
+                "count": len(v), "total_s": round(float(v.sum()), 4), "mean_ms": round(1000 * float(v.mean()), 3),
+                **{f"p{q}_ms": round(1000 * float(np.percentile(v, q)), 3) for q in (50, 95, 99)},
+                "max_ms": round(1000 * float(v.max()), 3),
+                "buckets": {str(b): int((v <= b).sum()) for b in BUCKETS},
+            }
+        return out
+
+
+def detection_metrics(tp: int, fp: int, fn: int, tn: int) -> dict:
+    n = tp + fp + fn + tn
+    recall = tp / (tp + fn) if tp + fn else None
+    precision = tp / (tp + fp) if tp + fp else None
+    f1 = 2 * precision * recall / (precision + recall) if precision and recall else None
+    return {"tp": tp, "fp": fp, "fn": fn, "tn": tn, "recall": recall, "precision": precision, "f1": f1,
+            "accuracy": (tp + tn) / n if n else None}
+
+
+def reported_metrics(config_path: str = CONFIG_PATH) -> dict:
+    """What training reported for the test split (config.json has no precision)."""
+    try:
+        with open(config_path) as f:
+            cfg = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {"recall": cfg.get("Final_Test_FraudRecall"), "accuracy": cfg.get("Final_Test_OverallAcc"),
+            "precision": cfg.get("Final_Test_FraudPrecision")}
+
+
+# ==================== 3️⃣ Replay ====================
+def _batches(day: pd.DataFrame, batch_steps: int):
+    key = day["step"].to_numpy() // batch_steps
+    cuts = np.flatnonzero(np.diff(key)) + 1
+    return np.split(np.arange(len(day)), cuts)
+
+
+def _classify_day(day: pd.DataFrame, probs: np.ndarray) -> dict:
+    from .compact_graph import CompactGraph
+    from .graph_tool import classify_fraud_patterns
+    from .temporal_graph import _id_strings
+    G = CompactGraph.from_arrays(_id_strings(day["orig_id"]), _id_strings(day["dest_id"]), probs,
+                                 day["amount"].astype(float).to_numpy(), day["transaction_id"].to_numpy()
+                                 if "transaction_id" in day.columns else None, THRESHOLD)
+    labels = classify_fraud_patterns(G, risk_threshold=THRESHOLD)
+    return pd.Series(list(labels.values()), dtype=object).value_counts().to_dict()
+
+
+def run_backtest(folder: str = "daily_data", workers: int = 0, speed: float = 0.0, batch_steps: int = 1,
+                 max_days: int = None, model_dir: str = MODEL_DIR, model_path: str = MODEL_PATH,
+                 shared_store: str = None, warm_history: str = None) -> dict:
+    """Replay the partitions in `folder`; returns the report dict."""
+    import contextlib
+    import io
+    from .feature_stream import FeatureStream
+    from .state_checkpoint import iter_pending_daily_frames
+
+    stream = FeatureStream()
+    if warm_history:
+        from .dataset_loader import load_dataset
+        stream.warm_start(load_dataset(warm_history, columns=["step", "orig_id", "dest_id", "amount"]))
+    t0 = time.perf_counter()
+    if workers > 0:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"), initializer=_init_scorer,
+                                   initargs=(model_dir, model_path, shared_store, 1))
+        list(pool.map(_ready, range(workers)))         # model loads stay out of the batch latencies
+    else:
+        _init_scorer(model_dir, model_path, shared_store)
+        pool = _Inline()
+    from . import compact_graph, graph_tool  # noqa: F401  (classify imports outside the first day's timing)
+    startup = time.perf_counter() - t0
+    lat = StageLatencies()
+    totals, per_day, patterns = np.zeros(4, dtype=np.int64), [], {}
+    n_tx, missing_balances, labelled = 0, set(), True
+    t_start = time.perf_counter()
+    first_step = None
+    days = iter_pending_daily_frames(None, os.path.abspath(folder))
+    try:
+        while max_days is None or len(per_day) < max_days:
+            t0 = time.perf_counter()
+            day = next(days, None)
+            if day is None:
+                break
+            lat.observe("read", time.perf_counter() - t0)
+            day = day.reset_index(drop=True)
+            for col in BALANCE_COLUMNS:
+                if col not in day.columns:
+                    missing_balances.add(col)
+                    day[col] = 0.0
+            labels = day.pop(LABEL).to_numpy().astype(int) if LABEL in day.columns else None
+            labelled &= labels is not None
+            records = day.to_dict("records")
+            probs, ri = np.empty(len(day), dtype=np.float32), np.empty(len(day))
+            inflight = deque()
+
+            def collect(entry):
+                pos, fut, submitted = entry
+                p, r, stages = fut.result()
+                probs[pos], ri[pos] = p, r
+                for stage, s in stages.items():
+                    lat.observe(stage, s)
+                lat.observe("batch", time.perf_counter() - submitted)
+
+            for pos in _batches(day, batch_steps):
+                step = int(day["step"].iat[pos[0]])
+                if speed > 0:
+                    first_step = step if first_step is None else first_step
+                    wait = (step - first_step) / speed - (time.perf_counter() - t_start)
+                    if wait > 0:
+                        time.sleep(wait)
+                submitted = time.perf_counter()
+                enriched = pd.DataFrame([stream.process(records[i]) for i in pos])
+                lat.observe("enrich", time.perf_counter() - submitted)
+                inflight.append((pos, pool.submit(_score_batch, enriched), submitted))
+                while len(inflight) > 2 * workers:
+                    collect(inflight.popleft())
+            while inflight:
+                collect(inflight.popleft())
+
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for name, count in _classify_day(day, probs).items():
+                    patterns[name] = patterns.get(name, 0) + int(count)
+            lat.observe("classify", time.perf_counter() - t0)
+
+            n_tx += len(day)
+            row = {"first_step": int(day["step"].iat[0]), "transactions": len(day),
+                   "flagged": int((probs > THRESHOLD).sum()), "high_risk_ri": int((ri >= 0.9).sum())}
+            if labels is not None:
+                pred = probs > THRESHOLD
+                counts = np.array([(pred & (labels == 1)).sum(), (pred & (labels == 0)).sum(),
+                                   (~pred & (labels == 1)).sum(), (~pred & (labels == 0)).sum()])
+                totals += counts
+                row.update({k: v for k, v in detection_metrics(*map(int, counts)).items() if k in ("recall", "precision")})
+            per_day.append(row)
+            print(f"   day {row['first_step'] // 24:>3}: {len(day):>8,} tx  flagged {row['flagged']:>6,}"
+                  + (f"  recall {row['recall']:.3f}" if row.get("recall") is not None else ""))
+    finally:
+        pool.shutdown(wait=True)
+    wall = time.perf_counter() - t_start
+
+    if missing_balances:
+        print(f"⚠️ Partitions have no {sorted(missing_balances)}; balance features were replayed as 0.")
+    reported = reported_metrics(os.path.join(model_dir, "config.json"))
+    quality = detection_metrics(*map(int, totals)) if labelled and n_tx else None
+    if quality is not None:
+        quality["reported"] = reported
+        quality["recall_delta"] = (quality["recall"] - reported["recall"]
+                                   if quality["recall"] is not None and reported.get("recall") is not None else None)
+    stages = lat.summary()
+    peak = round(max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+                 / 1024, 1)
+    return {
+        "meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "folder": os.path.abspath(folder),
+                 "workers": workers, "speed": speed, "batch_steps": batch_steps, "cpu_count": os.cpu_count(),
+                 "model_path": model_path, "startup_s": round(startup, 3)},
+        "days": len(per_day), "transactions": n_tx, "wall_s": round(wall, 3),
+        "throughput_tx_s": round(n_tx / wall, 1) if wall > 0 else None,
+        "stages": stages, "quality": quality, "patterns": patterns, "per_day": per_day,
+        # benchmarks/compare.py format: one entry per stage, wall_s = total time spent in it
+        "results": [{"case": f"backtest_{s}", "rows": n_tx, "wall_s": v["total_s"], "peak_rss_mb": peak}
+                    for s, v in stages.items()]
+                   + [{"case": "backtest_end_to_end", "rows": n_tx, "wall_s": round(wall, 6), "peak_rss_mb": peak}],
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [f"📊 Backtest: {report['days']} days, {report['transactions']:,} transactions in {report['wall_s']:.1f}s "
+             f"({report['throughput_tx_s'] or 0:,.0f} tx/s, {report['meta']['workers']} workers)",
+             f"   {'stage':<9} {'count':>7} {'total s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+    for stage, s in report["stages"].items():
+        lines.append(f"   {stage:<9} {s['count']:>7,} {s['total_s']:>9.2f} {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} "
+                     f"{s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}")
+    q = report["quality"]
+    if q is None:
+        lines.append("   ⚠️ No isFraud labels in the partitions: detection quality not measured.")
+    else:
+        fmt = lambda v: "n/a" if v is None else f"{v:.4f}"  # noqa: E731
+        rep = q["reported"]
+        lines.append(f"   recall {fmt(q['recall'])} (config.json {fmt(rep.get('recall'))})  "
+                     f"precision {fmt(q['precision'])} (config.json {fmt(rep.get('precision'))})  "
+                     f"accuracy {fmt(q['accuracy'])} (config.json {fmt(rep.get('accuracy'))})")
+    if report["patterns"]:
+        lines.append("   patterns: " + ", ".join(f"{k} {v:,}" for k, v in sorted(report["patterns"].items())))
+    return "\n".join(lines)
+
+
+# ==================== 4️⃣ CLI ====================
+def main():
+    parser = argparse.ArgumentParser(description="Replay daily partitions through enrichment, scoring, RI and patterns")
+    parser.add_argument("--folder", default="daily_data", help="daily_transactions_*.csv partitions")
+    parser.add_argument("--split", default=None, help="first split this CSV (with step, ideally isFraud) into --folder")
+    parser.add_argument("--workers", type=int, default=0, help="scoring processes (0 = inline)")
+    parser.add_argument("--speed", type=float, default=0.0, help="steps (hours) per second, 0 = unthrottled")
+    parser.add_argument("--batch-steps", type=int, default=1, help="steps per micro-batch")
+    parser.add_argument("--days", type=int, default=None, help="replay at most this many days")
+    parser.add_argument("--warm-history", default=None, help="CSV folded into the account windows first")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--shared-store", default=os.environ.get("PULSE4_SHARED_STORE"))
+    parser.add_argument("--out", default=None, help="JSON report path (a .txt summary is written next to it)")
+    args = parser.parse_args()
+
+    if args.split:
+        from .data_utils import split_dataset_by_day
+        split_dataset_by_day(args.split, os.path.abspath(args.folder))
+        print(f"✅ Split {args.split} into {args.folder}")
+    report = run_backtest(args.folder, args.workers, args.speed, args.batch_steps, args.days, args.model_dir,
+                          args.model_path, args.shared_store, args.warm_history)
+    text = format_report(report)
+    print(text)
+    out = args.out or os.path.join(BACKTEST_DIR, f"report_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.splitext(out)[0] + ".txt", "w") as f:
+        f.write(text + "\n")
+    print(f"💾 Report written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Near-duplicate and burst index for incoming transactions.
+
+`compute_behavior_mode` only sees an account's 24h count, so a run of
+identical transfers to one payee, or a fan-out to many payees within a few
+hours, looks like any other busy account.  `BurstIndex` keeps two sliding
+windows in memory and attaches explicit features at ingest time, before the
+GNN:
+
+* pair index: (orig_id, dest_id, rounded amount) -> steps of the prior
+  transfers within DUP_WINDOW steps (near-duplicates);
+* origin buckets: per origin, one bucket per step with its destination
+  counts, covering the last BURST_WINDOW steps (fan-out bursts).
+
+Both windows are evicted through FIFO queues ordered by step, so every event
+is inserted once and evicted once: O(1) amortised per transaction, with
+memory bounded by the traffic inside the windows.  Late events are clamped
+to the current step, like the merged buckets in FeatureStream.
+
+    index = BurstIndex()
+    feats = index.process(orig_id, dest_id, step, amount)   # features, then insert
+
+    feats = index.preview(rows)     # a batch's features, index unchanged
+    index.commit(rows)              # insert it once the batch has been scored
+"""
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+DUP_WINDOW = 24               # steps (hours) a repeated transfer counts as a near-duplicate
+BURST_WINDOW = 3              # steps for the fan-out window
+AMOUNT_QUANTUM = 1.0          # amounts are rounded to this unit before keying
+FANOUT_MIN = 5                # distinct destinations in BURST_WINDOW that flag a burst
+
+FEATURE_NAMES = [
+    "dup_pair_count", "dup_last_gap", "orig_burst_tx", "orig_burst_dests",
+    "orig_same_step_tx", "dup_flag", "burst_flag",
+]
+
+
+class _Origin:
+    """Step buckets [step, count, {dest: count}] of one origin inside BURST_WINDOW."""
+
+    __slots__ = ("buckets", "n", "dests")
+
+    def __init__(self):
+        self.buckets = deque()
+        self.n = 0
+        self.dests = {}
+
+    def evict(self, cutoff: int):
+        buckets, dests = self.buckets, self.dests
+        while buckets and buckets[0][0] <= cutoff:
+            _, count, bucket_dests = buckets.popleft()
+            self.n -= count
+            for d, c in bucket_dests.items():
+                left = dests[d] - c
+                if left:
+                    dests[d] = left
+                else:
+                    del dests[d]
+
+    def add(self, step: int, dest: str):
+        buckets = self.buckets
+        if buckets and buckets[-1][0] == step:
+            b = buckets[-1]
+        else:
+            b = [step, 0, {}]
+            buckets.append(b)
+        b[1] += 1
+        b[2][dest] = b[2].get(dest, 0) + 1
+        self.n += 1
+        self.dests[dest] = self.dests.get(dest, 0) + 1
+
+
+class BurstIndex:
+    """Sliding-window pair index and per-origin step buckets; `process` is O(1) amortised."""
+
+    def __init__(self, dup_window: int = DUP_WINDOW, burst_window: int = BURST_WINDOW,
+                 amount_quantum: float = AMOUNT_QUANTUM, fanout_min: int = FANOUT_MIN):
+        self.dup_window = dup_window
+        self.burst_window = burst_window
+        self.amount_quantum = amount_quantum
+        self.fanout_min = fanout_min
+        self.pairs = {}                  # (orig, dest, amount key) -> deque of steps
+        self.origins = {}                # orig -> _Origin
+        self._pair_fifo = deque()        # (step, pair key), in insertion order
+        self._orig_fifo = deque()        # (step, orig)
+        self.clock = None
+        self.events = 0
+        self.late_events = 0
+        self.duplicates = 0
+        self.bursts = 0
+
+    def _key(self, orig: str, dest: str, amount: float):
+        return orig, dest, int(round(amount / self.amount_quantum))
+
+    def _advance(self, step: int) -> int:
+        if self.clock is not None and step < self.clock:
+            self.late_events += 1
+            step = self.clock
+        self.clock = step
+
+        cutoff = step - self.dup_window
+        fifo, pairs = self._pair_fifo, self.pairs
+        while fifo and fifo[0][0] <= cutoff:
+            key = fifo.popleft()[1]
+            steps = pairs[key]
+            steps.popleft()
+            if not steps:
+                del pairs[key]
+
+        cutoff = step - self.burst_window
+        fifo, origins = self._orig_fifo, self.origins
+        while fifo and fifo[0][0] <= cutoff:
+            orig = fifo.popleft()[1]
+            o = origins.get(orig)
+            if o is not None:
+                o.evict(cutoff)
+                if not o.n:
+                    del origins[orig]
+        return step
+
+    def _insert(self, step: int, orig: str, dest: str, key):
+        steps = self.pairs.get(key)
+        if steps is None:
+            steps = self.pairs[key] = deque()
+        steps.append(step)
+        self._pair_fifo.append((step, key))
+        o = self.origins.get(orig)
+        if o is None:
+            o = self.origins[orig] = _Origin()
+        o.add(step, dest)
+        self._orig_fifo.append((step, orig))
+        self.events += 1
+
+    def observe(self, orig_id, dest_id, step: int, amount: float):
+        """Insert one transaction without computing features (warm-up)."""
+        orig, dest = str(orig_id), str(dest_id)
+        step = self._advance(int(step))
+        self._insert(step, orig, dest, self._key(orig, dest, float(amount)))
+
+    def process(self, orig_id, dest_id, step: int, amount: float) -> dict:
+        """Features of one transaction against the windows (before it), then insert it."""
+        orig, dest = str(orig_id), str(dest_id)
+        step = self._advance(int(step))
+        key = self._key(orig, dest, float(amount))
+
+        steps = self.pairs.get(key)
+        dup_count = len(steps) if steps else 0
+        o = self.origins.get(orig)
+        if o is not None:
+            burst_tx, burst_dests = o.n, len(o.dests) + (dest not in o.dests)
+            same_step = o.buckets[-1][1] if o.buckets[-1][0] == step else 0
+        else:
+            burst_tx, burst_dests, same_step = 0, 1, 0
+        feats = {
+            "dup_pair_count": dup_count,
+            "dup_last_gap": step - steps[-1] if dup_count else -1,
+            "orig_burst_tx": burst_tx,
+            "orig_burst_dests": burst_dests,          # including this transaction's payee
+            "orig_same_step_tx": same_step,
+            "dup_flag": int(dup_count > 0),
+            "burst_flag": int(burst_dests >= self.fanout_min),
+        }
+        self.duplicates += feats["dup_flag"]
+        self.bursts += feats["burst_flag"]
+        self._insert(step, orig, dest, key)
+        return feats
+
+    def annotate(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Process the rows of `df` in order; returns the feature columns aligned to df.index."""
+        rows = [self.process(o, d, s, a) for o, d, s, a in zip(
+            df["orig_id"].to_numpy(), df["dest_id"].to_numpy(), df["step"].to_numpy(), df["amount"].to_numpy())]
+        return pd.DataFrame(rows, columns=FEATURE_NAMES, index=df.index)
+
+    def preview(self, rows) -> list:
+        """
+        Features `process` would give each (orig_id, dest_id, step, amount) row
+        in order, without changing the index: the pair and origin windows the
+        rows touch are copied into a scratch index, which processes the batch.
+        """
+        scratch = BurstIndex(self.dup_window, self.burst_window, self.amount_quantum, self.fanout_min)
+        scratch.clock = self.clock
+        for orig_id, dest_id, _, amount in rows:
+            orig, dest = str(orig_id), str(dest_id)
+            key = self._key(orig, dest, float(amount))
+            steps = self.pairs.get(key)
+            if steps is not None and key not in scratch.pairs:
+                scratch.pairs[key] = deque(steps)
+                scratch._pair_fifo.extend((s, key) for s in steps)
+            o = self.origins.get(orig)
+            if o is not None and orig not in scratch.origins:
+                copy = scratch.origins[orig] = _Origin()
+                copy.buckets = deque([b[0], b[1], dict(b[2])] for b in o.buckets)
+                copy.n, copy.dests = o.n, dict(o.dests)
+                scratch._orig_fifo.extend((b[0], orig) for b in o.buckets)
+        scratch._pair_fifo = deque(sorted(scratch._pair_fifo, key=lambda e: e[0]))
+        scratch._orig_fifo = deque(sorted(scratch._orig_fifo, key=lambda e: e[0]))
+        return [scratch.process(o, d, s, a) for o, d, s, a in rows]
+
+    def commit(self, rows):
+        """Insert (orig_id, dest_id, step, amount) rows whose features came from `preview`."""
+        for o, d, s, a in rows:
+            self.process(o, d, s, a)
+
+    def warm_start(self, history_df: pd.DataFrame):
+        """Fold the tail of a history frame (the rows still inside the windows) into the index."""
+        if history_df is None or history_df.empty:
+            return self
+        last = int(history_df["step"].max())
+        tail = history_df[history_df["step"] > last - max(self.dup_window, self.burst_window)]
+        tail = tail.sort_values("step", kind="stable")
+        for o, d, s, a in zip(tail["orig_id"].astype(str).to_numpy(), tail["dest_id"].astype(str).to_numpy(),
+                              tail["step"].to_numpy(np.int64), tail["amount"].to_numpy(np.float64)):
+            self.observe(o, d, s, a)
+        print(f"✅ Burst index warmed with {len(tail)} transactions up to step {last}.")
+        return self
+
+    def stats(self) -> dict:
+        return {
+            "events": self.events,
+            "late_events": self.late_events,
+            "clock": self.clock,
+            "pair_keys": len(self.pairs),
+            "active_origins": len(self.origins),
+            "duplicates": self.duplicates,
+            "bursts": self.bursts,
+        }
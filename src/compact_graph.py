@@ -0,0 +1,229 @@
+"""
+Compact undirected transaction graph for the risk-network paths.
+
+An `nx.Graph` keeps a dict per node, a dict per adjacency entry and an
+attribute dict per edge, which comes to several hundred bytes per edge.
+`CompactGraph` keeps integer node ids, a CSR adjacency and parallel typed
+edge arrays instead (int32 endpoints, float32 prob / amount, int64
+transaction id, bool fraud flag): about 40 bytes per edge.
+
+Semantics follow `nx.Graph.add_edges_from`: one edge per unordered pair,
+carrying the attributes of its last occurrence, in order of first
+occurrence.  Degree, components, triangles / clustering and the nodes on
+cycles (the node set of `nx.cycle_basis`, via bridges of one DFS tree) are
+computed on the arrays.  `to_networkx` materialises a real graph, optionally
+restricted to a node mask, for anything else.
+
+    cg = tg.risk_compact(0, 167, min_prob=0.5)
+    deg = cg.degree()
+    G = cg.to_networkx(deg > 2)
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components, depth_first_order
+
+TRIANGLE_CHUNK = 8192        # rows of A per sparse product in triangles()
+
+
+def _tx_array(tx) -> np.ndarray:
+    """Transaction ids as int64 when they are all integral, otherwise as strings."""
+    num = pd.to_numeric(pd.Series(tx), errors="coerce")
+    if len(num) and num.notna().all() and (num % 1 == 0).all():
+        return num.to_numpy(np.int64)
+    return np.asarray(tx).astype(str).astype(object)
+
+
+class CompactGraph:
+    def __init__(self, names: np.ndarray, u: np.ndarray, v: np.ndarray, prob: np.ndarray, amount: np.ndarray,
+                 tx: np.ndarray, fraud: np.ndarray):
+        self.names = names
+        self.u = u.astype(np.int32, copy=False)
+        self.v = v.astype(np.int32, copy=False)
+        self.prob = prob.astype(np.float32, copy=False)
+        self.amount = amount.astype(np.float32, copy=False)
+        self.tx = tx
+        self.fraud = fraud.astype(bool, copy=False)
+        self.fraud_type = None            # filled by graph_tool.classify_fraud_patterns
+        self._index = None
+
+        n, m = len(names), len(self.u)
+        loop = self.u == self.v
+        a = np.concatenate([self.u, self.v[~loop]])
+        b = np.concatenate([self.v, self.u[~loop]])
+        e = np.concatenate([np.arange(m, dtype=np.int32), np.flatnonzero(~loop).astype(np.int32)])
+        order = np.argsort(a, kind="stable")
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(a, minlength=n), out=self.indptr[1:])
+        self.indices = b[order]
+        self.edge_ids = e[order]
+        self.loops = np.bincount(self.u[loop], minlength=n).astype(np.int32)
+
+    # ---------- construction ----------
+    @classmethod
+    def from_codes(cls, src, dst, names, prob, amount, tx, risk_threshold: float = 0.5) -> "CompactGraph":
+        """
+        Graph over edges given as codes into `names` (e.g. TemporalGraph.src/dst).
+        Only the nodes that appear are kept, renumbered in order of first appearance.
+        """
+        src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+        prob = np.asarray(prob, dtype=np.float64)
+        m = len(src)
+        if m == 0:
+            empty = np.empty(0, dtype=np.int32)
+            return cls(np.empty(0, dtype=object), empty, empty, np.empty(0), np.empty(0), _tx_array([]),
+                       np.empty(0, dtype=bool))
+        n_all = int(max(src.max(), dst.max())) + 1
+        keys = np.minimum(src, dst) * n_all + np.maximum(src, dst)
+        _, first = np.unique(keys, return_index=True)
+        _, rfirst = np.unique(keys[::-1], return_index=True)
+        last = m - 1 - rfirst
+        order = np.argsort(first, kind="stable")
+        first, last = first[order], last[order]
+
+        local, used = pd.factorize(np.column_stack([src[first], dst[first]]).ravel())
+        return cls(
+            np.asarray(names)[used].astype(object), local[0::2], local[1::2], prob[last],
+            np.asarray(amount)[last], _tx_array(np.asarray(tx)[last]), prob[last] > risk_threshold,
+        )
+
+    @classmethod
+    def from_arrays(cls, orig, dest, prob, amount=None, tx=None, risk_threshold: float = 0.5) -> "CompactGraph":
+        """Graph from per-edge account-id arrays (already normalised strings)."""
+        m = len(orig)
+        codes, names = pd.factorize(np.concatenate([np.asarray(orig, dtype=object), np.asarray(dest, dtype=object)]))
+        return cls.from_codes(
+            codes[:m], codes[m:], names, prob,
+            np.zeros(m) if amount is None else amount,
+            np.full(m, "N/A", dtype=object) if tx is None else tx,
+            risk_threshold,
+        )
+
+    # ---------- basic queries ----------
+    def number_of_nodes(self) -> int:
+        return len(self.names)
+
+    def number_of_edges(self) -> int:
+        return len(self.u)
+
+    @property
+    def index(self) -> pd.Index:
+        if self._index is None:
+            self._index = pd.Index(self.names)
+        return self._index
+
+    def __contains__(self, name) -> bool:
+        return name in self.index
+
+    def degree(self) -> np.ndarray:
+        """Per-node degree, self-loops counted twice (as in NetworkX)."""
+        return np.diff(self.indptr).astype(np.int64) + self.loops
+
+    def neighbors(self, name) -> np.ndarray:
+        i = self.index.get_loc(name)
+        return self.names[self.indices[self.indptr[i]:self.indptr[i + 1]]]
+
+    def edges(self, data: bool = False):
+        """(u, v) or (u, v, attrs) tuples with the attribute names of TemporalGraph.to_networkx."""
+        names = self.names
+        if not data:
+            yield from zip(names[self.u], names[self.v])
+            return
+        for u, v, p, t, a, f in zip(names[self.u], names[self.v], self.prob.tolist(), self.tx.tolist(),
+                                    self.amount.tolist(), self.fraud.tolist()):
+            t = str(t)
+            yield u, v, {"fraud_prob_pred": p, "prob": p, "tx_id": t, "tx": t, "amount": a, "fraud": f}
+
+    def nbytes(self) -> int:
+        """Bytes held by the arrays (node-name strings counted by pointer)."""
+        arrays = (self.names, self.u, self.v, self.prob, self.amount, self.tx, self.fraud,
+                  self.indptr, self.indices, self.edge_ids, self.loops)
+        return int(sum(a.nbytes for a in arrays))
+
+    # ---------- structure ----------
+    def subgraph(self, mask: np.ndarray) -> "CompactGraph":
+        """Induced subgraph on the nodes where `mask` is True (node order kept)."""
+        keep = mask[self.u] & mask[self.v]
+        new_id = np.cumsum(mask) - 1
+        sub = CompactGraph(self.names[mask], new_id[self.u[keep]], new_id[self.v[keep]], self.prob[keep],
+                           self.amount[keep], self.tx[keep], self.fraud[keep])
+        return sub
+
+    def adjacency(self, loops: bool = True) -> sparse.csr_matrix:
+        """Symmetric 0/1 adjacency matrix."""
+        n = len(self.names)
+        A = sparse.csr_matrix((np.ones(len(self.indices), dtype=np.float64), self.indices, self.indptr), shape=(n, n))
+        if not loops:
+            A.setdiag(0)
+            A.eliminate_zeros()
+        return A
+
+    def components(self):
+        """(n_components, label per node)."""
+        return connected_components(self.adjacency(), directed=False)
+
+    def triangles(self) -> np.ndarray:
+        """Triangles through each node; A @ A is formed a row chunk at a time to bound memory."""
+        A = self.adjacency(loops=False)
+        out = np.zeros(A.shape[0])
+        for lo in range(0, A.shape[0], TRIANGLE_CHUNK):
+            rows = A[lo:lo + TRIANGLE_CHUNK]
+            out[lo:lo + TRIANGLE_CHUNK] = np.asarray((rows @ A).multiply(rows).sum(axis=1)).ravel()
+        return out / 2
+
+    def clustering(self) -> np.ndarray:
+        """Local clustering coefficient per node (nx.clustering for simple graphs)."""
+        d = np.diff(self.indptr) - (self.loops > 0)
+        denom = d * (d - 1.0)
+        return np.divide(2 * self.triangles(), denom, out=np.zeros(len(d)), where=denom > 0)
+
+    def to_networkx(self, mask: np.ndarray = None) -> "nx.Graph":
+        """Materialised nx.Graph (restricted to the nodes in `mask`) for NetworkX-only algorithms."""
+        import networkx as nx
+        g = self if mask is None else self.subgraph(mask)
+        G = nx.Graph()
+        G.add_nodes_from(g.names)
+        G.add_edges_from(g.edges(data=True))
+        return G
+
+    def cycle_nodes(self) -> np.ndarray:
+        """
+        Node mask of the nodes on some cycle, i.e. the nodes nx.cycle_basis
+        reports: self-loop nodes and endpoints of non-bridge edges.  One DFS
+        (a virtual root joins the components) gives preorder numbers; a tree
+        edge parent(x) - x is a bridge unless a back edge from x's subtree
+        reaches above x.
+        """
+        n = len(self.names)
+        out = self.loops > 0
+        simple = self.u != self.v
+        u, v = self.u[simple].astype(np.int64), self.v[simple].astype(np.int64)
+        if not len(u):
+            return out
+        _, comp = self.components()
+        _, roots = np.unique(comp, return_index=True)
+        rows = np.concatenate([u, v, np.full(len(roots), n)])
+        cols = np.concatenate([v, u, roots])
+        G = sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n + 1, n + 1))
+        order, pred = depth_first_order(G, n, directed=True, return_predecessors=True)
+        pre = np.empty(n + 1, dtype=np.int64)
+        pre[order] = np.arange(n + 1)
+
+        # Back edges: every non-tree edge of a DFS tree joins a node to one of its ancestors.
+        tree = (pred[u] == v) | (pred[v] == u)
+        a, b = np.where(pre[u] > pre[v], u, v)[~tree], np.where(pre[u] > pre[v], v, u)[~tree]
+        out[u[~tree]] = True
+        out[v[~tree]] = True
+        low = pre.copy()
+        np.minimum.at(low, a, pre[b])
+        low, parent = low.tolist(), pred.tolist()
+        for x in reversed(order.tolist()):
+            p = parent[x]
+            if p >= 0 and low[x] < low[p]:
+                low[p] = low[x]
+        low = np.asarray(low)
+        child = np.where(pred[u] == v, u, v)[tree]
+        covered = low[child] < pre[child]
+        out[u[tree][covered]] = True
+        out[v[tree][covered]] = True
+        return out
@@ -2,7 +2,12 @@ import os
 import pandas as pd
 from datetime import datetime, timedelta
 
+from .risk_index import get_risk_index
+from .tracing import span, traced
+
 DAILY_FOLDER = "daily_data"
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREDICTIONS_PATH = os.path.join(BASE_DIR, "data", "test_predictions_v2.0.csv")
 
 def _resolve_folder(folder: str = DAILY_FOLDER) -> str:
     """Resolve daily_data path robustly whether under project root or src/."""
@@ -67,30 +72,34 @@ def build_feature_store(csv_path: str) -> dict:
 
 
 
+@traced()
 def search_prob_amount(tx_id):
     """
     Search for the fraud probability and amount based on the transaction ID from the test_predictions_v2.0.csv file.
     """
-    # Correct path to the CSV file (use the correct location)
-    file_path = os.path.join("/home/yjing/Pulse4_Project/data", "test_predictions_v2.0.csv")
+    row = search_transaction(tx_id)
+    if row is None:
+        return None, None
+    return row["fraud_prob_pred"], row["amount"]
 
-    try:
-        # Read the CSV file
-        df = pd.read_csv(file_path)
+def search_transaction(tx_id) -> dict:
+    """
+    The prediction row (fraud_prob_pred, amount, orig_id, dest_id, ...) for a transaction ID, or None.
+    Binary search in the cached RiskIndex (the shared store's copy when one is attached).
+    """
+    file_path = PREDICTIONS_PATH
 
-        # Search for the transaction ID in the 'transaction_id' column
-        row = df[df['transaction_id'] == int(tx_id)]
+    try:
+        with span("risk_index_find"):
+            row = get_risk_index(file_path).find(tx_id)
 
-        if not row.empty:
-            # Extract fraud probability and amount
-            fraud_prob_pred = row['fraud_prob_pred'].values[0]
-            amount = row['amount'].values[0]
-            return fraud_prob_pred, amount
+        if row is not None:
+            return row
         else:
             # If transaction ID is not found
             print(f"⚠️ Transaction ID {tx_id} not found in the dataset.")
-            return None, None
+            return None
     except Exception as e:
         print(f"⚠️ Error reading the CSV file or processing the data: {e}")
-        return None, None
+        return None
 
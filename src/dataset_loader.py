@@ -0,0 +1,218 @@
+"""
+Schema-aware loader for the raw feature dataset.
+
+`pd.read_csv` with default dtypes turns ids and behaviour modes into
+object/int64 columns and every float into float64.  This loader applies an
+explicit schema while parsing (int32 steps and counts, float32 amounts and
+ratios, categorical behaviour modes, integer ids), supports column projection
+and chunked iteration, and writes a Parquet cache (`<csv folder>/cache/`) after
+the first full parse.  Later loads read the cache (column-projected) instead of
+re-parsing the CSV.
+
+The schema is fixed up front by the column maps below, never inferred from
+a chunk's values, so every chunk (and every row group of the cache) has the
+same types; columns outside the maps are kept at int64 / float64.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, "data", "dataset_transaction_raw with feature_v2.0.csv")
+CACHE_DIRNAME = "cache"          # created next to the source CSV, e.g. data/cache/
+CACHE_VERSION = 2              # 2: schema pinned by the column maps
+
+BEHAVIOR_MODES = ["active", "normal", "low_freq", "bursty"]
+MODE_DTYPE = pd.CategoricalDtype(BEHAVIOR_MODES)
+
+ID_COLUMNS = ["orig_id", "dest_id"]
+INT_COLUMNS = {
+    "transaction_id": "int64",
+    "step": "int32",
+    "hour": "int8",
+    "time_period": "int8",
+    "isFraud": "int8",
+    "isFraud_pred": "int8",
+    "orig_tx_24h": "int32",
+    "orig_tx_72h": "int32",
+    "orig_tx_168h": "int32",
+    "dest_tx_24h": "int32",
+    "dest_tx_72h": "int32",
+    "dest_tx_168h": "int32",
+}
+FLOAT_COLUMNS = [
+    "amount", "oldbalanceOrg", "newbalanceOrig", "oldbalanceDest", "newbalanceDest",
+    "orig_balance_ratio", "dest_balance_ratio",
+    "orig_avg_amt_24h", "orig_30d_mean", "orig_30d_var", "orig_curr_volatility",
+    "dest_avg_amt_24h", "dest_30d_mean", "dest_30d_var", "dest_curr_volatility",
+    "fraud_prob_pred",
+]
+CATEGORY_COLUMNS = {
+    "orig_behavior_mode": MODE_DTYPE,
+    "dest_behavior_mode": MODE_DTYPE,
+}
+
+
+def read_header(path: str) -> list:
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _csv_dtypes(columns) -> dict:
+    """dtype map for pd.read_csv: ids as int64 (downcast after load), floats parsed as float64, unknowns inferred."""
+    dtypes = {}
+    for c in columns:
+        if c in ID_COLUMNS:
+            dtypes[c] = "int64"
+        elif c in INT_COLUMNS:
+            dtypes[c] = INT_COLUMNS[c]
+        elif c in CATEGORY_COLUMNS:
+            dtypes[c] = CATEGORY_COLUMNS[c]
+        elif c in FLOAT_COLUMNS:
+            dtypes[c] = "float64"
+    return dtypes
+
+
+def _optimize(chunk: pd.DataFrame, float_dtype=np.float32) -> pd.DataFrame:
+    """Cast the known float columns to `float_dtype`; unknown numeric columns are widened to int64 / float64."""
+    for c in chunk.columns:
+        if c in ID_COLUMNS or c in INT_COLUMNS or c in CATEGORY_COLUMNS:
+            continue
+        kind = chunk[c].dtype.kind
+        if c in FLOAT_COLUMNS:
+            chunk[c] = chunk[c].astype(float_dtype)
+        elif kind == "f":
+            chunk[c] = chunk[c].astype(np.float64)
+        elif kind in "iub":
+            chunk[c] = chunk[c].astype(np.int64)
+    return chunk
+
+
+def arrow_schema(schema: pa.Schema, float_type=pa.float32()) -> pa.Schema:
+    """
+    The fixed Parquet schema for the columns of `schema`: ids int64, the
+    INT / FLOAT / CATEGORY maps, unknown integers int64 and unknown floats
+    float64 (only non-numeric unknown columns keep their own type).
+    """
+    fields = []
+    for f in schema:
+        c = f.name
+        if c in ID_COLUMNS:
+            t = pa.int64()
+        elif c in INT_COLUMNS:
+            t = pa.from_numpy_dtype(np.dtype(INT_COLUMNS[c]))
+        elif c in CATEGORY_COLUMNS:
+            t = pa.dictionary(pa.int8(), pa.string())
+        elif c in FLOAT_COLUMNS:
+            t = float_type
+        elif pa.types.is_integer(f.type) or pa.types.is_boolean(f.type):
+            t = pa.int64()
+        elif pa.types.is_floating(f.type):
+            t = pa.float64()
+        else:
+            t = f.type
+        fields.append(pa.field(c, t))
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+def _finalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcast ids to int32 when they fit and pin the behaviour-mode categories."""
+    for c in ID_COLUMNS:
+        if c in df.columns and df[c].dtype == np.int64 and len(df) and df[c].max() < 2 ** 31 and df[c].min() >= 0:
+            df[c] = df[c].astype(np.int32)
+    for c, dtype in CATEGORY_COLUMNS.items():
+        if c in df.columns and df[c].dtype != dtype:
+            df[c] = df[c].astype(dtype)
+    return df
+
+
+def cache_path(path: str) -> str:
+    folder, fname = os.path.split(os.path.abspath(path))
+    name = os.path.splitext(fname)[0]
+    return os.path.join(folder, CACHE_DIRNAME, f"{name}.v{CACHE_VERSION}.parquet")
+
+
+def _cache_is_fresh(path: str) -> bool:
+    cpath = cache_path(path)
+    return os.path.exists(cpath) and os.path.getmtime(cpath) >= os.path.getmtime(path)
+
+
+def iter_csv_chunks(path: str = DATA_PATH, chunksize: int = 500_000, columns=None, float_dtype=np.float32):
+    """Parse the CSV with the explicit schema, `chunksize` rows at a time."""
+    header = read_header(path)
+    usecols = [c for c in header if columns is None or c in columns]
+    reader = pd.read_csv(path, usecols=usecols, dtype=_csv_dtypes(usecols), chunksize=chunksize)
+    for chunk in reader:
+        yield _finalize(_optimize(chunk, float_dtype))
+
+
+def build_cache(path: str = DATA_PATH, chunksize: int = 500_000, float_dtype=np.float32) -> str:
+    """
+    Parse the full CSV once and write it as a Parquet file, one row group per
+    chunk.  float_dtype=np.float64 keeps the float columns lossless.
+    """
+    cpath = cache_path(path)
+    os.makedirs(os.path.dirname(cpath), exist_ok=True)
+    tmp = cpath + ".tmp"
+    writer, schema = None, None
+    try:
+        for chunk in iter_csv_chunks(path, chunksize, float_dtype=float_dtype):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                # fixed by the column maps, not by chunk 0's values
+                schema = arrow_schema(table.schema, pa.from_numpy_dtype(np.dtype(float_dtype)))
+                writer = pq.ParquetWriter(tmp, schema, compression="zstd")
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp, cpath)
+    return cpath
+
+
+def iter_chunks(path: str = DATA_PATH, chunksize: int = 500_000, columns=None, use_cache: bool = True):
+    """Yield typed DataFrame chunks, from the Parquet cache when it is fresh."""
+    if use_cache and _cache_is_fresh(path):
+        pf = pq.ParquetFile(cache_path(path))
+        for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+            yield _finalize(batch.to_pandas())
+    else:
+        yield from iter_csv_chunks(path, chunksize, columns)
+
+
+def load_dataset(path: str = DATA_PATH, columns=None, use_cache: bool = True, verbose: bool = True) -> pd.DataFrame:
+    """
+    Load the dataset with the explicit schema.  With `use_cache`, the first
+    call parses the full CSV into the Parquet cache and later calls read only
+    the projected `columns` from it.  Days already moved to the history
+    archive (src/archive.py) are prepended, so a pruned file still loads in full.
+    """
+    from .archive import with_archive
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ 未找到文件: {path}")
+    t0 = time.perf_counter()
+    source = "cache"
+    read = None if columns is None else list(dict.fromkeys(list(columns) + ["step"]))
+    if use_cache:
+        if not _cache_is_fresh(path):
+            build_cache(path)
+            source = "csv → cache"
+        df = _finalize(pd.read_parquet(cache_path(path), columns=read))
+    else:
+        source = "csv"
+        df = _finalize(pd.concat(iter_csv_chunks(path, columns=read), ignore_index=True))
+    n_live = len(df)
+    df = with_archive(path, df)
+    if len(df) > n_live:
+        df = _finalize(df)
+        source += f" + {len(df) - n_live:,} archived rows"
+    if columns is not None and "step" not in columns:
+        df = df.drop(columns="step")
+    if verbose:
+        mem_mb = df.memory_usage(deep=True).sum() / 1024 ** 2
+        print(f"✅ Loaded {len(df):,} rows x {df.shape[1]} cols from {source} "
+              f"in {time.perf_counter() - t0:.2f}s ({mem_mb:,.1f} MB in memory)")
+    return df
@@ -0,0 +1,267 @@
+"""
+Incremental sync of the daily partitions from the Drive-linked store.
+
+A manifest (`<dest>/.sync_manifest.json`) records the size and MD5 of every
+partition fetched so far.  `sync` lists the remote folder, and only files
+that are new or whose size / MD5 changed are downloaded, `workers` at a
+time:
+
+- each download streams into `<name>.part` next to a `<name>.part.json` that
+  pins the remote size and MD5; an interrupted transfer resumes from the bytes
+  already on disk as long as the remote file is unchanged, and restarts
+  otherwise;
+- the finished file is checked against the remote MD5 before it replaces the
+  local partition;
+- the partition is then converted to the Parquet cache of
+  src/dataset_loader.py (`<dest>/cache/`), with float64 floats so nothing is
+  lost, which `iter_pending_daily_frames` reads instead of re-parsing the CSV.
+
+Two remotes share the same interface (`list()` and `read(name, offset)`):
+`DriveRemote` (pydrive2, service account key in credentials/) and
+`LocalRemote`, a directory that stands in for the Drive folder offline.
+
+    python -m src.drive_sync --drive-folder <folder id> --dest daily_data
+    python -m src.drive_sync --remote /mnt/mirror/daily_data --dest daily_data --workers 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .data_utils import DAILY_FOLDER, _resolve_folder
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KEY_PATH = os.path.join(BASE_DIR, "credentials", "service_account_key.json")
+MANIFEST_NAME = ".sync_manifest.json"
+PART_SUFFIX = ".part"
+CHUNK_SIZE = 1 << 20
+WORKERS = 4
+PATTERN = ".csv"
+
+
+def file_md5(path: str, limit: int = None) -> "hashlib._Hash":
+    """Running MD5 over the first `limit` bytes of the file (all of it when None)."""
+    h = hashlib.md5()
+    remaining = limit
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            block = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+            if not block:
+                break
+            h.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return h
+
+
+# ==================== 1️⃣ Remotes ====================
+class LocalRemote:
+    """A local directory standing in for the Drive folder (same listing and ranged reads)."""
+
+    def __init__(self, root: str, pattern: str = PATTERN):
+        self.root = os.path.abspath(root)
+        self.pattern = pattern
+        self._md5 = {}          # name -> (size, mtime, md5), so unchanged files are hashed once
+
+    def list(self) -> dict:
+        out = {}
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if not name.endswith(self.pattern) or not os.path.isfile(path):
+                continue
+            st = os.stat(path)
+            hit = self._md5.get(name)
+            if hit is None or hit[:2] != (st.st_size, st.st_mtime):
+                hit = (st.st_size, st.st_mtime, file_md5(path).hexdigest())
+                self._md5[name] = hit
+            out[name] = {"size": st.st_size, "md5": hit[2], "modified": datetime.fromtimestamp(st.st_mtime).isoformat()}
+        return out
+
+    def read(self, name: str, offset: int = 0):
+        """Yield the file's bytes from `offset` on, CHUNK_SIZE at a time."""
+        with open(os.path.join(self.root, name), "rb") as f:
+            f.seek(offset)
+            while True:
+                block = f.read(CHUNK_SIZE)
+                if not block:
+                    return
+                yield block
+
+
+class DriveRemote:
+    """A Google Drive folder read through pydrive2 with the service account key."""
+
+    def __init__(self, folder_id: str, key_path: str = KEY_PATH, pattern: str = PATTERN):
+        from pydrive2.auth import GoogleAuth
+        from pydrive2.drive import GoogleDrive
+        settings = {
+            "client_config_backend": "service",
+            "service_config": {"client_json_file_path": key_path},
+        }
+        gauth = GoogleAuth(settings=settings)
+        gauth.ServiceAuth()
+        self.drive = GoogleDrive(gauth)
+        self.folder_id = folder_id
+        self.pattern = pattern
+        self._ids, self._sizes = {}, {}
+
+    def list(self) -> dict:
+        query = f"'{self.folder_id}' in parents and trashed=false"
+        out = {}
+        for f in self.drive.ListFile({"q": query}).GetList():
+            name = f["title"]
+            if not name.endswith(self.pattern) or "md5Checksum" not in f:
+                continue
+            self._ids[name], self._sizes[name] = f["id"], int(f["fileSize"])
+            out[name] = {"size": int(f["fileSize"]), "md5": f["md5Checksum"], "modified": f["modifiedDate"]}
+        return out
+
+    def read(self, name: str, offset: int = 0):
+        """Ranged GETs of CHUNK_SIZE bytes from `offset` on (one authorized http object per call, so thread-safe)."""
+        http = self.drive.auth.Get_Http_Object()
+        uri = f"https://www.googleapis.com/drive/v2/files/{self._ids[name]}?alt=media"
+        size = self._sizes[name]
+        while offset < size:
+            end = min(offset + CHUNK_SIZE, size) - 1
+            resp, content = http.request(uri, headers={"range": f"bytes={offset}-{end}"})
+            if resp.status != 206 and not (resp.status == 200 and offset == 0):
+                raise IOError(f"Drive download of {name} failed at byte {offset}: HTTP {resp.status}")
+            yield content
+            offset += len(content)
+            if resp.status == 200:
+                return
+
+
+# ==================== 2️⃣ Manifest ====================
+class Manifest:
+    """name -> {size, md5, modified, columnar, synced_at}, rewritten atomically after every file."""
+
+    def __init__(self, dest: str):
+        self.path = os.path.join(dest, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self.files = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.files = json.load(f).get("files", {})
+
+    def is_current(self, name: str, remote: dict, dest: str) -> bool:
+        entry = self.files.get(name)
+        return (entry is not None and entry["md5"] == remote["md5"] and entry["size"] == remote["size"]
+                and os.path.exists(os.path.join(dest, name)))
+
+    def record(self, name: str, entry: dict):
+        with self._lock:
+            self.files[name] = entry
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"updated": datetime.now().isoformat(timespec="seconds"), "files": self.files}, f, indent=2)
+            os.replace(tmp, self.path)
+
+
+# ==================== 3️⃣ Resumable download ====================
+def _download(remote, name: str, meta: dict, dest: str) -> dict:
+    """Fetch one file into `<name>.part`, resuming when the remote is unchanged; verify and move into place."""
+    target = os.path.join(dest, name)
+    part, pin = target + PART_SUFFIX, target + PART_SUFFIX + ".json"
+    offset = 0
+    if os.path.exists(part) and os.path.exists(pin):
+        with open(pin) as f:
+            pinned = json.load(f)
+        size = os.path.getsize(part)
+        if pinned.get("md5") == meta["md5"] and pinned.get("size") == meta["size"] and size <= meta["size"]:
+            offset = size
+    if offset == 0:
+        with open(pin, "w") as f:
+            json.dump({"md5": meta["md5"], "size": meta["size"]}, f)
+        open(part, "wb").close()
+    h = file_md5(part, offset) if offset else hashlib.md5()
+
+    with open(part, "ab") as f:
+        for block in remote.read(name, offset):
+            f.write(block)
+            h.update(block)
+    got = os.path.getsize(part)
+    if got != meta["size"] or h.hexdigest() != meta["md5"]:
+        os.remove(part)
+        os.remove(pin)
+        raise IOError(f"checksum mismatch for {name}: {got} bytes, md5 {h.hexdigest()} (expected {meta['md5']})")
+    os.replace(part, target)
+    os.remove(pin)
+    return {"resumed_from": offset, "bytes": meta["size"] - offset}
+
+
+def _to_columnar(path: str) -> str:
+    from .dataset_loader import build_cache
+    # lossless floats: the replay must see the same values as a CSV parse
+    return os.path.relpath(build_cache(path, float_dtype="float64"), os.path.dirname(path))
+
+
+def _sync_one(remote, name: str, meta: dict, dest: str, manifest: Manifest, columnar: bool) -> dict:
+    t0 = time.perf_counter()
+    result = _download(remote, name, meta, dest)
+    parquet = _to_columnar(os.path.join(dest, name)) if columnar else None
+    manifest.record(name, {**meta, "columnar": parquet, "synced_at": datetime.now().isoformat(timespec="seconds")})
+    return {"name": name, **result, "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def sync(remote, dest: str = DAILY_FOLDER, workers: int = WORKERS, columnar: bool = True, verbose: bool = True) -> dict:
+    """
+    Bring `dest` up to date with the remote: new and changed partitions are
+    downloaded concurrently, checksummed and converted to Parquet.
+    Returns {"fetched", "resumed", "skipped", "failed", "bytes", "seconds"}.
+    """
+    t0 = time.perf_counter()
+    dest = _resolve_folder(dest)
+    manifest = Manifest(dest)
+    listing = remote.list()
+    todo = [(name, meta) for name, meta in listing.items() if not manifest.is_current(name, meta, dest)]
+    report = {"remote": len(listing), "fetched": [], "resumed": [], "skipped": len(listing) - len(todo),
+              "failed": {}, "bytes": 0}
+    if verbose:
+        print(f"📊 {len(listing)} remote partitions, {len(todo)} new or changed")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(todo) or 1)), thread_name_prefix="sync") as pool:
+        futures = {pool.submit(_sync_one, remote, name, meta, dest, manifest, columnar): name for name, meta in todo}
+        for fut, name in futures.items():
+            try:
+                r = fut.result()
+            except Exception as e:
+                report["failed"][name] = str(e)
+                if verbose:
+                    print(f"⚠️ {name}: {e}")
+                continue
+            report["fetched"].append(name)
+            report["bytes"] += r["bytes"]
+            if r["resumed_from"]:
+                report["resumed"].append(name)
+            if verbose:
+                resumed = f" (resumed at {r['resumed_from']:,} B)" if r["resumed_from"] else ""
+                print(f"✅ {name}: {r['bytes']:,} B in {r['seconds']:.2f}s{resumed}")
+    report["seconds"] = round(time.perf_counter() - t0, 3)
+    if verbose:
+        print(f"💾 {len(report['fetched'])} fetched, {report['skipped']} up to date, {len(report['failed'])} failed, "
+              f"{report['bytes'] / 1024 ** 2:,.1f} MB in {report['seconds']:.2f}s")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the daily partitions from Google Drive (or a local mirror)")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--drive-folder", help="Google Drive folder id")
+    src.add_argument("--remote", help="local directory standing in for the Drive folder")
+    parser.add_argument("--dest", default=DAILY_FOLDER)
+    parser.add_argument("--key", default=KEY_PATH, help="service account key for --drive-folder")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--no-columnar", action="store_true", help="skip the Parquet conversion")
+    args = parser.parse_args()
+    remote = LocalRemote(args.remote) if args.remote else DriveRemote(args.drive_folder, args.key)
+    report = sync(remote, args.dest, workers=args.workers, columnar=not args.no_columnar)
+    raise SystemExit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
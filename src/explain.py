@@ -0,0 +1,308 @@
+"""
+Per-transaction explanations for the risk report.
+
+For a batch of transaction ids, each transaction's exact receptive field
+(the 2-hop halo of src/rescore.py: every edge into its endpoints and into
+their in-neighbours) is cut out of the history graph.  The halos go through
+EdgeSAGE as one disjoint batch, and a single backward pass of the summed
+target logits gives gradient × input for every edge and node feature.
+Because the copies are disjoint, each transaction's attributions are exact.
+From those:
+
+- drivers: the edge features (amount, time period, risk weight) and the
+  origin / destination node features with the largest |gradient × input|,
+  signed (+ pushes towards fraud, relative to an average account);
+- neighbour influence: the share of the attribution carried by the other
+  accounts in the halo, and the strongest of them;
+- percentiles: the amount and the accounts' activity against the history
+  distributions (sorted once at build time), plus the propagated-risk
+  percentile when src/account_risk.py's store exists.
+
+Explanations are cached per transaction id, and `explanation_lines` turns
+one into the few short lines the report prompt needs.  The dashboard calls
+`warm_explainer()` at startup so the explainer is built in the background
+rather than on the first request; the warm-up runs once per process.
+
+    expl = explain_transaction("1735197544")
+    print("\\n".join(explanation_lines(expl)))
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, "data", "dataset_transaction_raw with feature_v2.0.csv")
+TOP_DRIVERS = 6
+TOP_NEIGHBORS = 3
+MAX_CACHED = 4096
+
+
+def _percentile(sorted_values: np.ndarray, value: float) -> float:
+    return float(np.searchsorted(sorted_values, value, side="right") / max(1, len(sorted_values)))
+
+
+class Explainer:
+    def __init__(self, history: pd.DataFrame, model, artifacts: dict, graph: dict = None):
+        """
+        `graph` is rescore.prepare_graph(history, ...) (e.g. the shared store's
+        graph/ bundle); it is built here when not given.
+        """
+        from .gnn_core import EDGE_FEATURE_NAMES, NODE_FEATURE_NAMES
+        from .temporal_graph import _id_strings
+        if graph is None:
+            from .rescore import prepare_graph
+            graph = prepare_graph(history, artifacts, 1)
+        self.model = model
+        self.x, self.edge_attr = graph["x"], graph["edge_attr"]
+        self.src, self.dst = np.asarray(graph["src"]), np.asarray(graph["dst"])
+        # Same node order as prepare_graph
+        self.names = _id_strings(pd.Series(pd.unique(pd.concat([history["orig_id"], history["dest_id"]], ignore_index=True))))
+        self.node_raw = (np.asarray(artifacts["node_scaler"].mean_), np.asarray(artifacts["node_scaler"].scale_))
+        self.node_features, self.edge_features = NODE_FEATURE_NAMES, EDGE_FEATURE_NAMES
+
+        self.tx = history["transaction_id"].to_numpy()
+        self.tx_order = np.argsort(self.tx, kind="stable")
+        n = len(self.x)
+        self.in_order = np.argsort(self.dst, kind="stable")
+        self.in_ptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.dst, minlength=n), out=self.in_ptr[1:])
+
+        # Precomputed distributions for the percentile ranks
+        amount = history["amount"].to_numpy(dtype=np.float64)
+        # Unscaled edge features, as build_edge_attr assembles them
+        self.edge_values = np.column_stack([
+            amount, history["time_period"].to_numpy(dtype=np.float64),
+            0.2 + 0.8 * history["isFraud"].to_numpy(dtype=np.float64),
+        ])
+        self.out_tx = np.bincount(self.src, minlength=n)
+        self.in_tx = np.bincount(self.dst, minlength=n)
+        self.sent = np.bincount(self.src, weights=amount, minlength=n)
+        self.received = np.bincount(self.dst, weights=amount, minlength=n)
+        self.dist = {
+            "amount": np.sort(amount),
+            "out_tx": np.sort(self.out_tx), "in_tx": np.sort(self.in_tx),
+            "sent": np.sort(self.sent), "received": np.sort(self.received),
+        }
+        self.amount = amount
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ---------- lookup ----------
+    def _edge(self, tx_id) -> int:
+        """Row of a transaction id in the history, or -1."""
+        try:
+            key = int(tx_id) if self.tx.dtype.kind in "iu" else str(tx_id)
+        except (TypeError, ValueError):
+            return -1
+        i = int(np.searchsorted(self.tx, key, sorter=self.tx_order))
+        if i < len(self.tx) and self.tx[self.tx_order[i]] == key:
+            return int(self.tx_order[i])
+        return -1
+
+    def _in_edges(self, nodes) -> np.ndarray:
+        parts = [self.in_order[self.in_ptr[v]:self.in_ptr[v + 1]] for v in nodes]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def _halo(self, e: int) -> np.ndarray:
+        """Sorted edge ids two SAGEConv layers read to score edge e (e included)."""
+        seeds = np.unique([self.src[e], self.dst[e]])
+        hop = np.union1d(seeds, self.src[self._in_edges(seeds)])
+        return np.union1d(self._in_edges(hop), [e])
+
+    # ---------- attribution ----------
+    def _attribute(self, edges: list) -> list:
+        """Gradient × input for the target edges: one forward and one backward over their disjoint halos."""
+        import torch
+        xs, eas, ss, ds, targets, parts = [], [], [], [], [], []
+        node_off = edge_off = 0
+        for e in edges:
+            sub = self._halo(e)
+            k = len(sub)
+            nodes, inv = np.unique(np.concatenate([self.src[sub], self.dst[sub]]), return_inverse=True)
+            xs.append(self.x[nodes])
+            eas.append(self.edge_attr[sub])
+            ss.append(inv[:k] + node_off)
+            ds.append(inv[k:] + node_off)
+            targets.append(edge_off + int(np.searchsorted(sub, e)))
+            parts.append((nodes, node_off, k))
+            node_off += len(nodes)
+            edge_off += k
+
+        x = torch.tensor(np.concatenate(xs), dtype=torch.float, requires_grad=True)
+        edge_attr = torch.tensor(np.concatenate(eas), dtype=torch.float, requires_grad=True)
+        edge_index = torch.from_numpy(np.vstack([np.concatenate(ss), np.concatenate(ds)]).astype(np.int64))
+        with torch.enable_grad():
+            logits = self.model(x, edge_index, edge_attr)[targets]
+            gx, ge = torch.autograd.grad(logits.sum(), [x, edge_attr])
+        node_attr = (gx * x).detach().numpy()
+        edge_attr_c = (ge * edge_attr).detach().numpy()
+        probs = torch.sigmoid(logits).detach().numpy()
+        logits = logits.detach().numpy()
+
+        return [self._explain_one(e, logits[i], probs[i], node_attr[off:off + len(nodes)], edge_attr_c[targets[i]], nodes, k)
+                for i, (e, (nodes, off, k)) in enumerate(zip(edges, parts))]
+
+    def _explain_one(self, e: int, logit: float, prob: float, node_attr: np.ndarray, edge_c: np.ndarray, nodes: np.ndarray,
+                     halo_edges: int) -> dict:
+        u, v = int(self.src[e]), int(self.dst[e])
+        iu, iv = int(np.searchsorted(nodes, u)), int(np.searchsorted(nodes, v))
+        mean, scale = self.node_raw
+        drivers = [{"side": "edge", "feature": f, "value": float(self.edge_values[e][j]), "contribution": float(edge_c[j])}
+                   for j, f in enumerate(self.edge_features)]
+        for side, i, node in (("origin", iu, u), ("destination", iv, v)):
+            raw = self.x[node] * scale + mean
+            drivers += [{"side": side, "feature": f, "value": float(np.format_float_positional(raw[j], 4, fractional=False)),
+                         "contribution": float(node_attr[i][j])} for j, f in enumerate(self.node_features)]
+        drivers.sort(key=lambda d: -abs(d["contribution"]))
+
+        mass = np.abs(node_attr).sum(axis=1)
+        total = float(mass.sum() + np.abs(edge_c).sum()) or 1.0
+        others = np.ones(len(nodes), dtype=bool)
+        others[[iu, iv]] = False
+        top = np.flatnonzero(others)[np.argsort(-mass[others], kind="stable")[:TOP_NEIGHBORS]]
+
+        pct = {
+            "amount": _percentile(self.dist["amount"], self.amount[e]),
+            "origin_out_tx": _percentile(self.dist["out_tx"], self.out_tx[u]),
+            "origin_sent": _percentile(self.dist["sent"], self.sent[u]),
+            "destination_in_tx": _percentile(self.dist["in_tx"], self.in_tx[v]),
+            "destination_received": _percentile(self.dist["received"], self.received[v]),
+        }
+        from .account_risk import account_risk_lookup
+        for side, node in (("origin", u), ("destination", v)):
+            info = account_risk_lookup(self.names[node])
+            if info is not None:
+                pct[f"{side}_propagated_risk"] = info["percentile"]
+
+        return {
+            "transaction_id": str(self.tx[e]),
+            "origin": str(self.names[u]),
+            "destination": str(self.names[v]),
+            "model_prob": float(prob),
+            "logit": float(logit),
+            "drivers": drivers[:TOP_DRIVERS],
+            "neighbor_share": float(mass[others].sum() / total),
+            "neighbors": [{"account": str(self.names[nodes[i]]), "share": float(mass[i] / total)} for i in top],
+            "halo_edges": int(halo_edges),
+            "halo_accounts": int(len(nodes)),
+            "out_tx": int(self.out_tx[u]),
+            "in_tx": int(self.in_tx[v]),
+            "percentiles": pct,
+        }
+
+    def explain(self, tx_ids) -> list:
+        """Explanation per transaction id (None where the id is not in the history); cached per id."""
+        keys = [str(t) for t in tx_ids]
+        with self._lock:
+            out = {k: self._cache[k] for k in keys if k in self._cache}
+            for k in out:
+                self._cache.move_to_end(k)
+        todo = [(k, self._edge(k)) for k in dict.fromkeys(keys) if k not in out]
+        found = [(k, e) for k, e in todo if e >= 0]
+        if found:
+            for (k, _), expl in zip(found, self._attribute([e for _, e in found])):
+                out[k] = expl
+            with self._lock:
+                for k, _ in found:
+                    self._cache[k] = out[k]
+                while len(self._cache) > MAX_CACHED:
+                    self._cache.popitem(last=False)
+        return [out.get(k) for k in keys]
+
+
+# ==================== Report text ====================
+def _pct(p: float) -> str:
+    return f"P{100 * p:.0f}"
+
+
+def explanation_lines(expl: dict) -> list:
+    """A few short, grounded lines for the report prompt / the UI."""
+    pct = expl["percentiles"]
+    drivers = "; ".join(
+        f"{d['side']} {d['feature']}={d['value']:.4g} ({d['contribution']:+.2f})" for d in expl["drivers"]
+    )
+    lines = [
+        f"Model P(fraud) {expl['model_prob']:.4f} (logit {expl['logit']:+.2f}) on a {expl['halo_edges']}-edge neighbourhood.",
+        f"Top drivers (gradient x input on the logit, + raises risk): {drivers}.",
+    ]
+    if expl["neighbors"]:
+        near = ", ".join(f"{n['account']} ({100 * n['share']:.0f}%)" for n in expl["neighbors"])
+        lines.append(f"Neighbour influence: {100 * expl['neighbor_share']:.0f}% of the attribution from "
+                     f"{expl['halo_accounts'] - 2} other accounts; strongest {near}.")
+    lines.append(
+        f"Percentiles: amount {_pct(pct['amount'])}; origin {expl['origin']} sent {expl['out_tx']} tx "
+        f"({_pct(pct['origin_out_tx'])}, volume {_pct(pct['origin_sent'])}); destination {expl['destination']} "
+        f"received {expl['in_tx']} tx ({_pct(pct['destination_in_tx'])}, volume {_pct(pct['destination_received'])})."
+    )
+    risk = [f"{side} {_pct(pct[f'{side}_propagated_risk'])}" for side in ("origin", "destination")
+            if f"{side}_propagated_risk" in pct]
+    if risk:
+        lines.append("Propagated account risk: " + ", ".join(risk) + ".")
+    return lines
+
+
+# ==================== Cached explainer ====================
+_cache = {}
+_cache_lock = threading.Lock()
+_build_lock = threading.Lock()          # one build at a time; a request during warm-up waits for it
+_warm_thread = None                     # set once per process; a failed warm-up is not retried
+
+
+def get_explainer(history_path: str = DATA_PATH) -> Explainer:
+    """Explainer over the history dataset and the live model (shared store when attached), rebuilt when either changes."""
+    from .gnn_core import MODEL_DIR, MODEL_PATH, load_artifacts, load_model
+    from .shared_store import attached
+    key = (os.path.getmtime(history_path), os.path.getmtime(MODEL_PATH))
+    with _cache_lock:
+        hit = _cache.get(history_path)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+    with _build_lock:
+        with _cache_lock:
+            hit = _cache.get(history_path)
+            if hit is not None and hit[0] == key:
+                return hit[1]
+        store = attached()
+        history = store.history_frame(history_path) if store is not None else None
+        if history is not None and store.fresh("model", MODEL_PATH):
+            explainer = Explainer(history, store.load_model(), store.model_artifacts(), store.rescore_graph(history_path))
+        else:
+            from .dataset_loader import load_dataset
+            artifacts = load_artifacts(MODEL_DIR)
+            explainer = Explainer(load_dataset(history_path), load_model(artifacts, MODEL_PATH), artifacts)
+        with _cache_lock:
+            _cache[history_path] = (key, explainer)
+    return explainer
+
+
+def _warm(history_path: str):
+    try:
+        get_explainer(history_path)
+    except Exception as e:
+        print(f"⚠️ Explainer warm-up failed: {e}")
+
+
+def warm_explainer(history_path: str = DATA_PATH):
+    """
+    Build the explainer in the background, once per process: Streamlit reruns
+    and a failed warm-up start nothing new (the first lookup builds it then).
+    Returns the thread.
+    """
+    global _warm_thread
+    with _cache_lock:
+        if _warm_thread is None:
+            _warm_thread = threading.Thread(target=_warm, args=(history_path,), name="explainer-warm-up", daemon=True)
+            _warm_thread.start()
+        return _warm_thread
+
+
+def explain_transaction(tx_id, history_path: str = DATA_PATH) -> dict:
+    """Cached explanation for one transaction, or None (unknown id, or no history / model available)."""
+    try:
+        return get_explainer(history_path).explain([tx_id])[0]
+    except Exception as e:
+        print(f"⚠️ Explanation unavailable for {tx_id}: {e}")
+        return None
@@ -0,0 +1,178 @@
+# ==================== gnn_core.py ====================
+# Importable pieces of the EdgeSAGE inference pipeline (artefact loading,
+# graph/feature construction and the model itself).  `model_gnn.py` runs
+# them as a one-shot script; long-lived services import them directly so the
+# model stays warm between requests.
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+from torch_geometric.nn import SAGEConv
+
+# ==================== 1️⃣ 目录与常量 ====================
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))        # src/
+BASE_DIR = os.path.dirname(CURRENT_DIR)                         # 项目根目录
+MODEL_DIR = os.path.join(BASE_DIR, "model")
+
+MODEL_PATH = os.path.join(MODEL_DIR, "best_model.pth")
+CONFIG_PATH = os.path.join(MODEL_DIR, "config.json")
+SCALER_PATH = os.path.join(MODEL_DIR, "scalers.pkl")
+MAP_PATH = os.path.join(MODEL_DIR, "mapping.pkl")
+
+DEVICE = torch.device("cpu")
+
+MODES = ["active", "normal", "low_freq", "bursty"]
+MODE_MAP = {m: i for i, m in enumerate(MODES)}
+
+NODE_FEATURE_NAMES = [
+    "orig_count", "orig_sum", "orig_mean",
+    "dest_count", "dest_sum", "dest_mean",
+    "orig_bal", "dest_bal", "orig_vol", "dest_vol",
+    "orig_30d_mean", "orig_30d_var", "dest_30d_mean", "dest_30d_var",
+    "freq_24h", "freq_72h", "freq_168h", "avg_24h",
+] + [f"mode_{m}" for m in MODES]
+EDGE_FEATURE_NAMES = ["amount", "time_period", "risk_weight"]
+
+
+# ==================== 2️⃣ 模型定义 ====================
+class EdgeSAGE(torch.nn.Module):
+    def __init__(self, node_in, edge_in, hidden_dim):
+        super().__init__()
+        self.conv1 = SAGEConv(node_in, hidden_dim)
+        self.conv2 = SAGEConv(hidden_dim, hidden_dim)
+        self.edge_mlp = torch.nn.Sequential(
+            torch.nn.Linear(hidden_dim * 2 + edge_in, hidden_dim),
+            torch.nn.ReLU(),
+            torch.nn.Dropout(0.2),
+            torch.nn.Linear(hidden_dim, 1)
+        )
+
+    def forward(self, x, edge_index, edge_attr):
+        x = F.relu(self.conv1(x, edge_index))
+        x = F.relu(self.conv2(x, edge_index))
+        src, dst = edge_index
+        src_emb, dst_emb = x[src], x[dst]
+        edge_feat = torch.cat([src_emb, dst_emb, edge_attr], dim=1)
+        return self.edge_mlp(edge_feat).view(-1)
+
+
+# ==================== 3️⃣ 加载配置、映射与模型参数 ====================
+def load_artifacts(model_dir: str = MODEL_DIR) -> dict:
+    """Load config.json, scalers.pkl and mapping.pkl from the model folder."""
+    with open(os.path.join(model_dir, "config.json"), "r") as f:
+        config = json.load(f)
+    with open(os.path.join(model_dir, "scalers.pkl"), "rb") as f:
+        scalers = pickle.load(f)
+    with open(os.path.join(model_dir, "mapping.pkl"), "rb") as f:
+        mapping = pickle.load(f)
+    return {
+        "config": config,
+        "node_scaler": scalers["node_scaler"],
+        "edge_scaler": scalers["edge_scaler"],
+        "node2idx": mapping["node2idx"],
+        "unique_nodes": mapping["unique_nodes"],
+    }
+
+
+def load_model(artifacts: dict, model_path: str = MODEL_PATH, device=DEVICE) -> EdgeSAGE:
+    """Instantiate EdgeSAGE with the scaler dimensions and load the checkpoint in eval mode."""
+    model = EdgeSAGE(
+        node_in=len(artifacts["node_scaler"].mean_),
+        edge_in=len(artifacts["edge_scaler"].mean_),
+        hidden_dim=artifacts["config"]["EMBED_DIM"],
+    ).to(device)
+    model.load_state_dict(torch.load(model_path, map_location=device))
+    model.eval()
+    return model
+
+
+# ==================== 4️⃣ 特征构造 ====================
+def build_edge_attr(df: pd.DataFrame, edge_scaler) -> np.ndarray:
+    """Scaled [amount, time_period, risk_weight] edge matrix."""
+    edge_attr = df[["amount", "time_period"]].to_numpy(dtype=np.float64)
+    edge_risk_weight = 0.2 + 0.8 * df["isFraud"].astype(float).to_numpy()
+    edge_attr = np.hstack([edge_attr, edge_risk_weight.reshape(-1, 1)])
+    edge_attr = np.nan_to_num(edge_attr)
+    return edge_scaler.transform(edge_attr).astype(np.float32)
+
+
+def build_node_features(df: pd.DataFrame, nodes, node_scaler) -> np.ndarray:
+    """
+    Aggregate per-account features for `nodes` (in order) from the enriched
+    transactions and scale them with the training node scaler.
+    Each side (orig_id / dest_id) is a single grouped aggregation.
+    """
+    # 基础统计 / balance ratio & volatility
+    orig_aggs = {
+        "orig_count": ("amount", "size"), "orig_sum": ("amount", "sum"), "orig_mean": ("amount", "mean"),
+        "orig_bal": ("orig_balance_ratio", "mean"), "orig_vol": ("orig_curr_volatility", "mean"),
+    }
+    dest_aggs = {
+        "dest_count": ("amount", "size"), "dest_sum": ("amount", "sum"), "dest_mean": ("amount", "mean"),
+        "dest_bal": ("dest_balance_ratio", "mean"), "dest_vol": ("dest_curr_volatility", "mean"),
+    }
+    # 30天统计（缺列按 0 处理）
+    for col in ["orig_30d_mean", "orig_30d_var"]:
+        if col in df.columns:
+            orig_aggs[col] = (col, "mean")
+    for col in ["dest_30d_mean", "dest_30d_var"]:
+        if col in df.columns:
+            dest_aggs[col] = (col, "mean")
+    # 时间窗口统计
+    window_cols = {"freq_24h": "orig_tx_24h", "freq_72h": "orig_tx_72h", "freq_168h": "orig_tx_168h", "avg_24h": "orig_avg_amt_24h"}
+    if set(window_cols.values()).issubset(df.columns):
+        orig_aggs.update({name: (col, "mean") for name, col in window_cols.items()})
+    has_mode = "orig_behavior_mode" in df.columns
+    if has_mode:
+        orig_aggs["mode"] = ("orig_behavior_mode", "first")
+
+    orig = df.groupby("orig_id").agg(**orig_aggs)
+    dest = df.groupby("dest_id").agg(**dest_aggs)
+
+    # 行为模式 One-hot
+    if has_mode:
+        orig_mode_idx = orig.pop("mode").reindex(nodes, fill_value="normal").map(MODE_MAP).to_numpy()
+    else:
+        orig_mode_idx = np.zeros(len(nodes), dtype=int)
+    orig_mode_oh = np.eye(len(MODES))[orig_mode_idx]
+
+    stats = pd.concat([orig.reindex(nodes, fill_value=0), dest.reindex(nodes, fill_value=0)], axis=1)
+    stats = stats.reindex(columns=NODE_FEATURE_NAMES[:18], fill_value=0.0)
+    node_feats = np.hstack([stats.to_numpy(dtype=np.float64), orig_mode_oh.astype(np.float64)])
+
+    node_feats = np.nan_to_num(node_feats)
+    return node_scaler.transform(node_feats).astype(np.float32)
+
+
+def build_local_graph(df: pd.DataFrame, node_scaler, edge_scaler):
+    """
+    Build tensors over only the accounts touched by `df`.
+
+    EdgeSAGE messages only flow along the edges of the batch, so restricting
+    the node set to the batch's endpoints gives the same edge logits as the
+    full-vocabulary graph in `model_gnn.py`, without scaling every known
+    account on each request.  Returns (x, edge_index, edge_attr, nodes).
+    """
+    nodes = pd.Index(pd.unique(pd.concat([df["orig_id"], df["dest_id"]], ignore_index=True)))
+    src = nodes.get_indexer(df["orig_id"])
+    dst = nodes.get_indexer(df["dest_id"])
+    x = build_node_features(df, nodes, node_scaler)
+    edge_attr = build_edge_attr(df, edge_scaler)
+    return (
+        torch.tensor(x, dtype=torch.float),
+        torch.tensor(np.vstack([src, dst]), dtype=torch.long),
+        torch.tensor(edge_attr, dtype=torch.float),
+        nodes,
+    )
+
+
+# ==================== 5️⃣ 推理 ====================
+def predict_proba(model: EdgeSAGE, x, edge_index, edge_attr) -> np.ndarray:
+    """Sigmoid edge probabilities for one forward pass."""
+    with torch.no_grad():
+        logits = model(x, edge_index, edge_attr)
+        return torch.sigmoid(logits).cpu().numpy()
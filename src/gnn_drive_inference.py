@@ -1,16 +1,18 @@
 import os, json
+import threading
 import numpy as np
 import pandas as pd
 
+from .dataset_loader import load_dataset
+from .tracing import span, traced
+
 # ==================== 本地数据读取 ====================
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH = os.path.join(BASE_DIR, "data", "dataset_transaction_raw with feature_v2.0.csv")
 
-def load_local_csv(path: str) -> pd.DataFrame:
-    """从本地 CSV 文件读取历史交易数据"""
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"❌ 未找到文件: {path}")
-    df = pd.read_csv(path)
+def load_local_csv(path: str, columns=None) -> pd.DataFrame:
+    """从本地 CSV 文件读取历史交易数据（显式 dtype，首次解析后走 Parquet 缓存）"""
+    df = load_dataset(path, columns=columns)
     print(f"✅ 从本地 CSV 读取历史数据：{len(df)} 条记录")
     return df
 
@@ -31,8 +33,70 @@ def compute_behavior_mode(tx_count, var_ratio, recent_tx24):
     else:
         return "normal"
 
+# =============== 账户历史索引 ==================
+class HistoryIndex:
+    """
+    Per-account aggregates of a history frame, built once, so enrichment does
+    not rescan the whole frame per request.  For each role column the rows
+    are grouped by account and sorted by step, with prefix sums of `amount`:
+    the "step > s - 24" window is one binary search, and the all-history
+    count / mean / var(ddof=0) are precomputed.
+    """
+
+    def __init__(self, history_df: pd.DataFrame):
+        steps = history_df["step"].to_numpy(dtype=np.int64)
+        amounts = history_df["amount"].to_numpy(dtype=np.float64)
+        self.sides = {}
+        for col in ("orig_id", "dest_id"):
+            codes, uniques = pd.factorize(history_df[col].astype(str))
+            n = len(uniques)
+            order = np.lexsort((steps, codes))
+            counts = np.bincount(codes, minlength=n)
+            ptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(counts, out=ptr[1:])
+            mean = np.bincount(codes, weights=amounts, minlength=n) / np.maximum(counts, 1)
+            var = np.bincount(codes, weights=(amounts - mean[codes]) ** 2, minlength=n) / np.maximum(counts, 1)
+            cum = np.zeros(len(order) + 1)
+            np.cumsum(amounts[order], out=cum[1:])
+            self.sides[col] = {
+                "codes": {a: i for i, a in enumerate(uniques)}, "ptr": ptr, "steps": steps[order], "cum": cum,
+                "mean": mean, "var": var,
+            }
+        print(f"✅ 历史索引完成：{len(history_df)} 条记录，{len(self.sides['orig_id']['codes'])} 个发起账户")
+
+    def stats(self, col: str, account: str, step) -> tuple:
+        """(tx_count, mean, var, tx_24h, avg_amt_24h) of the account's history, or None if it has none."""
+        side = self.sides[col]
+        c = side["codes"].get(account)
+        if c is None:
+            return None
+        lo, hi = int(side["ptr"][c]), int(side["ptr"][c + 1])
+        pos = lo + int(side["steps"][lo:hi].searchsorted(step - 24, side="right"))
+        n24 = hi - pos
+        mean = float(side["mean"][c])
+        avg24 = float(side["cum"][hi] - side["cum"][pos]) / n24 if n24 > 0 else mean
+        return hi - lo, mean, float(side["var"][c]), n24, avg24
+
+
+def _account_stats(history_df, col, account, step, amount, index=None) -> tuple:
+    """(tx_count, mean, var, tx_24h, avg_amt_24h); an account without history counts as one transaction of `amount`."""
+    if index is not None:
+        hit = index.stats(col, account, step)
+    else:
+        hist = history_df[history_df[col].astype(str) == account]
+        hit = None
+        if not hist.empty:
+            mean = hist["amount"].mean()
+            recent = hist[hist["step"] > step - 24]
+            hit = (len(hist), mean, hist["amount"].var(ddof=0), len(recent),
+                   recent["amount"].mean() if len(recent) > 0 else mean)
+    return hit if hit is not None else (1, amount, 0, 1, amount)
+
+
 # =============== 主函数 ==================
-def update_features(test_json: str, history_df: pd.DataFrame) -> pd.DataFrame:
+@traced()
+def update_features(test_json: str, history_df: pd.DataFrame, index: HistoryIndex = None) -> pd.DataFrame:
+    """Enrich raw transactions from the account history; pass a HistoryIndex to skip the per-row frame scans."""
     loaded = json.loads(test_json)
     if isinstance(loaded, dict):
         test_df = pd.DataFrame([loaded])
@@ -58,41 +122,18 @@ def update_features(test_json: str, history_df: pd.DataFrame) -> pd.DataFrame:
         test["time_period"] = test["hour"].map(get_time_period)
 
         orig_id, dest_id = str(test["orig_id"].iloc[0]), str(test["dest_id"].iloc[0])
-        orig_hist = history_df[history_df["orig_id"].astype(str) == orig_id]
-        dest_hist = history_df[history_df["dest_id"].astype(str) == dest_id]
+        step, amount = test["step"].iloc[0], test["amount"].iloc[0]
 
         # 发起者
-        if not orig_hist.empty:
-            orig_tx_count = len(orig_hist)
-            orig_30d_mean = orig_hist["amount"].mean()
-            orig_30d_var = orig_hist["amount"].var(ddof=0)
-            orig_recent_24h = orig_hist[orig_hist["step"] > test["step"].iloc[0] - 24]
-            orig_tx_24h = len(orig_recent_24h)
-            orig_avg_amt_24h = orig_recent_24h["amount"].mean() if orig_tx_24h > 0 else orig_30d_mean
-        else:
-            orig_tx_count = orig_tx_24h = 1
-            orig_30d_mean = test["amount"].iloc[0]
-            orig_30d_var = 0
-            orig_avg_amt_24h = test["amount"].iloc[0]
-
-        orig_curr_volatility = abs(test["amount"].iloc[0] - orig_30d_mean) / (orig_30d_mean + 1e-6)
+        orig_tx_count, orig_30d_mean, orig_30d_var, orig_tx_24h, orig_avg_amt_24h = _account_stats(
+            history_df, "orig_id", orig_id, step, amount, index)
+        orig_curr_volatility = abs(amount - orig_30d_mean) / (orig_30d_mean + 1e-6)
         orig_behavior_mode = compute_behavior_mode(orig_tx_count, orig_curr_volatility, orig_tx_24h)
 
         # 接收者
-        if not dest_hist.empty:
-            dest_tx_count = len(dest_hist)
-            dest_30d_mean = dest_hist["amount"].mean()
-            dest_30d_var = dest_hist["amount"].var(ddof=0)
-            dest_recent_24h = dest_hist[dest_hist["step"] > test["step"].iloc[0] - 24]
-            dest_tx_24h = len(dest_recent_24h)
-            dest_avg_amt_24h = dest_recent_24h["amount"].mean() if dest_tx_24h > 0 else dest_30d_mean
-        else:
-            dest_tx_count = dest_tx_24h = 1
-            dest_30d_mean = test["amount"].iloc[0]
-            dest_30d_var = 0
-            dest_avg_amt_24h = test["amount"].iloc[0]
-
-        dest_curr_volatility = abs(test["amount"].iloc[0] - dest_30d_mean) / (dest_30d_mean + 1e-6)
+        dest_tx_count, dest_30d_mean, dest_30d_var, dest_tx_24h, dest_avg_amt_24h = _account_stats(
+            history_df, "dest_id", dest_id, step, amount, index)
+        dest_curr_volatility = abs(amount - dest_30d_mean) / (dest_30d_mean + 1e-6)
         dest_behavior_mode = compute_behavior_mode(dest_tx_count, dest_curr_volatility, dest_tx_24h)
 
         # balance ratio
@@ -124,22 +165,109 @@ def update_features(test_json: str, history_df: pd.DataFrame) -> pd.DataFrame:
     print(f"✅ 特征更新完成，共 {len(enriched_df)} 条交易记录。")
     return enriched_df
 
+# =================== 进程内缓存（多会话共享，只读） ===================
+# 历史帧与模型每个进程只加载一次；并发会话共用同一份只读副本，不再经中间文件与子进程传递
+_history = {}
+_indexes = {}
+_history_lock = threading.Lock()
+_scorer = {}
+_scorer_lock = threading.Lock()
+_stream = {}
+_stream_lock = threading.Lock()
+
+
+def history_frame(path: str = DATA_PATH) -> pd.DataFrame:
+    """The history frame, loaded once per process (the shared store's copy when one is attached)."""
+    from .shared_store import attached
+    store = attached()
+    if store is not None:
+        df = store.history_frame(path)
+        if df is not None:
+            return df
+    mtime = os.path.getmtime(path)
+    with _history_lock:                   # concurrent first requests wait for one load instead of each reading
+        hit = _history.get(path)
+        if hit is None or hit[0] != mtime:
+            hit = (mtime, load_local_csv(path))
+            _history[path] = hit
+    return hit[1]
+
+
+def history_index(path: str = DATA_PATH) -> HistoryIndex:
+    """HistoryIndex over history_frame(path), rebuilt when the frame is reloaded."""
+    df = history_frame(path)
+    with _history_lock:
+        hit = _indexes.get(path)
+        if hit is None or hit[0] is not df:
+            hit = (df, HistoryIndex(df))
+            _indexes[path] = hit
+    return hit[1]
+
+
+def checkpoint_stream():
+    """
+    FeatureStream restored from the latest checkpoint under PULSE4_CHECKPOINT_DIR
+    (plus the daily partitions after it), once per process; None when unset.
+    """
+    from .state_checkpoint import ENV_VAR, restore_stream
+    root = os.environ.get(ENV_VAR)
+    if not root:
+        return None
+    with _stream_lock:
+        if root not in _stream:
+            _stream[root] = restore_stream(root)
+        return _stream[root]
+
+
+def _model():
+    """(artifacts, EdgeSAGE) loaded once per process; the shared store's mapped weights when attached."""
+    with _scorer_lock:
+        if not _scorer:
+            from .gnn_core import MODEL_DIR, MODEL_PATH, load_artifacts, load_model
+            from .shared_store import attached
+            store = attached()
+            if store is not None and store.fresh("model", MODEL_PATH):
+                _scorer["artifacts"], _scorer["model"] = store.model_artifacts(), store.load_model()
+            else:
+                _scorer["artifacts"] = load_artifacts(MODEL_DIR)
+                _scorer["model"] = load_model(_scorer["artifacts"], MODEL_PATH)
+        return _scorer["artifacts"], _scorer["model"]
+
+
+def score_enriched(enriched: pd.DataFrame) -> np.ndarray:
+    """EdgeSAGE fraud probabilities for an enriched batch, computed in memory."""
+    from .gnn_core import build_local_graph, predict_proba
+    artifacts, model = _model()
+    x, edge_index, edge_attr, _ = build_local_graph(enriched, artifacts["node_scaler"], artifacts["edge_scaler"])
+    return predict_proba(model, x, edge_index, edge_attr)
+
+
 # =================== json processing ===================
 def json_processing(json_input: str):
-    print("🚀 正在从本地 CSV 文件中读取历史数据 ...")
-    history_df = load_local_csv(DATA_PATH)
-    print(json_input)
-    json_input = json.dumps(json_input) if isinstance(json_input, dict) else json_input
-    enriched = update_features(json_input, history_df)
-    print(enriched)
-    OUTPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "enriched_transactions.csv")
-    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_gnn.py")
-
-    enriched.to_csv(OUTPUT_PATH, index=False)
-    print(f"✅ 已保存特征增强数据至: {OUTPUT_PATH}")
-
-    # 自动调用推理脚本
-    import subprocess
+    """
+    Enrich and score transactions in memory, then append the predictions to
+    the shared prediction file through the single-writer store.
+    """
+    from .prediction_store import PREDICTIONS_OUT, append_predictions, prediction_frame
+    stream = checkpoint_stream()
+    if stream is not None:
+        # 检查点热启动：账户窗口已恢复，不再读取完整历史
+        loaded = json.loads(json_input) if isinstance(json_input, str) else json_input
+        records = loaded if isinstance(loaded, list) else [loaded]
+        with span("stream_enrich"), _stream_lock:
+            enriched = pd.DataFrame([stream.process(r) for r in records])
+    else:
+        with span("load_history"):
+            history_df = history_frame(DATA_PATH)
+            index = history_index(DATA_PATH)
+        json_input = json.dumps(json_input) if isinstance(json_input, dict) else json_input
+        enriched = update_features(json_input, history_df, index)
     print("🚀 正在执行模型推理 ...")
-    subprocess.run(["python", script_path])
-    return {"status": "Success", "message": "Features updated and prediction done."}
+    with span("model_inference"):
+        probs = score_enriched(enriched)
+    df_out = prediction_frame(enriched, probs)
+    with span("append_predictions"):
+        append_predictions(df_out, PREDICTIONS_OUT)
+    print(f"📄 推理完成，{len(df_out)} 条结果已追加至：{PREDICTIONS_OUT}")
+    return {"status": "Success", "message": "Features updated and prediction done.",
+            "predictions": df_out.to_dict(orient="records")}
@@ -0,0 +1,156 @@
+"""
+In-memory vis.js rendering for the graph tabs.
+
+PyVis renders a Jinja template and writes it to disk, and graph_tool then
+read the file back on every request, with every session sharing the same
+output path.  Here one HTML template is filled once per layout and split
+around a payload slot; a page is `prefix + payload + suffix`, where the
+payload is the compact nodes/edges JSON.  vis.js and its stylesheet are
+inlined from the vendored copies under lib/, so pages render without network
+access (Streamlit shows them in a srcdoc iframe, where relative paths do not
+resolve).
+
+Pages are cached in `FRAGMENTS`.  A request key (view, account, role, step
+range, threshold, data version) maps to the payload's SHA-1, and the payload
+is stored once per SHA-1, so different views that produce the same graph
+share one entry; the shared shell is joined back on when a page is served.
+Repeat views are served from memory.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VIS_DIR = os.path.join(BASE_DIR, "lib", "vis-9.1.2")
+VIS_CSS = os.path.join(VIS_DIR, "vis-network.css")
+VIS_JS = os.path.join(VIS_DIR, "vis-network.min.js")
+
+TEMPLATE = """<html>
+<head>
+<meta charset="utf-8">
+<style type="text/css">__VIS_CSS__</style>
+<script type="text/javascript">__VIS_JS__</script>
+<style type="text/css">
+  #mynetwork {
+    width: __WIDTH__;
+    height: __HEIGHT__;
+    background-color: __BGCOLOR__;
+    border: 1px solid lightgray;
+    position: relative;
+    float: left;
+  }
+</style>
+</head>
+<body>
+<div id="mynetwork"></div>
+<script type="text/javascript">
+  var payload = __PAYLOAD__;
+  var data = {nodes: new vis.DataSet(payload.nodes), edges: new vis.DataSet(payload.edges)};
+  var network = new vis.Network(document.getElementById("mynetwork"), data, __OPTIONS__);
+</script>
+</body>
+</html>
+"""
+
+# PyVis defaults (what render_person_graph got before), plus dot-shaped nodes.
+PERSON_OPTIONS = {
+    "configure": {"enabled": False},
+    "nodes": {"shape": "dot"},
+    "edges": {"color": {"inherit": True}, "smooth": {"enabled": True, "type": "dynamic"}},
+    "interaction": {"dragNodes": True, "hideEdgesOnDrag": False, "hideNodesOnDrag": False},
+    "physics": {"enabled": True, "stabilization": {"enabled": True, "fit": True, "iterations": 1000,
+                                                   "onlyDynamicEdges": False, "updateInterval": 50}},
+}
+# render_high_risk_network's set_options block.
+NETWORK_OPTIONS = {
+    "nodes": {"shape": "dot", "font": {"size": 14}},
+    "edges": {"color": {"inherit": False}, "smooth": False},
+    "physics": {"enabled": True, "stabilization": {"iterations": 100}},
+}
+LAYOUTS = {
+    "person": {"height": "600px", "options": PERSON_OPTIONS},
+    "network": {"height": "700px", "options": NETWORK_OPTIONS},
+}
+
+
+@lru_cache(maxsize=None)
+def _asset(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=None)
+def _shell(layout: str, width: str = "100%", bgcolor: str = "#ffffff"):
+    """(prefix, suffix) of the filled template around the payload slot."""
+    spec = LAYOUTS[layout]
+    prefix, suffix = TEMPLATE.split("__PAYLOAD__")
+    prefix = (prefix.replace("__WIDTH__", width).replace("__HEIGHT__", spec["height"]).replace("__BGCOLOR__", bgcolor)
+              .replace("__VIS_CSS__", _asset(VIS_CSS)).replace("__VIS_JS__", _asset(VIS_JS)))
+    suffix = suffix.replace("__OPTIONS__", json.dumps(spec["options"]))
+    return prefix, suffix
+
+
+def build_payload(nodes: list, edges: list):
+    """Compact JSON payload and its SHA-1 (the cache address)."""
+    payload = json.dumps({"nodes": nodes, "edges": edges}, separators=(",", ":"), ensure_ascii=False)
+    payload = payload.replace("</", "<\\/")         # keep titles from closing the <script> block
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest(), payload
+
+
+def render_html(payload: str, layout: str = "person") -> str:
+    prefix, suffix = _shell(layout)
+    return prefix + payload + suffix
+
+
+class FragmentCache:
+    """request key -> payload digest -> (layout, payload), both LRU-bounded; pages are joined on the way out."""
+
+    def __init__(self, max_keys: int = 512, max_pages: int = 128):
+        self.max_keys = max_keys
+        self.max_pages = max_pages
+        self._keys = OrderedDict()
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            digest = self._keys.get(key)
+            entry = self._pages.get(digest) if digest is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._keys.move_to_end(key)
+            self._pages.move_to_end(digest)
+            self.hits += 1
+        layout, payload = entry
+        return render_html(payload, layout)
+
+    def put(self, key, nodes: list, edges: list, layout: str) -> str:
+        digest, payload = build_payload(nodes, edges)
+        with self._lock:
+            if digest not in self._pages:
+                self._pages[digest] = (layout, payload)
+                while len(self._pages) > self.max_pages:
+                    self._pages.popitem(last=False)
+            if key is not None:
+                self._keys[key] = digest
+                while len(self._keys) > self.max_keys:
+                    self._keys.popitem(last=False)
+        return render_html(payload, layout)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self._pages.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"keys": len(self._keys), "pages": len(self._pages), "hits": self.hits, "misses": self.misses}
+
+
+FRAGMENTS = FragmentCache()
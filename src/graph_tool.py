@@ -1,10 +1,26 @@
+import hashlib
 import os
+import threading
 import pandas as pd
-import networkx as nx
-from pyvis.network import Network
 import numpy as np
 
 from .data_utils import resolve_today_csv, load_data_by_days_ago
+from .graph_render import FRAGMENTS
+from .tracing import span, traced
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREDICTIONS_PATH = os.path.join(BASE_DIR, "data", "test_predictions_v2.0.csv")
+
+FRAME_COLUMNS = ["orig_id", "dest_id", "fraud_prob_pred", "amount", "transaction_id"]
+
+
+def _frame_digest(df: pd.DataFrame) -> str:
+    """SHA-1 of the columns the network is drawn from, so equal frames share a cached page."""
+    cols = [c for c in FRAME_COLUMNS if c in df.columns]
+    h = hashlib.sha1(",".join(cols).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df[cols], index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
 
 def _to_str(x):  # safe cast
     try:
@@ -13,12 +29,18 @@ def _to_str(x):  # safe cast
         return str(x)
 
 
+@traced()
 def classify_fraud_patterns(G, risk_threshold=0.5):
     """
     仅对涉及高风险交易（fraud_prob_pred > threshold）的节点进行欺诈类型分类。
     其他节点保持 Normal，不参与分类。
+    G 可以是 nx.Graph，也可以是 CompactGraph（数组实现，标签写入 G.fraud_type）。
     """
     print("\n🔍 基于风险交易子图识别欺诈类型...")
+    from .compact_graph import CompactGraph
+    if isinstance(G, CompactGraph):
+        return _classify_compact(G, risk_threshold)
+    import networkx as nx
 
     # 1️⃣ 提取所有风险交易边
     risky_edges = [(u, v) for u, v, data in G.edges(data=True)
@@ -79,142 +101,170 @@ def classify_fraud_patterns(G, risk_threshold=0.5):
 
     print(f"✅ 已为 {len(risky_nodes)} 个风险节点添加欺诈类型标签")
     return labels
-def _build_edges_df(step_range) -> pd.DataFrame:
-    """
-    Load one or multiple daily CSVs and concatenate.
-    step_range: (step_start, step_end) inclusive descending.
-    """
-    csv_path = 'data/test_predictions_v2.0.csv' 
-    df = pd.read_csv(csv_path)
-    print(step_range)
+
+
+def _classify_compact(G, risk_threshold: float) -> dict:
+    """Same rules as the nx path, on the CompactGraph arrays."""
+    risky_edges = G.fraud | (G.prob > risk_threshold)
+    risky = np.zeros(G.number_of_nodes(), dtype=bool)
+    risky[G.u[risky_edges]] = True
+    risky[G.v[risky_edges]] = True
+    G.fraud_type = np.full(G.number_of_nodes(), "Normal", dtype=object)
+    if not risky.any():
+        print("⚠️ 没有检测到风险交易，跳过分类。")
+        return {}
+
+    subG = G.subgraph(risky)
+    degree = subG.degree()
+    label = np.full(subG.number_of_nodes(), None, dtype=object)
+
+    label[degree > degree.mean() + 2 * degree.std()] = "F1_Star_Fraud"
+    label[degree == 1] = "F4_Isolated_Pair"
+    try:
+        label[subG.cycle_nodes() & (label == None)] = "F3_Cycle_Fraud"  # noqa: E711
+    except Exception:
+        pass
+    label[(degree == 2) & (label == None)] = "F2_Chain_Fraud"  # noqa: E711
+
+    n_comp, comp = subG.components()
+    size = np.bincount(comp, minlength=n_comp)
+    mean_clust = np.bincount(comp, weights=subG.clustering(), minlength=n_comp) / np.maximum(size, 1)
+    gang = ((size > 5) & (mean_clust > 0.6))[comp]
+    label[gang & (label == None)] = "F5_Community_Fraud"  # noqa: E711
+
+    labelled = label != None  # noqa: E711
+    G.fraud_type[risky] = np.where(labelled, label, "Risk_Node")
+    print(f"✅ 已为 {int(risky.sum())} 个风险节点添加欺诈类型标签")
+    return dict(zip(subG.names[labelled], label[labelled]))
+
+
+def _step_window(step_range):
+    """step_range: (step_start, step_end) inclusive, either order; None/empty = all steps."""
     if not step_range:
         # 没写就读全部
-        return df
-    start, end = sorted((int(step_range[0]), int(step_range[1])), reverse=False)
-    # 过滤条件：step >= 11 且 step <= 200
-    filtered_df = df[(df['step'] >= start) & (df['step'] <= end)]
-    return filtered_df
-
+        return None, None
+    start, end = sorted((int(step_range[0]), int(step_range[1])))
+    return start, end
+
+def _temporal_graph():
+    # 时序图索引按文件 mtime 缓存，窗口查询只做二分查找，不再每次重建整张图
+    # 图相关依赖（scipy / networkx）在第一次画图时才导入，不拖慢看板冷启动
+    from .temporal_graph import get_temporal_graph
+    with span("temporal_graph"):
+        return get_temporal_graph(PREDICTIONS_PATH)
+
+@traced()
 def render_person_graph(
     client_name: str,
     role: str = "both",  # "both" | "origin" | "destination"
     step_range=None,
-    output_html="data/risk_graph.html"
+    output_html: str = None
 ) -> str:
     """
     Build a 1-hop neighborhood graph for a given account with role filtering.
+    The page is rendered in memory and cached; pass output_html to also export it.
     """
-    df = _build_edges_df(step_range)
-    if df.empty:
-        return "<p>⚠️ No data available for the selected date range.</p>"
-
-    need = ["orig_id", "dest_id", "transaction_id", "fraud_prob_pred"]
-    if any(c not in df.columns for c in need):
+    try:
+        tg = _temporal_graph()
+    except ValueError:
         return "<p>⚠️ CSV missing required columns.</p>"
+    start, end = _step_window(step_range)
+    client = _to_str(client_name)
 
-    df["orig_id"] = df["orig_id"].apply(_to_str)
-    df["dest_id"] = df["dest_id"].apply(_to_str)
-    client = str(client_name)
+    key = ("person", client, role, start, end, tg.version)
+    html = FRAGMENTS.get(key)
+    if html is None:
+        if len(tg.window_edges(start, end)) == 0:
+            return "<p>⚠️ No data available for the selected date range.</p>"
 
-    if role == "origin":
-        sub = df[df["orig_id"] == client]
-    elif role == "destination":
-        sub = df[df["dest_id"] == client]
-    else:
-        sub = df[(df["orig_id"] == client) | (df["dest_id"] == client)]
-
-    if sub.empty:
-        return f"<p>⚠️ No transactions for {client} with role={role}.</p>"
+        edges = tg.node_edges(client, role, start, end)
+        if len(edges) == 0:
+            return f"<p>⚠️ No transactions for {client} with role={role}.</p>"
 
-    G = nx.Graph()
-    for _, r in sub.iterrows():
-        G.add_edge(
-            r["orig_id"], r["dest_id"],
-            tx=str(r["transaction_id"]),
-            prob=float(r["fraud_prob_pred"])
-        )
+        with span("build_graph", edges=len(edges)):
+            G = tg.to_networkx(edges)
 
-    if client not in G:
-        return f"<p>⚠️ {client} not present in the graph.</p>"
+        if client not in G:
+            return f"<p>⚠️ {client} not present in the graph.</p>"
 
-    # 1-hop ego graph
-    subG = nx.ego_graph(G, client, radius=1)
+        # 1-hop ego graph
+        import networkx as nx
+        subG = nx.ego_graph(G, client, radius=1)
 
-    net = Network(height="600px", width="100%", bgcolor="#ffffff")
-    # Nodes (no border by default, visible border when selected)
-    for n in subG.nodes():
+        # Nodes (no border by default, visible border when selected)
         node_size = 18
-        net.add_node(
-            n,
-            color="#444444" if n == client else "#A0A0A0",
-            label=n,
-            size=node_size,
-            borderWidth=0,
-            borderWidthSelected=max(2, node_size // 10),
-        )
-
-    # Edges
-    for u, v, d in subG.edges(data=True):
-        color = "red" if d.get("prob", 0) > 0.5 else "gray"
-        net.add_edge(
-            u, v,
-            title=f"Transaction: {d.get('tx','N/A')} | Fraud Probability={d.get('prob',0):.2f}",
-            color=color
-        )
-
-    os.makedirs(os.path.dirname(output_html), exist_ok=True)
-    net.save_graph(output_html)
-    with open(output_html, encoding="utf-8") as f:
-        return f.read()
-
-
-def render_high_risk_network(df: pd.DataFrame, output_html: str = "risk_network.html", risk_threshold: float = 0.5) -> str:
+        nodes = [{
+            "id": n,
+            "label": n,
+            "color": "#444444" if n == client else "#A0A0A0",
+            "size": node_size,
+            "borderWidth": 0,
+            "borderWidthSelected": max(2, node_size // 10),
+        } for n in subG.nodes()]
+
+        # Edges
+        links = [{
+            "from": u,
+            "to": v,
+            "title": f"Transaction: {d.get('tx','N/A')} | Fraud Probability={d.get('prob',0):.2f}",
+            "color": "red" if d.get("prob", 0) > 0.5 else "gray",
+        } for u, v, d in subG.edges(data=True)]
+
+        with span("render_html"):
+            html = FRAGMENTS.put(key, nodes, links, "person")
+
+    if output_html:
+        _export(html, output_html)
+    return html
+
+
+@traced()
+def render_high_risk_network(df: pd.DataFrame = None, output_html: str = None, risk_threshold: float = 0.5, step_range=None, client_name: str = "") -> str:
     """
     构建并绘制包含欺诈类型分类的全局风险网络。
-    数据来自过滤后的交易 DataFrame。
+    数据来自过滤后的交易 DataFrame；df 为 None 时直接从时序图索引取 step_range 内
+    fraud_prob_pred >= risk_threshold 的交易（可按 client_name 过滤），结果按参数缓存；
+    传入 DataFrame 时按其内容摘要缓存。
     """
-    if df.empty:
+    if df is None:
+        tg = _temporal_graph()
+        start, end = _step_window(step_range)
+        client = _to_str(client_name) if client_name else None
+        key = ("network", client, "both", start, end, float(risk_threshold), tg.version)
+        html = FRAGMENTS.get(key)
+        if html is not None:
+            if output_html:
+                _export(html, output_html)
+            return html
+        with span("build_graph"):
+            G = tg.risk_compact(start, end, min_prob=risk_threshold, client=client)
+        if G.number_of_edges() == 0:
+            return "<p>⚠️ No high-risk transactions to visualize.</p>"
+    elif df.empty:
         return "<p>⚠️ No high-risk transactions to visualize.</p>"
-
-    # === 1️⃣ 构建交易网络 ===
-    G = nx.Graph()
-    for _, r in df.iterrows():
-        orig = str(r["orig_id"])
-        dest = str(r["dest_id"])
-        prob = float(r.get("fraud_prob_pred", 0))
-        tx = str(r.get("transaction_id", "N/A"))
-        amt = float(r.get("amount", 0))
-        G.add_edge(orig, dest,
-                   fraud_prob_pred=prob,
-                   tx_id=tx,
-                   amount=amt,
-                   fraud=(prob > risk_threshold))
+    else:
+        key = ("frame", _frame_digest(df), float(risk_threshold))
+        html = FRAGMENTS.get(key)
+        if html is not None:
+            if output_html:
+                _export(html, output_html)
+            return html
+        # === 1️⃣ 构建交易网络 ===
+        from .compact_graph import CompactGraph
+        from .temporal_graph import _id_strings
+        with span("build_graph", edges=len(df)):
+            G = CompactGraph.from_arrays(
+                _id_strings(df["orig_id"]), _id_strings(df["dest_id"]),
+                df["fraud_prob_pred"].astype(float).to_numpy() if "fraud_prob_pred" in df.columns else np.zeros(len(df)),
+                df["amount"].astype(float).to_numpy() if "amount" in df.columns else None,
+                df["transaction_id"].to_numpy() if "transaction_id" in df.columns else None,
+                risk_threshold,
+            )
 
     # === 2️⃣ 分类欺诈模式 ===
     labels = classify_fraud_patterns(G, risk_threshold=risk_threshold)
 
-    # === 3️⃣ 可视化配置 ===
-    net = Network(height="700px", width="100%", bgcolor="#ffffff", directed=False)
-    net.force_atlas_2based(gravity=-40)
-
-    net.set_options("""
-    var options = {
-      "nodes": {
-        "shape": "dot",
-        "font": {"size": 14}
-      },
-      "edges": {
-        "color": {"inherit": false},
-        "smooth": false
-      },
-      "physics": {
-        "enabled": true,
-        "stabilization": {"iterations": 100}
-      }
-    }
-    """)
-
-    # === 4️⃣ 按欺诈类型上色 ===
+    # === 3️⃣ 按欺诈类型上色 ===
     color_map = {
         "F1_Star_Fraud": "#ff4d4d",
         "F2_Chain_Fraud": "#00b050",
@@ -225,36 +275,39 @@ def render_high_risk_network(df: pd.DataFrame, output_html: str = "risk_network.
         "Normal": "#5B8FF9"
     }
 
-    for n in G.nodes():
-        fraud_type = G.nodes[n].get("fraud_type", "Normal")
-        degree = G.degree(n)
-        node_color = color_map.get(fraud_type, "#5B8FF9")
-        net.add_node(
-            n,
-            label=n,
-            color=node_color,
-            size=15 + degree * 1.2,
-            title=f"Account: {n}<br>Fraud Type: {fraud_type}<br>Degree: {degree}"
-        )
-
-    # === 5️⃣ 添加边信息 ===
-    for u, v, d in G.edges(data=True):
-        prob = d.get("fraud_prob_pred", 0)
-        color = "red" if prob > 0.8 else ("orange" if prob > 0.5 else "gray")
-        width = 3 if prob > 0.8 else (2 if prob > 0.5 else 1)
-        tx = d.get("tx_id", "N/A")
-        amt = d.get("amount", 0)
-        net.add_edge(
-            u, v,
-            color=color,
-            width=width,
-            title=f"Transaction: {tx}<br>Amount: {amt:.2f}<br>Fraud Prob: {prob:.3f}"
-        )
-
-    # === 6️⃣ 输出结果 ===
+    nodes = []
+    for n, fraud_type, degree in zip(G.names, G.fraud_type, G.degree().tolist()):
+        nodes.append({
+            "id": n,
+            "label": n,
+            "color": color_map.get(fraud_type, "#5B8FF9"),
+            "size": 15 + degree * 1.2,
+            "title": f"Account: {n}<br>Fraud Type: {fraud_type}<br>Degree: {degree}",
+        })
+
+    # === 4️⃣ 添加边信息 ===
+    links = []
+    for u, v, prob, tx, amt in zip(G.names[G.u], G.names[G.v], G.prob.tolist(), G.tx.tolist(), G.amount.tolist()):
+        links.append({
+            "from": u,
+            "to": v,
+            "color": "red" if prob > 0.8 else ("orange" if prob > 0.5 else "gray"),
+            "width": 3 if prob > 0.8 else (2 if prob > 0.5 else 1),
+            "title": f"Transaction: {tx}<br>Amount: {amt:.2f}<br>Fraud Prob: {prob:.3f}",
+        })
+
+    # === 5️⃣ 输出结果（内存渲染，按内容寻址缓存）===
+    with span("render_html"):
+        html = FRAGMENTS.put(key, nodes, links, "network")
+    if output_html:
+        _export(html, output_html)
+    return html
+
+
+def _export(html: str, output_html: str):
+    """Optional export of a rendered page; writes to a temp file first so concurrent exports never interleave."""
     os.makedirs(os.path.dirname(output_html) or ".", exist_ok=True)
-    net.save_graph(output_html)
-
-    with open(output_html, encoding="utf-8") as f:
-        return f.read()
-    
+    tmp = f"{output_html}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(tmp, output_html)
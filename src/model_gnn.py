@@ -1,47 +1,59 @@
 # ==================== inference_from_saved_model.py ====================
 import torch
-import torch.nn.functional as F
 import numpy as np
 import pandas as pd
-import json, pickle, os
+import argparse
+import os
+import sys
 from torch_geometric.data import Data
-from torch_geometric.nn import SAGEConv
-from sklearn.preprocessing import StandardScaler
-import streamlit as st
+
+from gnn_core import DEVICE, MODEL_PATH, load_artifacts, load_model, build_edge_attr, build_node_features, predict_proba
 
 # ==================== 1️⃣ 自动定位目录 ====================
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))        # src/
 BASE_DIR = os.path.dirname(CURRENT_DIR)                         # 项目根目录
 MODEL_DIR = os.path.join(BASE_DIR, "model")                     # model 文件夹
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+from src.prediction_store import PREDICTIONS_OUT, append_predictions, prediction_frame
 
-MODEL_PATH = os.path.join(MODEL_DIR, "best_model.pth")
-CONFIG_PATH = os.path.join(MODEL_DIR, "config.json")
-SCALER_PATH = os.path.join(MODEL_DIR, "scalers.pkl")
-MAP_PATH = os.path.join(MODEL_DIR, "mapping.pkl")
+# 输入输出由参数指定：并发运行时各自使用自己的文件，共享预测文件经单写者追加（src/prediction_store.py）
+parser = argparse.ArgumentParser(description="Full-vocabulary EdgeSAGE inference over an enriched CSV")
+parser.add_argument("input", nargs="?", default=None, help="enriched CSV (default: enriched_transactions.csv in src/ or the project root)")
+parser.add_argument("--output", default=None, help="also write the predictions to this CSV")
+parser.add_argument("--append-to", default=PREDICTIONS_OUT, help="shared prediction file to append to ('' to skip)")
+args = parser.parse_args()
 
 print(f"📂 当前工作目录: {CURRENT_DIR}")
 print(f"📦 模型目录: {MODEL_DIR}")
 
 # ==================== 2️⃣ 加载配置、映射与模型参数 ====================
-with open(CONFIG_PATH, "r") as f:
-    config = json.load(f)
-with open(SCALER_PATH, "rb") as f:
-    scalers = pickle.load(f)
-with open(MAP_PATH, "rb") as f:
-    mapping = pickle.load(f)
-
-node_scaler = scalers["node_scaler"]
-edge_scaler = scalers["edge_scaler"]
-node2idx = mapping["node2idx"]
-unique_nodes = mapping["unique_nodes"]
-
-# DEVICE = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-DEVICE = torch.device('cpu')
+# 设置了 PULSE4_SHARED_STORE 时，权重与映射直接挂载共享存储（src/shared_store.py），不再每个进程各读一份
+store = None
+SHARED_ROOT = os.environ.get("PULSE4_SHARED_STORE")
+if SHARED_ROOT:
+    from src.shared_store import attached
+    store = attached(SHARED_ROOT)
+    if store is not None and not store.fresh("model", MODEL_PATH):
+        store = None
+
+if store is not None:
+    artifacts = store.model_artifacts()
+    print(f"✅ 模型与映射挂载自共享存储：{SHARED_ROOT}")
+else:
+    artifacts = load_artifacts(MODEL_DIR)
+config = artifacts["config"]
+node_scaler = artifacts["node_scaler"]
+edge_scaler = artifacts["edge_scaler"]
+unique_nodes = artifacts["unique_nodes"]
+
 print(f"✅ 配置加载完成，使用设备：{DEVICE}")
 
 # ==================== 3️⃣ 数据加载 ====================
-CSV_PATH = os.path.join(CURRENT_DIR, "enriched_transactions.csv")
+CSV_PATH = args.input or os.path.join(CURRENT_DIR, "enriched_transactions.csv")
 
+if not os.path.exists(CSV_PATH) and args.input:
+    raise FileNotFoundError(f"❌ 未找到特征文件 {CSV_PATH}")
 if not os.path.exists(CSV_PATH):
     # 若当前目录无该文件，则尝试项目根目录（防止在 src/ 与根目录之间切换）
     alt_path = os.path.join(BASE_DIR, "enriched_transactions.csv")
@@ -60,82 +72,20 @@ print(f"✅ 成功读取数据：{len(df)} 条记录")
 
 
 # ==================== 4️⃣ 构建图结构 ====================
-src = df['orig_id'].map(node2idx).to_numpy(dtype=np.int64)
-dst = df['dest_id'].map(node2idx).to_numpy(dtype=np.int64)
+if store is not None:
+    src = store.node_codes(df['orig_id'].to_numpy())
+    dst = store.node_codes(df['dest_id'].to_numpy())
+else:
+    node2idx = artifacts["node2idx"]
+    src = df['orig_id'].map(node2idx).to_numpy(dtype=np.int64)
+    dst = df['dest_id'].map(node2idx).to_numpy(dtype=np.int64)
 edge_index = np.vstack([src, dst])
 edge_y = df['isFraud'].astype(int).to_numpy()
 
-edge_attr = df[['amount', 'time_period']].to_numpy(dtype=np.float64)
-edge_risk_weight = 0.2 + 0.8 * df['isFraud'].astype(float).to_numpy()
-edge_attr = np.hstack([edge_attr, edge_risk_weight.reshape(-1, 1)])
-edge_attr = np.nan_to_num(edge_attr)
-edge_attr = edge_scaler.transform(edge_attr).astype(np.float32)
+edge_attr = build_edge_attr(df, edge_scaler)
 
 # === 节点特征构造 ===
-grp_orig = df.groupby('orig_id')
-grp_dest = df.groupby('dest_id')
-
-def safe_stat(g, col, func='mean', fill=0):
-    if func == 'mean':
-        return g[col].mean().reindex(unique_nodes, fill_value=fill).to_numpy()
-    elif func == 'sum':
-        return g[col].sum().reindex(unique_nodes, fill_value=fill).to_numpy()
-    elif func == 'count':
-        return g.size().reindex(unique_nodes, fill_value=fill).to_numpy()
-
-# 基础统计特征
-orig_count = safe_stat(grp_orig, 'amount', 'count')
-orig_sum = safe_stat(grp_orig, 'amount', 'sum')
-orig_mean = safe_stat(grp_orig, 'amount', 'mean')
-dest_count = safe_stat(grp_dest, 'amount', 'count')
-dest_sum = safe_stat(grp_dest, 'amount', 'sum')
-dest_mean = safe_stat(grp_dest, 'amount', 'mean')
-
-# balance ratio & volatility
-orig_bal = safe_stat(grp_orig, 'orig_balance_ratio')
-dest_bal = safe_stat(grp_dest, 'dest_balance_ratio')
-orig_vol = safe_stat(grp_orig, 'orig_curr_volatility')
-dest_vol = safe_stat(grp_dest, 'dest_curr_volatility')
-
-# 30天统计
-for col in ['orig_30d_mean','orig_30d_var','dest_30d_mean','dest_30d_var']:
-    if col not in df.columns:
-        df[col] = 0.0
-
-orig_30d_mean = df.groupby('orig_id')['orig_30d_mean'].mean().reindex(unique_nodes, fill_value=0).to_numpy()
-dest_30d_mean = df.groupby('dest_id')['dest_30d_mean'].mean().reindex(unique_nodes, fill_value=0).to_numpy()
-orig_30d_var  = df.groupby('orig_id')['orig_30d_var'].mean().reindex(unique_nodes, fill_value=0).to_numpy()
-dest_30d_var  = df.groupby('dest_id')['dest_30d_var'].mean().reindex(unique_nodes, fill_value=0).to_numpy()
-
-# 时间窗口统计
-if {'orig_tx_24h','orig_tx_72h','orig_tx_168h','orig_avg_amt_24h'}.issubset(df.columns):
-    freq_24h = df.groupby('orig_id')['orig_tx_24h'].mean().reindex(unique_nodes, fill_value=0).to_numpy()
-    freq_72h = df.groupby('orig_id')['orig_tx_72h'].mean().reindex(unique_nodes, fill_value=0).to_numpy()
-    freq_168h = df.groupby('orig_id')['orig_tx_168h'].mean().reindex(unique_nodes, fill_value=0).to_numpy()
-    avg_24h = df.groupby('orig_id')['orig_avg_amt_24h'].mean().reindex(unique_nodes, fill_value=0).to_numpy()
-else:
-    freq_24h = freq_72h = freq_168h = avg_24h = np.zeros(len(unique_nodes))
-
-# 行为模式 One-hot
-modes = ['active','normal','low_freq','bursty']
-mode_map = {m:i for i,m in enumerate(modes)}
-if 'orig_behavior_mode' in df.columns:
-    orig_mode_idx = df.groupby('orig_id')['orig_behavior_mode'].first().reindex(unique_nodes, fill_value='normal').map(mode_map).to_numpy()
-else:
-    orig_mode_idx = np.zeros(len(unique_nodes), dtype=int)
-orig_mode_oh = np.eye(len(modes))[orig_mode_idx]
-
-node_feats = np.vstack([
-    orig_count, orig_sum, orig_mean,
-    dest_count, dest_sum, dest_mean,
-    orig_bal, dest_bal, orig_vol, dest_vol,
-    orig_30d_mean, orig_30d_var, dest_30d_mean, dest_30d_var,
-    freq_24h, freq_72h, freq_168h, avg_24h
-]).T.astype(np.float64)
-node_feats = np.hstack([node_feats, orig_mode_oh.astype(np.float64)])
-
-node_feats = np.nan_to_num(node_feats)
-node_feats = node_scaler.transform(node_feats).astype(np.float32)
+node_feats = build_node_features(df, unique_nodes, node_scaler)
 
 data = Data(
     x=torch.tensor(node_feats, dtype=torch.float),
@@ -145,80 +95,25 @@ data = Data(
 ).to(DEVICE)
 
 # ==================== 5️⃣ 模型定义与加载 ====================
-class EdgeSAGE(torch.nn.Module):
-    def __init__(self, node_in, edge_in, hidden_dim):
-        super().__init__()
-        self.conv1 = SAGEConv(node_in, hidden_dim)
-        self.conv2 = SAGEConv(hidden_dim, hidden_dim)
-        self.edge_mlp = torch.nn.Sequential(
-            torch.nn.Linear(hidden_dim * 2 + edge_in, hidden_dim),
-            torch.nn.ReLU(),
-            torch.nn.Dropout(0.2),
-            torch.nn.Linear(hidden_dim, 1)
-        )
-
-    def forward(self, x, edge_index, edge_attr):
-        x = F.relu(self.conv1(x, edge_index))
-        x = F.relu(self.conv2(x, edge_index))
-        src, dst = edge_index
-        src_emb, dst_emb = x[src], x[dst]
-        edge_feat = torch.cat([src_emb, dst_emb, edge_attr], dim=1)
-        return self.edge_mlp(edge_feat).view(-1)
-
-model = EdgeSAGE(node_in=data.num_node_features, edge_in=edge_attr.shape[1], hidden_dim=config["EMBED_DIM"]).to(DEVICE)
-model.load_state_dict(torch.load(MODEL_PATH, map_location=DEVICE))
-model.eval()
+model = store.load_model(DEVICE) if store is not None else load_model(artifacts, MODEL_PATH, DEVICE)
 print("✅ 模型权重加载成功")
 
 # ==================== 6️⃣ 推理 ====================
-with torch.no_grad():
-    logits = model(data.x, data.edge_index, data.edge_attr)
-    probs = torch.sigmoid(logits).cpu().numpy()
-    preds = (probs > 0.5).astype(int)
+probs = predict_proba(model, data.x, data.edge_index, data.edge_attr)
 
 # === 输出结果 ===
-df_out = pd.DataFrame({
-    "step": df["step"],
-    "orig_id": df["orig_id"],
-    "dest_id": df["dest_id"],
-    "amount": df["amount"],
-    "fraud_prob_pred": probs,
-    "isFraud_pred": preds,
-})
-
-file_path = "/home/yjing/Pulse4_Project/data/test_predictions_v3.0.csv"
-
-df_out = df_out.sort_values("step").reset_index(drop=True)
-df_out["transaction_id"] = "1743200002"
+df_out = prediction_frame(df, probs)
 
-# Move transaction_id to the first column
-df_out = df_out[["transaction_id", "step", "orig_id", "dest_id", "amount", "fraud_prob_pred", "isFraud_pred"]]
-
-OUTPUT_PATH = os.path.join(CURRENT_DIR, "inference_result.csv")
-
-#df_out.to_csv(file_path, index=False)  # save in v3.0 (new)
-df_out.to_csv(OUTPUT_PATH, index=False)
-
-print(f"\n📄 推理完成，结果已保存至：{OUTPUT_PATH}\n")
+if args.output:
+    df_out.to_csv(args.output, index=False)
+    print(f"\n📄 推理完成，结果已保存至：{args.output}\n")
 print("📊 推理结果预览：")
-string_out = df_out.to_string(index=False)
-print(string_out)
-st.json(string_out)
-
-try:
-    # Check if the file exists
-    if os.path.exists(file_path):
-        # Append to the file without writing the header
-        df_out.to_csv(file_path, mode='a', header=False, index=False)
-    else:
-        # If the file doesn't exist (should not happen in this case), create it and write the header
-        df_out.to_csv(file_path, mode='w', header=True, index=False)
-
-    print(f"\n📄 Inference completed. Results appended to: {file_path}\n")
-    print("📊 Preview of inference results:")
-    string_out = df_out.to_string(index=False)
-    print(string_out)
-    st.json(string_out)  # Display the result as JSON in Streamlit
-    
-except Exception as e:
-    print(f"⚠️ An error occurred while saving the result: {e}")
\ No newline at end of file
+print(df_out.to_string(index=False))
+
+if args.append_to:
+    try:
+        # 加锁的单次追加：并发会话不会交错写入或重复表头
+        append_predictions(df_out, args.append_to)
+        print(f"\n📄 Inference completed. Results appended to: {args.append_to}\n")
+    except Exception as e:
+        print(f"⚠️ An error occurred while saving the result: {e}")
\ No newline at end of file
@@ -1,7 +1,6 @@
 # src/model_utils.py
 import os
 from dotenv import load_dotenv
-from ibm_watsonx_ai.foundation_models import Model
 
 load_dotenv()
 
@@ -12,6 +11,7 @@ def get_watsonx_model():
     if not api or not pid:
         return None
     try:
+        from ibm_watsonx_ai.foundation_models import Model   # optional client, imported on first use
         return Model(
             model_id="meta-llama/llama-2-13b-chat",
             params={"temperature": 0.2, "max_new_tokens": 200},
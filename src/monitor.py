@@ -0,0 +1,302 @@
+"""
+Online drift and latency monitoring on the scoring path.
+
+`ScoringMonitor.observe(x, edge_attr, probs)` folds one scored batch into
+fixed-bin histograms, and `observe_latency(stage, seconds)` into per-stage
+ring buffers; both are a few vectorized numpy calls per batch, so the cost per
+transaction stays in microseconds.  On a schedule (`start()`: a daemon thread
+every `interval` seconds) the window since the last check is compared with the
+reference and the result is written to `metrics/monitor.json`, which the
+dashboard's "📡 Model monitor" panel reads.
+
+- Scaled node and edge features are binned at the 20 equal-probability
+  quantiles of N(0, 1), `fraud_prob_pred` at 20 equal-width bins.
+- Reference: the histograms of the first REFERENCE_EVENTS scored transactions,
+  frozen automatically; drift is not evaluated before then.  The scaler's
+  training statistics are no reference: count and sum features are not
+  normal, and at serving time they are aggregated over the request batch, so
+  they would show a permanent baseline PSI.  `freeze_reference()` or
+  `reference_path` replace it with the histogram of trusted traffic.
+- Per feature: PSI and KS (max CDF gap at the bin edges) over the window,
+  plus the scaled mean and std (0 and 1 under the training statistics).
+- Latency: p50 / p95 / p99 / max per stage over the last LATENCY_WINDOW
+  batches, also observed into the tracing histograms (`score_<stage>`).
+
+    monitor = ScoringMonitor().start()
+    monitor.observe(x, edge_attr, probs)            # per batch, on the scoring thread
+    monitor.check()                                 # {"features": [...], "latency": {...}, ...}
+"""
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from statistics import NormalDist
+
+import numpy as np
+
+from .tracing import HISTOGRAMS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_PATH = os.path.join(BASE_DIR, "metrics", "monitor.json")
+BINS = 20
+EDGES = np.array([NormalDist().inv_cdf(k / BINS) for k in range(1, BINS)])
+PROB_EDGES = np.linspace(0.0, 1.0, BINS + 1)[1:-1]
+PSI_WATCH, PSI_DRIFT = 0.1, 0.25
+MIN_EVENTS = 200
+REFERENCE_EVENTS = 2000
+INTERVAL = 60.0
+LATENCY_WINDOW = 2048
+HISTORY = 60
+EPS = 1e-4
+
+
+def psi(expected: np.ndarray, observed: np.ndarray) -> float:
+    """Population stability index of two bin distributions (each summing to 1)."""
+    p, q = np.clip(expected, EPS, None), np.clip(observed, EPS, None)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks(expected: np.ndarray, observed: np.ndarray) -> float:
+    """Largest CDF gap at the bin edges (binned Kolmogorov-Smirnov statistic)."""
+    return float(np.max(np.abs(np.cumsum(observed) - np.cumsum(expected))))
+
+
+def _status(value: float) -> str:
+    return "drift" if value >= PSI_DRIFT else "watch" if value >= PSI_WATCH else "ok"
+
+
+class Sketch:
+    """Per-feature bin counts plus running sums, over fixed bin edges."""
+
+    def __init__(self, names, edges: np.ndarray):
+        self.names = list(names)
+        self.edges = edges
+        self.nbins = len(edges) + 1
+        self._offsets = (np.arange(len(self.names)) * self.nbins)[None, :]
+        self.reset()
+
+    def reset(self):
+        self.counts = np.zeros((len(self.names), self.nbins), dtype=np.int64)
+        self.sum = np.zeros(len(self.names))
+        self.sumsq = np.zeros(len(self.names))
+        self.n = 0
+
+    def add(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+        if not len(values):
+            return
+        idx = np.searchsorted(self.edges, values) + self._offsets
+        self.counts += np.bincount(idx.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+        self.sum += values.sum(axis=0)
+        self.sumsq += np.square(values).sum(axis=0)
+        self.n += len(values)
+
+    def merge(self, other: "Sketch"):
+        self.counts += other.counts
+        self.sum += other.sum
+        self.sumsq += other.sumsq
+        self.n += other.n
+
+    def fractions(self) -> np.ndarray:
+        return self.counts / max(self.n, 1)
+
+    def compare(self, reference: np.ndarray, group: str) -> list:
+        """PSI / KS / scaled mean and std of every feature against the reference bin masses."""
+        if self.n == 0:
+            return []
+        frac = self.fractions()
+        mean = self.sum / self.n
+        std = np.sqrt(np.maximum(self.sumsq / self.n - mean ** 2, 0.0))
+        rows = []
+        for j, name in enumerate(self.names):
+            value = psi(reference[j], frac[j])
+            rows.append({"group": group, "feature": name, "n": self.n, "psi": round(value, 4),
+                         "ks": round(ks(reference[j], frac[j]), 4), "mean": round(float(mean[j]), 4),
+                         "std": round(float(std[j]), 4), "status": _status(value)})
+        return rows
+
+
+class LatencyRing:
+    """The last LATENCY_WINDOW observations of one stage, in a fixed numpy ring."""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self.values = np.zeros(size)
+        self.count = 0
+
+    def add(self, seconds: float):
+        self.values[self.count % len(self.values)] = seconds
+        self.count += 1
+
+    def summary(self) -> dict:
+        v = self.values[:min(self.count, len(self.values))]
+        if not len(v):
+            return {}
+        p50, p95, p99 = (float(q) for q in np.percentile(v, (50, 95, 99)))
+        return {"count": self.count, "p50_ms": round(1000 * p50, 3), "p95_ms": round(1000 * p95, 3),
+                "p99_ms": round(1000 * p99, 3), "max_ms": round(1000 * float(v.max()), 3)}
+
+
+# ==================== Monitor ====================
+class ScoringMonitor:
+    """Drift of the scaled model inputs and predictions, and per-stage latency, for one scoring process."""
+
+    def __init__(self, interval: float = INTERVAL, snapshot_path: str = SNAPSHOT_PATH, reference_path: str = None):
+        from .gnn_core import EDGE_FEATURE_NAMES, NODE_FEATURE_NAMES
+        self.interval = interval
+        self.snapshot_path = snapshot_path
+        self._names = {"node": NODE_FEATURE_NAMES, "edge": EDGE_FEATURE_NAMES}
+        self._lock = threading.Lock()
+        self.window = self._sketches()
+        self.total = self._sketches()
+        self.reference = {"node": None, "edge": None, "prob": None, "source": None}
+        self.baseline = self._sketches()          # traffic towards the automatic reference
+        if reference_path:
+            self.load_reference(reference_path)
+        self.latency = {}
+        self.history = deque(maxlen=HISTORY)
+        self.transactions = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sketches(self) -> dict:
+        return {"node": Sketch(self._names["node"], EDGES), "edge": Sketch(self._names["edge"], EDGES),
+                "prob": Sketch(["fraud_prob_pred"], PROB_EDGES)}
+
+    # ---------- hot path ----------
+    def observe(self, x, edge_attr, probs):
+        """Fold one scored batch (scaled node matrix, scaled edge matrix, probabilities) into the window."""
+        x, edge_attr, probs = (np.asarray(a) for a in (x, edge_attr, probs))
+        with self._lock:
+            self.window["node"].add(x)
+            self.window["edge"].add(edge_attr)
+            self.window["prob"].add(probs)
+            self.transactions += len(probs)
+
+    def observe_latency(self, stage: str, seconds: float):
+        ring = self.latency.get(stage)
+        if ring is None:
+            ring = self.latency.setdefault(stage, LatencyRing())
+        ring.add(seconds)
+        HISTOGRAMS.observe(f"score_{stage}", seconds)
+
+    # ---------- scheduled check ----------
+    def check(self) -> dict:
+        """
+        Compare the window with the reference, fold it into the totals and
+        start a new window.  A window below MIN_EVENTS transactions is kept
+        open (drift not evaluated) so quiet periods still add up.  Until a
+        reference exists, closed windows go into the baseline instead, which
+        becomes the reference at REFERENCE_EVENTS transactions.
+        """
+        with self._lock:
+            window = self.window
+            closed = window["prob"].n >= MIN_EVENTS
+            if closed:
+                self.window = self._sketches()
+        features = []
+        building = closed and self.reference["source"] is None
+        if building:
+            for group, sketch in window.items():
+                self.baseline[group].merge(sketch)
+            if self.baseline["prob"].n >= REFERENCE_EVENTS:
+                self._set_reference(self.baseline, f"first {self.baseline['prob'].n} tx (auto)")
+        elif closed:
+            for group in ("node", "edge", "prob"):
+                if self.reference[group] is not None:
+                    features += window[group].compare(self.reference[group], group)
+            features.sort(key=lambda r: -r["psi"])
+        if closed:
+            for group, sketch in window.items():
+                self.total[group].merge(sketch)
+        result = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "window_transactions": window["prob"].n,
+            "transactions": self.transactions,
+            "reference": self._reference_label(),
+            "drifted": [r["feature"] for r in features if r["status"] == "drift"],
+            "max_psi": features[0]["psi"] if features else None,
+            "features": features,
+            "prob_histogram": {"edges": PROB_EDGES.round(3).tolist(),
+                               "window": window["prob"].fractions()[0].round(4).tolist(),
+                               "reference": None if self.reference["prob"] is None
+                               else np.asarray(self.reference["prob"])[0].round(4).tolist()},
+            "latency": {stage: ring.summary() for stage, ring in list(self.latency.items())},
+        }
+        if not closed:
+            result["note"] = f"window below {MIN_EVENTS} transactions, drift not evaluated yet"
+        elif building:
+            result["note"] = f"window folded into the reference (first {REFERENCE_EVENTS} transactions), drift not evaluated"
+        self.history.append({k: result[k] for k in ("time", "window_transactions", "max_psi", "drifted")})
+        result["history"] = list(self.history)
+        if self.snapshot_path:
+            self._write(result)
+        return result
+
+    def _write(self, result: dict):
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(result, f, indent=2)
+        os.replace(tmp, self.snapshot_path)
+
+    def start(self) -> "ScoringMonitor":
+        """Run `check` every `interval` seconds on a daemon thread (idempotent)."""
+        if self._thread is None:
+            def loop():
+                while not self._stop.wait(self.interval):
+                    try:
+                        self.check()
+                    except Exception as e:
+                        print(f"⚠️ Monitor check failed: {e}")
+            self._thread = threading.Thread(target=loop, name="pulse4-monitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    # ---------- reference ----------
+    def _set_reference(self, sketches: dict, source: str):
+        self.reference.update({g: sketches[g].fractions() for g in sketches if sketches[g].n}, source=source)
+        self.baseline = self._sketches()
+
+    def _reference_label(self) -> str:
+        if self.reference["source"] is not None:
+            return self.reference["source"]
+        return f"building ({self.baseline['prob'].n}/{REFERENCE_EVENTS} tx)"
+
+    def freeze_reference(self, path: str = None) -> dict:
+        """Use the traffic seen so far (totals plus current window) as the reference; optionally save it."""
+        with self._lock:
+            seen = self._sketches()
+            for group in seen:
+                seen[group].merge(self.total[group])
+                seen[group].merge(self.window[group])
+        self._set_reference(seen, f"frozen {datetime.now().isoformat(timespec='seconds')} ({seen['prob'].n} tx)")
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump({k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in self.reference.items()}, f)
+        return self.reference
+
+    def load_reference(self, path: str):
+        with open(path) as f:
+            ref = json.load(f)
+        self.reference.update({k: np.asarray(v) if k != "source" and v is not None else v for k, v in ref.items()})
+        self.reference["source"] = self.reference["source"] or os.path.basename(path)
+
+    def summary(self) -> dict:
+        """Live counters and latency, without closing the window (for /health-style endpoints)."""
+        return {"transactions": self.transactions, "window_transactions": self.window["prob"].n,
+                "reference": self._reference_label(), "last_check": self.history[-1] if self.history else None,
+                "latency": {stage: ring.summary() for stage, ring in list(self.latency.items())}}
+
+
+def load_snapshot(path: str = SNAPSHOT_PATH):
+    """The last check written by a monitor (any process), or None."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
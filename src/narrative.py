@@ -0,0 +1,238 @@
+"""
+Batched LLM narratives for risk lists.
+
+"List high-risk transactions" returns a table, and explaining its rows one by
+one through `risk_score_agent` costs one sequential Watsonx call per row with
+max_new_tokens=5000.  `summarize_risk_list` instead
+
+- renders each transaction once as a compact fact line (cached by tx id; with
+  `explain=True` the line also carries the top model drivers of src/explain.py,
+  computed for the whole list in one batch);
+- groups the lines by sending account (accounts with a single row share
+  "mixed" groups) or by the fraud pattern of src/graph_tool.py, at most
+  MAX_GROUP_TX lines per prompt;
+- sends the group prompts riskiest first, with at most `concurrency` requests
+  in flight and GROUP_MAX_TOKENS new tokens each, until the token budget
+  (estimated prompt + completion tokens) is spent; the remaining groups keep
+  their fact lines without a narrative;
+- caches each narrative by its prompt, so re-opening the same page costs no call.
+
+Offline, `python -m benchmarks.narrative` puts a local mock generator with
+Watsonx-like latency (benchmarks/mock_llm.py) behind the same calls and
+measures the speedup over the sequential path.
+
+    out = summarize_risk_list(get_transactions_page(min_prob=0.9), by="fraud_type")
+    for g in out["groups"]:
+        print(g["title"], g["text"] or g["lines"])
+"""
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .agent import estimate_tokens, get_model
+from .tracing import span, traced
+
+GROUP_BY = ("account", "fraud_type")
+MAX_GROUP_TX = 8             # fact lines per prompt
+GROUP_MAX_TOKENS = 160       # new tokens per narrative (~100 words)
+TOKEN_BUDGET = 6000          # estimated prompt + completion tokens per summarize call
+CONCURRENCY = 4              # requests in flight
+MAX_CACHED = 4096
+FRAUD_TYPE_SCOPE = {
+    "F1_Star_Fraud": "around hub accounts that transact with many counterparties",
+    "F2_Chain_Fraud": "passing funds along chains of accounts",
+    "F3_Cycle_Fraud": "on cycles of transfers between accounts",
+    "F4_Isolated_Pair": "between isolated pairs of accounts",
+    "F5_Community_Fraud": "inside densely connected groups of accounts",
+    "Risk_Node": "involving other high-risk accounts",
+    "Normal": "below the risk threshold",
+}
+
+
+class _LRU:
+    def __init__(self, size: int = MAX_CACHED):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_lines = _LRU()              # (tx id, with drivers) -> fact line
+_narratives = _LRU()         # prompt -> narrative
+
+
+def clear_cache():
+    _lines.clear()
+    _narratives.clear()
+
+
+# ==================== 1️⃣ Fact lines ====================
+def _fact_lines(df: pd.DataFrame, explain: bool) -> list:
+    """One line per row, reusing the cached line of every tx id seen before."""
+    ids = df["transaction_id"].astype(str).tolist()
+    lines = [_lines.get((t, explain)) for t in ids]
+    todo = [i for i, line in enumerate(lines) if line is None]
+    if not todo:
+        return lines
+    from .risk_engine import composite_risk_index
+    rows = df.iloc[todo]
+    risk = composite_risk_index(rows["fraud_prob_pred"].astype(float).tolist(), rows["amount"].astype(float).tolist(),
+                                verbose=False)
+    expls = [None] * len(todo)
+    if explain:
+        try:
+            from .explain import get_explainer
+            expls = get_explainer().explain([ids[i] for i in todo])
+        except Exception as e:
+            print(f"⚠️ Model drivers unavailable: {e}")
+    for j, (i, row) in enumerate(zip(todo, rows.itertuples(index=False))):
+        line = (f"tx {ids[i]}: {row.orig_id} -> {row.dest_id}, amount {float(row.amount):,.2f}, step {row.step}, "
+                f"P {float(row.fraud_prob_pred):.3f}, RI {risk['RI'][j]:.2f} ({risk['risk_level'][j]})")
+        if expls[j] is not None:
+            line += "; drivers " + ", ".join(f"{d['side']} {d['feature']} ({d['contribution']:+.2f})"
+                                             for d in expls[j]["drivers"][:2])
+        _lines.put((ids[i], explain), line)
+        lines[i] = line
+    return lines
+
+
+# ==================== 2️⃣ Groups ====================
+def _fraud_types(df: pd.DataFrame, risk_threshold: float) -> np.ndarray:
+    """Pattern label per row: the origin's label, or the destination's when only it has a pattern."""
+    from .compact_graph import CompactGraph
+    from .graph_tool import classify_fraud_patterns
+    from .temporal_graph import _id_strings
+    orig, dest = _id_strings(df["orig_id"]), _id_strings(df["dest_id"])
+    G = CompactGraph.from_arrays(orig, dest, df["fraud_prob_pred"].astype(float).to_numpy(),
+                                 risk_threshold=risk_threshold)
+    classify_fraud_patterns(G, risk_threshold=risk_threshold)
+    label = pd.Series(G.fraud_type, index=G.names)
+    a, b = label.reindex(orig).to_numpy(), label.reindex(dest).to_numpy()
+    return np.where(pd.Series(a).str.startswith("F") | ~pd.Series(b).str.startswith("F"), a, b)
+
+
+def _groups(df: pd.DataFrame, by: str, risk_threshold: float) -> list:
+    """(key, row positions) chunks of at most MAX_GROUP_TX rows, riskiest group first."""
+    if by == "account":
+        keys = df["orig_id"].astype(str).to_numpy()
+        counts = pd.Series(keys).value_counts()
+        keys = np.where(pd.Series(keys).map(counts).to_numpy() > 1, keys, "mixed")
+    elif by == "fraud_type":
+        keys = _fraud_types(df, risk_threshold)
+    else:
+        raise ValueError(f"by must be one of {GROUP_BY}, got {by!r}")
+    prob = df["fraud_prob_pred"].astype(float).to_numpy()
+    out = []
+    for key, pos in pd.Series(np.arange(len(df))).groupby(keys, sort=False):
+        pos = pos.to_numpy()[np.argsort(-prob[pos], kind="stable")]
+        for lo in range(0, len(pos), MAX_GROUP_TX):
+            out.append((str(key), pos[lo:lo + MAX_GROUP_TX]))
+    out.sort(key=lambda g: -prob[g[1][0]])
+    return out
+
+
+def _scope(by: str, key: str) -> str:
+    if by == "fraud_type":
+        return FRAUD_TYPE_SCOPE.get(key, f"labelled {key}")
+    return "from accounts with one flagged transaction each" if key == "mixed" else f"sent by account {key}"
+
+
+def _prompt(by: str, key: str, lines: list) -> str:
+    facts = "\n".join(f"- {line}" for line in lines)
+    return f"""You are a bank fraud analyst. In at most 90 words, summarize these {len(lines)} flagged transactions \
+{_scope(by, key)}: the common pattern, the riskiest one, and the action to take.
+
+{facts}
+"""
+
+
+# ==================== 3️⃣ Batched generation ====================
+def _generate(model, prompt: str, max_new_tokens: int) -> str:
+    with span("watsonx_generate", batched=True):
+        resp = model.generate(prompt=prompt, params={"temperature": 0.3, "max_new_tokens": max_new_tokens})
+    return resp["results"][0]["generated_text"].strip()
+
+
+@traced()
+def summarize_risk_list(df: pd.DataFrame, by: str = "account", model=None, explain: bool = False,
+                        token_budget: int = TOKEN_BUDGET, concurrency: int = CONCURRENCY,
+                        max_new_tokens: int = GROUP_MAX_TOKENS, risk_threshold: float = 0.5) -> dict:
+    """
+    Group narratives for the rows of a risk list (columns of `get_transactions_page`).
+    Returns {"by", "groups": [{key, title, transactions, lines, max_prob, text, source}], "stats"};
+    source is "llm", "cache", "budget" (over the token budget), "failed", or "offline" (no model).
+    """
+    t0 = time.perf_counter()
+    stats = {"transactions": 0 if df is None else len(df), "groups": 0, "calls": 0, "cached": 0, "over_budget": 0,
+             "failed": 0, "tokens": 0, "llm_seconds": 0.0}
+    if df is None or df.empty:
+        return {"by": by, "groups": [], "stats": {**stats, "seconds": 0.0}}
+    df = df.reset_index(drop=True)
+    model = get_model() if model is None else model
+    with span("fact_lines", rows=len(df)):
+        lines = _fact_lines(df, explain)
+    with span("group", by=by):
+        chunks = _groups(df, by, risk_threshold)
+    ids = df["transaction_id"].astype(str).to_numpy()
+    prob = df["fraud_prob_pred"].astype(float).to_numpy()
+
+    groups, pending, spent = [], [], 0
+    for key, pos in chunks:
+        group_lines = [lines[i] for i in pos]
+        prompt = _prompt(by, key, group_lines)
+        g = {"key": key, "title": f"{key} · {len(pos)} tx", "transactions": ids[pos].tolist(), "lines": group_lines,
+             "max_prob": float(prob[pos[0]]), "text": "", "source": "offline"}
+        groups.append(g)
+        text = _narratives.get(prompt)
+        if text is not None:
+            g["text"], g["source"] = text, "cache"
+            stats["cached"] += 1
+        elif model is not None:
+            cost = estimate_tokens(prompt) + max_new_tokens
+            if spent + cost > token_budget:
+                g["source"] = "budget"
+                stats["over_budget"] += 1
+            else:
+                spent += cost
+                pending.append((g, prompt))
+
+    if pending:
+        t_llm = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(pending))),
+                                thread_name_prefix="narrative") as pool:
+            futures = [pool.submit(contextvars.copy_context().run, _generate, model, prompt, max_new_tokens)
+                       for _, prompt in pending]
+            for (g, prompt), fut in zip(pending, futures):
+                try:
+                    g["text"], g["source"] = fut.result(), "llm"
+                    _narratives.put(prompt, g["text"])
+                except Exception as e:
+                    print(f"⚠️ Narrative failed for group {g['key']}: {e}")
+                    g["source"] = "failed"
+                    stats["failed"] += 1
+        stats["calls"] = len(pending)
+        stats["llm_seconds"] = round(time.perf_counter() - t_llm, 3)
+    stats.update(groups=len(groups), tokens=spent, seconds=round(time.perf_counter() - t0, 3))
+    return {"by": by, "groups": groups, "stats": stats}
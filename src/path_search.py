@@ -0,0 +1,297 @@
+"""
+Directed, time-respecting cycle and chain search over the temporal graph.
+
+`classify_fraud_patterns` finds cycles with `nx.cycle_basis` on an undirected
+graph, so A -> B -> C -> A and a cycle whose hops run backwards in time look
+the same.  Here a path is a sequence of transactions e1, e2, ... where
+
+- each hop leaves the account the previous one entered (direction kept);
+- steps never decrease, and each hop follows the previous one within
+  `max_gap` steps;
+- every amount stays within `tolerance` (relative) of the first hop's amount;
+- no account repeats, except the seed closing a cycle;
+- optionally every hop has fraud_prob_pred >= min_prob.
+
+A cycle is a path of 2..k hops back to its seed; it is reported once, from
+its earliest hop (smallest (step, edge id)).  A chain is a path of
+min_chain..k hops that is not a cycle and cannot be extended: no valid hop
+leads into its head and, below k hops, none leaves its tail.
+
+The search walks the per-account out-edge lists of src/temporal_graph.py,
+which are sorted by step, so the candidates of each hop are one binary search
+for the step window plus a vectorized amount / probability filter.  Seeds are
+split into blocks over a process pool and results are yielded as blocks
+finish, so callers can stream them.
+
+    for ring in find_rings(get_temporal_graph(PREDICTIONS_PATH), 0, 743, k=4, workers=4):
+        print(ring["kind"], " -> ".join(ring["accounts"]))
+
+    python -m src.path_search --start-step 0 --end-step 743 -k 4 --workers 4 --out rings.jsonl
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+K = 4
+MIN_CHAIN = 3
+TOLERANCE = 0.1
+MAX_GAP = 24
+MAX_EXPANSIONS = 100_000      # hops explored per seed before it is abandoned
+BLOCK = 2048                  # seeds per task
+KINDS = ("cycle", "chain")
+SEARCH_ARRAYS = ("src", "dst", "step", "amount", "prob", "tx", "nodes",
+                 "out_ptr", "out_edges", "out_steps", "in_ptr", "in_edges", "in_steps")
+
+
+class _Search:
+    """DFS over one graph's step-sorted adjacency; one instance per process."""
+
+    def __init__(self, arrays: dict, start_step, end_step, k, min_chain, tolerance, max_gap, min_prob, kinds):
+        for name in SEARCH_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.start = -np.inf if start_step is None else start_step
+        self.end = np.inf if end_step is None else end_step
+        self.k, self.min_chain, self.tolerance, self.max_gap = k, min_chain, tolerance, max_gap
+        self.min_prob = min_prob
+        self.kinds = kinds
+        # (account, step) of every out-edge list entry, globally sorted: one searchsorted
+        # answers "does this hop have any continuation in time" for all first hops at once
+        owner = np.repeat(np.arange(len(self.out_ptr) - 1, dtype=np.int64), np.diff(self.out_ptr))
+        self.out_keys = (owner << 32) + self.out_steps
+        # possible first hops (in the window, probable enough, with a continuation), grouped by sender
+        first = self.out_edges[(self.out_steps >= self.start) & (self.out_steps <= self.end)]
+        if self.min_prob is not None:
+            first = first[self.prob[first] >= self.min_prob]
+        self.first_edges = first[self._extendable(first)]
+        self.first_ptr = np.zeros(len(self.out_ptr), dtype=np.int64)
+        np.cumsum(np.bincount(self.src[self.first_edges], minlength=len(self.out_ptr) - 1), out=self.first_ptr[1:])
+
+    def seeds(self) -> np.ndarray:
+        """Accounts with at least one possible first hop."""
+        return np.flatnonzero(np.diff(self.first_ptr))
+
+    def _extendable(self, edges: np.ndarray) -> np.ndarray:
+        """Mask of the hops whose end account sends anything within max_gap steps after them."""
+        step = self.step[edges]
+        hi = np.minimum(step + self.max_gap, self.end) if self.max_gap is not None else np.full(len(edges), 1 << 31)
+        base = self.dst[edges] << 32
+        lo_pos = self.out_keys.searchsorted(base + step, side="left")
+        hi_pos = self.out_keys.searchsorted(base + np.asarray(hi, dtype=np.int64), side="right")
+        return hi_pos > lo_pos
+
+    def _hops(self, ptr, edges, steps, node, lo_step, hi_step, amin, amax) -> np.ndarray:
+        """Edges of `node`'s list with lo_step <= step <= hi_step and amount in [amin, amax]."""
+        lo, hi = int(ptr[node]), int(ptr[node + 1])
+        if lo == hi:
+            return edges[lo:lo]
+        s = steps[lo:hi]
+        a = lo + int(s.searchsorted(lo_step, side="left"))
+        b = lo + int(s.searchsorted(hi_step, side="right"))
+        cand = edges[a:b]
+        if len(cand):
+            amt = self.amount[cand]
+            keep = (amt >= amin) & (amt <= amax)
+            if self.min_prob is not None:
+                keep &= self.prob[cand] >= self.min_prob
+            cand = cand[keep]
+        return cand
+
+    def _next(self, node, step, amin, amax) -> np.ndarray:
+        hi = min(step + self.max_gap, self.end) if self.max_gap is not None else self.end
+        return self._hops(self.out_ptr, self.out_edges, self.out_steps, node, step, hi, amin, amax)
+
+    def _has_predecessor(self, path: list) -> bool:
+        """
+        Whether a valid hop leads into the head of `path`.  That hop would be
+        the new first hop, so every amount on the path must be within
+        `tolerance` of its amount, and its sender must not be on the path.
+        """
+        e = np.asarray(path)
+        amounts = self.amount[e]
+        lo_amt, hi_amt = float(amounts.min()), float(amounts.max())
+        amin = hi_amt / (1 + self.tolerance)
+        amax = lo_amt / (1 - self.tolerance) if self.tolerance < 1 else np.inf
+        s0 = int(self.step[e[0]])
+        lo = max(s0 - self.max_gap, self.start) if self.max_gap is not None else self.start
+        cand = self._hops(self.in_ptr, self.in_edges, self.in_steps, int(self.src[e[0]]), lo, s0, amin, amax)
+        if not len(cand):
+            return False
+        a = self.amount[cand]
+        keep = (lo_amt >= a * (1 - self.tolerance)) & (hi_amt <= a * (1 + self.tolerance))
+        keep &= ~np.isin(self.src[cand], np.append(self.dst[e], self.src[e[0]]))
+        return bool(keep.any())
+
+    def _result(self, kind: str, path: list) -> dict:
+        e = np.asarray(path)
+        accounts = [str(self.nodes[self.src[e[0]]])] + [str(self.nodes[v]) for v in self.dst[e]]
+        return {
+            "kind": kind, "length": len(path), "accounts": accounts,
+            "transactions": [int(t) if isinstance(t, (np.integer, int)) else str(t) for t in self.tx[e]],
+            "steps": self.step[e].tolist(), "amounts": self.amount[e].round(2).tolist(),
+            "start_step": int(self.step[e[0]]), "end_step": int(self.step[e[-1]]),
+            "max_prob": round(float(self.prob[e].max()), 6), "mean_prob": round(float(self.prob[e].mean()), 6),
+        }
+
+    def seed(self, seed: int) -> list:
+        """
+        Every reportable cycle and chain whose first hop leaves `seed`.  After
+        MAX_EXPANSIONS hops the seed is abandoned and its results are marked
+        "truncated" (hub accounts, where the full enumeration explodes).
+        """
+        out, expansions = [], 0
+        want_cycle, want_chain = "cycle" in self.kinds, "chain" in self.kinds
+        for e0 in self.first_edges[self.first_ptr[seed]:self.first_ptr[seed + 1]].tolist():
+            a0 = float(self.amount[e0])
+            amin, amax = a0 * (1 - self.tolerance), a0 * (1 + self.tolerance)
+            s0 = int(self.step[e0])
+            path, visited = [e0], {seed, int(self.dst[e0])}
+            stack = [iter(self._next(int(self.dst[e0]), s0, amin, amax).tolist())]
+            extended = [False]
+            while stack:
+                if expansions >= MAX_EXPANSIONS:
+                    break
+                nxt = next(stack[-1], None)
+                if nxt is None:
+                    if want_chain and not extended[-1] and len(path) >= self.min_chain \
+                            and not self._has_predecessor(path):
+                        out.append(self._result("chain", path))
+                    stack.pop()
+                    extended.pop()
+                    visited.discard(int(self.dst[path[-1]]))
+                    path.pop()
+                    continue
+                expansions += 1
+                v = int(self.dst[nxt])
+                step = int(self.step[nxt])
+                if v == seed:
+                    # closes a cycle; canonical when e0 is its earliest hop
+                    if want_cycle and (step > s0 or nxt > e0) and all(
+                            int(self.step[e]) > s0 or e > e0 for e in path[1:]):
+                        out.append(self._result("cycle", path + [nxt]))
+                    continue
+                if v in visited:
+                    continue
+                extended[-1] = True
+                if len(path) + 1 >= self.k:
+                    if want_chain and len(path) + 1 >= self.min_chain and not self._has_predecessor(path + [nxt]):
+                        out.append(self._result("chain", path + [nxt]))
+                    continue
+                path.append(nxt)
+                visited.add(v)
+                stack.append(iter(self._next(v, step, amin, amax).tolist()))
+                extended.append(False)
+            if expansions >= MAX_EXPANSIONS:
+                for r in out:
+                    r["truncated"] = True
+                break
+        return out
+
+    def block(self, seeds) -> list:
+        out = []
+        for s in seeds:
+            out.extend(self.seed(int(s)))
+        return out
+
+
+# ==================== process pool ====================
+_worker = None
+
+
+def _init(arrays, args):
+    global _worker
+    _worker = _Search(arrays, *args)
+
+
+def _run_block(seeds) -> list:
+    return _worker.block(seeds)
+
+
+def find_rings(tg, start_step=None, end_step=None, k: int = K, min_chain: int = MIN_CHAIN,
+               tolerance: float = TOLERANCE, max_gap: int = MAX_GAP, min_prob: float = None,
+               kinds=KINDS, seeds=None, workers: int = 0, block: int = BLOCK):
+    """
+    Yield time-respecting cycles and chains of at most k hops in the step
+    window (see the module docstring), block by block as they are found.
+    `seeds` restricts the search to paths starting at these accounts;
+    `workers` > 1 spreads the seed blocks over a process pool.
+    """
+    kinds = tuple(kinds)
+    bad = [kind for kind in kinds if kind not in KINDS]
+    if bad:
+        raise ValueError(f"kinds must be among {KINDS}, got {bad}")
+    if k < 2 or min_chain < 2:
+        raise ValueError("k and min_chain must be at least 2 hops")
+    arrays = {name: getattr(tg, name) for name in SEARCH_ARRAYS}
+    args = (start_step, end_step, k, min_chain, tolerance, max_gap, min_prob, kinds)
+    search = _Search(arrays, *args)
+    if seeds is None:
+        seed_codes = search.seeds()
+    else:
+        seed_codes = np.array([c for c in (tg.node_code(s) for s in seeds) if c >= 0], dtype=np.int64)
+    blocks = [seed_codes[i:i + block] for i in range(0, len(seed_codes), block)]
+
+    if workers <= 1:
+        for b in blocks:
+            yield from search.block(b)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init, initargs=(arrays, args)) as pool:
+        pending = set()
+        todo = iter(blocks)
+        for b in todo:
+            pending.add(pool.submit(_run_block, b))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield from fut.result()
+                b = next(todo, None)
+                if b is not None:
+                    pending.add(pool.submit(_run_block, b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Directed, time-respecting cycle / chain search")
+    parser.add_argument("--predictions", default=None, help="prediction CSV (default: the dashboard's file)")
+    parser.add_argument("--start-step", type=int, default=None)
+    parser.add_argument("--end-step", type=int, default=None)
+    parser.add_argument("-k", type=int, default=K, help="maximum hops")
+    parser.add_argument("--min-chain", type=int, default=MIN_CHAIN)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="relative amount tolerance vs the first hop")
+    parser.add_argument("--max-gap", type=int, default=MAX_GAP, help="maximum steps between consecutive hops")
+    parser.add_argument("--min-prob", type=float, default=None, help="only hops with fraud_prob_pred >= this")
+    parser.add_argument("--kinds", default=",".join(KINDS))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default=None, help="JSON-lines output (default: stdout)")
+    args = parser.parse_args()
+
+    from .temporal_graph import get_temporal_graph
+    from .transactions import PREDICTIONS_PATH
+    t0 = time.perf_counter()
+    tg = get_temporal_graph(args.predictions or PREDICTIONS_PATH)
+    t_build = time.perf_counter() - t0
+    f = open(args.out, "w") if args.out else None
+    counts = {kind: 0 for kind in KINDS}
+    try:
+        for ring in find_rings(tg, args.start_step, args.end_step, k=args.k, min_chain=args.min_chain,
+                               tolerance=args.tolerance, max_gap=args.max_gap, min_prob=args.min_prob,
+                               kinds=args.kinds.split(","), workers=args.workers):
+            counts[ring["kind"]] += 1
+            line = json.dumps(ring)
+            if f is not None:
+                f.write(line + "\n")
+            else:
+                print(line)
+    finally:
+        if f is not None:
+            f.close()
+    print(f"📊 {counts['cycle']:,} cycles, {counts['chain']:,} chains over {tg.n_edges:,} transactions "
+          f"(graph {t_build:.2f}s, search {time.perf_counter() - t0 - t_build:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
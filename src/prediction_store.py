@@ -0,0 +1,90 @@
+"""
+Single-writer appends to the shared prediction file.
+
+Every dashboard session, the scoring scripts and `model_gnn.py` append their
+results to one CSV (PREDICTIONS_OUT).  `append_predictions(df)` makes those
+appends safe when several sessions score at once:
+
+- the frame is formatted to CSV text before any lock is taken;
+- a per-file thread lock serializes the sessions of one process, and an
+  exclusive `flock` on `<file>.lock` serializes processes;
+- under the lock the header is written only if the file is empty, and the
+  rows go out in one O_APPEND write, so batches never interleave or lose
+  their header.
+
+`prediction_frame(enriched, probs)` builds the rows in the file's column
+order.
+
+    from src.prediction_store import append_predictions, prediction_frame
+    append_predictions(prediction_frame(enriched, probs))
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:            # Windows: the thread lock still serializes the sessions of one process
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREDICTIONS_OUT = os.path.join(BASE_DIR, "data", "test_predictions_v3.0.csv")
+PREDICTION_COLUMNS = ["transaction_id", "step", "orig_id", "dest_id", "amount", "fraud_prob_pred", "isFraud_pred"]
+SIMULATED_TX_ID = "1743200002"          # id given to simulated transactions that carry none
+THRESHOLD = 0.5
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def prediction_frame(enriched: pd.DataFrame, probs, threshold: float = THRESHOLD) -> pd.DataFrame:
+    """Rows in PREDICTION_COLUMNS order, sorted by step; records without a transaction_id get SIMULATED_TX_ID."""
+    probs = np.asarray(probs, dtype=float)
+    if "transaction_id" in enriched.columns:
+        tx = enriched["transaction_id"].where(enriched["transaction_id"].notna(), SIMULATED_TX_ID)
+    else:
+        tx = SIMULATED_TX_ID
+    df = pd.DataFrame({
+        "transaction_id": tx,
+        "step": enriched["step"].to_numpy(),
+        "orig_id": enriched["orig_id"].to_numpy(),
+        "dest_id": enriched["dest_id"].to_numpy(),
+        "amount": enriched["amount"].to_numpy(),
+        "fraud_prob_pred": probs,
+        "isFraud_pred": (probs > threshold).astype(int),
+    }, index=enriched.index)
+    return df.sort_values("step", kind="stable").reset_index(drop=True)[PREDICTION_COLUMNS]
+
+
+def append_predictions(df: pd.DataFrame, path: str = PREDICTIONS_OUT) -> int:
+    """Append `df` to the shared CSV as one atomic batch; returns the number of rows written."""
+    if df.empty:
+        return 0
+    path = os.path.abspath(path)
+    header = ",".join(df.columns) + "\n"
+    body = df.to_csv(index=False, header=False).encode("utf-8")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _lock_for(path):
+        lock_fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644) if fcntl is not None else None
+        try:
+            if lock_fd is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                data = body if os.fstat(fd).st_size else header.encode("utf-8") + body
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+        finally:
+            if lock_fd is not None:
+                os.close(lock_fd)            # closing releases the flock
+    return len(df)
@@ -44,11 +44,28 @@ def analyze_risk(identifier: str) -> str:
         return f"{id_str} via {txid}: score={res['score']} ({res['level']}), recommendation: {res['recommendation']}"
     return f"Not found: {identifier}"
 import os
+import threading
 import pandas as pd
 import numpy as np
 
+from .tracing import traced
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREDICTIONS_PATH = os.path.join(BASE_DIR, "data", "test_predictions_v2.0.csv")
+_A0_lock = threading.Lock()           # concurrent first calls read the prediction file once
+SIGMAS = (0.6, 0.3, 0.1)              # default σ1 (probability), σ2 (amount), σ3 (logit) weights of RI
+RISK_LEVELS = (0.9, 0.6, 0.3)        # RI cut-offs for High / Suspicious / Normal risk (below: Low)
+
+
+def risk_index_values(prob, amount, A0, sigma1=SIGMAS[0], sigma2=SIGMAS[1], sigma3=SIGMAS[2]):
+    """Vectorized RI = σ1 * P + σ2 * Â + σ3 * ln(P/(1-P)), with Â = clip(amount / A₀, 0, 1)."""
+    A_tilde = np.clip(np.asarray(amount, dtype=float) / (A0 + 1e-9), 0, 1)
+    prob = np.clip(np.asarray(prob, dtype=float), 1e-6, 1 - 1e-6)
+    return sigma1 * prob + sigma2 * A_tilde + sigma3 * np.log(prob / (1 - prob))
+
+@traced()
 def composite_risk_index(prob, amount, transaction_id=None, folder="data", 
-                         sigma1=0.6, sigma2=0.3, sigma3=0.1, cap_percentile=95, 
+                         sigma1=SIGMAS[0], sigma2=SIGMAS[1], sigma3=SIGMAS[2], cap_percentile=95, 
                          verbose=True):
     """
     Composite Risk Index (RI)
@@ -81,49 +98,48 @@ def composite_risk_index(prob, amount, transaction_id=None, folder="data",
             if verbose:
                 print(f"📊 Loaded cached global amount percentile A₀ (P{cap_percentile}) = {A0:.2f}")
         else:
-            # Use correct path for the file
-            file_path = os.path.join(os.path.dirname(__file__), "/home/yjing/Pulse4_Project/data/test_predictions_v2.0.csv")
-            df = pd.read_csv(file_path, usecols=["amount"])
-            all_amounts = df["amount"].dropna().values
-
-            if len(all_amounts) > 0:
-                A0 = np.nanpercentile(all_amounts, cap_percentile)
-                # ✅ Cache the calculated result
-                composite_risk_index._A0_cache = A0
-            else:
-                A0 = 1.0
-
-            if verbose:
+            with _A0_lock:
+                if hasattr(composite_risk_index, "_A0_cache"):
+                    A0 = composite_risk_index._A0_cache
+                    all_amounts = None
+                else:
+                    from .archive import load_history
+                    df = load_history(PREDICTIONS_PATH, ["amount"])
+                    all_amounts = df["amount"].dropna().values
+
+                    if len(all_amounts) > 0:
+                        A0 = np.nanpercentile(all_amounts, cap_percentile)
+                        # ✅ Cache the calculated result
+                        composite_risk_index._A0_cache = A0
+                    else:
+                        A0 = 1.0
+
+            if verbose and all_amounts is not None:
                 print(f"📊 Global amount percentile A₀ (P{cap_percentile}) = {A0:.2f}, based on {len(all_amounts):,} transactions.")
 
     except Exception as e:
         print(f"⚠️ Failed to calculate global A₀, using default A₀=1.0. Error: {e}")
         A0 = 1.0
 
-    # ---------- Step 2. Normalize the amount ----------
+    # ---------- Step 2-4. Normalized amount, logit term and RI (risk_index_values) ----------
     amount = np.array(amount, dtype=float)
     A_tilde = np.clip(amount / (A0 + 1e-9), 0, 1)
-
-    # ---------- Step 3. Fraud probability and logit term ----------
-    prob = np.array(prob, dtype=float)
-    prob = np.clip(prob, 1e-6, 1 - 1e-6)
-    logit_term = np.log(prob / (1 - prob))
-
-    # ---------- Step 4. Composite Risk Index Calculation ----------
-    RI = sigma1 * prob + sigma2 * A_tilde + sigma3 * logit_term
+    prob = np.clip(np.array(prob, dtype=float), 1e-6, 1 - 1e-6)
+    RI = risk_index_values(prob, amount, A0, sigma1, sigma2, sigma3)
 
     # ---------- Step 5. Risk level classification ----------
     levels, explanations, recommendations = [], [], []
+    high, suspicious, normal = RISK_LEVELS
     for r in RI:
-        if r >= 0.9:
+        if r >= high:
             levels.append("High Risk")
             explanations.append("Both fraud probability and transaction amount are extremely high, likely indicating fraudulent transactions.")
             recommendations.append("Immediately freeze the account or block the transaction, and escalate for further review.")
-        elif r >= 0.6:
+        elif r >= suspicious:
             levels.append("Suspicious Risk")
             explanations.append("Fraud probability or amount is relatively high, indicating potential risk.")
             recommendations.append("Recommend manual review or trigger secondary verification.")
-        elif r >= 0.3:
+        elif r >= normal:
             levels.append("Normal Risk")
             explanations.append("The transaction risk is at an average level.")
             recommendations.append("Proceed as usual, but continuous monitoring is advised.")
@@ -0,0 +1,243 @@
+"""
+Precomputed risk leaderboard over the prediction file.
+
+Rows are stored once in (step ascending, fraud_prob_pred descending) order,
+so every step is a partition whose rows are already a sorted run.  Queries
+over a step window then never sort the window:
+
+- `count(...)`         binary search per partition for the threshold cut
+- `top(...)`           k-way heap merge of the runs, O(k log P)
+- `page(...)`          the same merge, resumable across page requests
+- `query(...)`         all rows above a threshold (used for the full table
+                       and the high-risk network)
+
+Account filters go through per-account posting lists (CSR: sorted account
+keys, offsets, row positions) instead of scanning the frame, and `find`
+looks a transaction id up by binary search.  `get_risk_index(path)` caches
+the index and rebuilds it when the file's mtime changes; in a multi-worker
+deployment it attaches the arrays published by src/shared_store.py instead.
+"""
+import heapq
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .shared_store import attached
+
+COLUMNS = ["transaction_id", "orig_id", "dest_id", "amount", "fraud_prob_pred", "isFraud_pred", "step"]
+MAX_CURSORS = 16
+
+
+class _Cursor:
+    """Merge state for one (window, threshold) query: the heap plus rows emitted so far."""
+
+    def __init__(self, heap):
+        self.heap = heap
+        self.emitted = []
+
+
+def _postings(ids: np.ndarray):
+    """(sorted unique keys, offsets, row positions) grouping rows by account id string."""
+    keys = np.asarray(pd.Series(ids).astype(str).to_numpy(), dtype=str)
+    order = np.argsort(keys, kind="stable")
+    uniq, starts = np.unique(keys[order], return_index=True)
+    return uniq, np.append(starts, len(keys)).astype(np.int64), order.astype(np.int64)
+
+
+class RiskIndex:
+    def __init__(self, df: pd.DataFrame):
+        cols = [c for c in COLUMNS if c in df.columns]
+        prob = df["fraud_prob_pred"].astype(float).to_numpy()
+        step = df["step"].to_numpy()
+        order = np.lexsort((-prob, step))
+
+        self.columns = cols
+        self.data = {c: df[c].to_numpy()[order] for c in cols}
+        self.prob = prob[order]
+        self.neg_prob = -self.prob                  # ascending within a partition, for searchsorted
+        self.step = step[order]
+        self.steps, starts = np.unique(self.step, return_index=True)
+        self.bounds = np.append(starts, len(order))
+        self._postings = None
+        # Positions by (transaction id, file row): duplicate ids resolve to the first row, as in the CSV.
+        self._tx_order = np.lexsort((order, self.data["transaction_id"])) if "transaction_id" in cols else None
+        self._cursors = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ---------- flat arrays (shared store) ----------
+    def to_arrays(self) -> dict:
+        """Every array the queries read, postings and tx order included (built if needed)."""
+        self._account_positions("")
+        arrays = {f"data/{c}": self.data[c] for c in self.columns}
+        arrays.update({"prob": self.prob, "neg_prob": self.neg_prob, "step": self.step, "steps": self.steps,
+                       "bounds": self.bounds})
+        if self._tx_order is not None:
+            arrays["tx_order"] = self._tx_order
+        for role, (keys, ptr, pos) in zip(("orig", "dest"), self._postings):
+            arrays.update({f"post_{role}/keys": keys, f"post_{role}/ptr": ptr, f"post_{role}/pos": pos})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> "RiskIndex":
+        """Index over arrays from `to_arrays` (e.g. read-only memory maps); nothing is copied."""
+        index = cls.__new__(cls)
+        index.columns = [c for c in COLUMNS if f"data/{c}" in arrays]
+        index.data = {c: arrays[f"data/{c}"] for c in index.columns}
+        for name in ("prob", "neg_prob", "step", "steps", "bounds"):
+            setattr(index, name, arrays[name])
+        index._postings = tuple(
+            (arrays[f"post_{r}/keys"], arrays[f"post_{r}/ptr"], arrays[f"post_{r}/pos"]) for r in ("orig", "dest")
+        )
+        index._tx_order = arrays.get("tx_order")
+        index._cursors = OrderedDict()
+        index._lock = threading.Lock()
+        return index
+
+    def __len__(self):
+        return len(self.prob)
+
+    def window_rows(self, start_step=None, end_step=None) -> tuple:
+        """[lo, hi) row positions of steps start_step..end_step (all rows if either is None)."""
+        parts = self._partitions(start_step, end_step)
+        if not len(parts):
+            lo = int(self.bounds[parts.start])
+            return lo, lo
+        return int(self.bounds[parts.start]), int(self.bounds[parts.stop])
+
+    # ---------- helpers ----------
+    def _partitions(self, start_step, end_step) -> range:
+        if start_step is None or end_step is None:
+            return range(len(self.steps))
+        p0 = int(np.searchsorted(self.steps, start_step, side="left"))
+        p1 = int(np.searchsorted(self.steps, end_step, side="right"))
+        return range(p0, p1)
+
+    def _run(self, p: int, min_prob: float):
+        """[lo, hi) of partition p restricted to prob >= min_prob."""
+        lo, hi = int(self.bounds[p]), int(self.bounds[p + 1])
+        cut = lo + int(np.searchsorted(self.neg_prob[lo:hi], -min_prob, side="right"))
+        return lo, cut
+
+    def _frame(self, positions) -> pd.DataFrame:
+        positions = np.asarray(positions, dtype=np.int64)
+        return pd.DataFrame({c: self.data[c][positions] for c in self.columns})
+
+    def _account_positions(self, client: str) -> np.ndarray:
+        if self._postings is None:
+            self._postings = (_postings(self.data["orig_id"]), _postings(self.data["dest_id"]))
+        parts = []
+        for keys, ptr, pos in self._postings:
+            i = int(np.searchsorted(keys, client))
+            if i < len(keys) and keys[i] == client:
+                parts.append(pos[ptr[i]:ptr[i + 1]])
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.union1d(parts[0], parts[-1])
+
+    def _merge_heap(self, start_step, end_step, min_prob):
+        heap = []
+        for p in self._partitions(start_step, end_step):
+            lo, hi = self._run(p, min_prob)
+            if lo < hi:
+                heap.append((self.neg_prob[lo], lo, hi))
+        heapq.heapify(heap)
+        return heap
+
+    @staticmethod
+    def _pop(heap, neg_prob, n: int, out: list):
+        while heap and n > 0:
+            _, pos, hi = heapq.heappop(heap)
+            out.append(pos)
+            n -= 1
+            if pos + 1 < hi:
+                heapq.heappush(heap, (neg_prob[pos + 1], pos + 1, hi))
+
+    # ---------- queries ----------
+    def find(self, tx_id) -> dict:
+        """The row of one transaction id (binary search over the tx-id order), or None."""
+        tx = self.data.get("transaction_id")
+        if tx is None:
+            return None
+        try:
+            key = int(tx_id) if tx.dtype.kind in "iu" else str(tx_id)
+        except (TypeError, ValueError):
+            return None
+        i = int(np.searchsorted(tx, key, sorter=self._tx_order))
+        if i == len(tx) or tx[self._tx_order[i]] != key:
+            return None
+        pos = self._tx_order[i]
+        return {c: self.data[c][pos] for c in self.columns}
+
+    def count(self, min_prob: float = 0.0, start_step=None, end_step=None, client_name: str = "") -> int:
+        if client_name:
+            return len(self._client_positions(client_name, min_prob, start_step, end_step))
+        return sum(hi - lo for lo, hi in (self._run(p, min_prob) for p in self._partitions(start_step, end_step)))
+
+    def top(self, k: int, start_step=None, end_step=None, min_prob: float = 0.0) -> pd.DataFrame:
+        """The k riskiest transactions in the window."""
+        heap = self._merge_heap(start_step, end_step, min_prob)
+        out = []
+        self._pop(heap, self.neg_prob, k, out)
+        return self._frame(out)
+
+    def page(self, page: int, page_size: int, min_prob: float = 0.0, start_step=None, end_step=None,
+             client_name: str = "") -> pd.DataFrame:
+        """Rows [page*page_size, (page+1)*page_size) of the descending-probability listing."""
+        lo, hi = page * page_size, (page + 1) * page_size
+        if client_name:
+            return self._frame(self._client_positions(client_name, min_prob, start_step, end_step)[lo:hi])
+        key = (start_step, end_step, float(min_prob))
+        with self._lock:
+            cursor = self._cursors.get(key)
+            if cursor is None:
+                cursor = self._cursors[key] = _Cursor(self._merge_heap(start_step, end_step, min_prob))
+                while len(self._cursors) > MAX_CURSORS:
+                    self._cursors.popitem(last=False)
+            else:
+                self._cursors.move_to_end(key)
+            if len(cursor.emitted) < hi:
+                self._pop(cursor.heap, self.neg_prob, hi - len(cursor.emitted), cursor.emitted)
+            return self._frame(cursor.emitted[lo:hi])
+
+    def _client_positions(self, client_name, min_prob, start_step, end_step) -> np.ndarray:
+        pos = self._account_positions(str(client_name))
+        mask = self.prob[pos] >= float(min_prob)
+        if start_step is not None and end_step is not None:
+            mask &= (self.step[pos] >= start_step) & (self.step[pos] <= end_step)
+        pos = pos[mask]
+        return pos[np.argsort(self.neg_prob[pos], kind="stable")]
+
+    def query(self, min_prob: float = 0.0, start_step=None, end_step=None, client_name: str = "") -> pd.DataFrame:
+        """Every row above the threshold in the window, highest probability first."""
+        if client_name:
+            return self._frame(self._client_positions(client_name, min_prob, start_step, end_step))
+        runs = [np.arange(*self._run(p, min_prob)) for p in self._partitions(start_step, end_step)]
+        pos = np.concatenate(runs) if runs else np.empty(0, dtype=np.int64)
+        # Each run is already sorted; a stable sort of the concatenated runs is a merge.
+        return self._frame(pos[np.argsort(self.neg_prob[pos], kind="stable")])
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_risk_index(path: str) -> RiskIndex:
+    """Cached RiskIndex for `path`, rebuilt when the file changes (attached from the shared store if published)."""
+    store = attached()
+    if store is not None:
+        index = store.risk_index(path)
+        if index is not None:
+            return index
+    mtime = os.path.getmtime(path)
+    with _cache_lock:
+        hit = _cache.get(path)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+    from .archive import load_history
+    index = RiskIndex(load_history(path, COLUMNS))           # archived days included, so a pruned file keeps its history
+    with _cache_lock:
+        _cache[path] = (mtime, index)
+    return index
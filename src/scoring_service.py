@@ -0,0 +1,284 @@
+"""
+Local HTTP scoring API for the GNN fraud model.
+
+Wraps feature enrichment (`update_features`), EdgeSAGE prediction and
+`composite_risk_index` behind a small aiohttp service so other systems can
+score transactions without driving the Streamlit UI.
+
+Run:
+    python -m src.scoring_service --host 127.0.0.1 --port 8080
+
+With `--checkpoint-dir`, enrichment uses the streaming account windows
+restored from the latest state checkpoint instead of loading the history CSV,
+so the service is ready in seconds.
+
+With `--shadow-model`, a candidate checkpoint scores every batch in the
+background on the same enrichment; comparisons go to `--shadow-store`
+(see src/shadow.py).
+
+With `--shared-store` (a root written by `python -m src.shared_store publish`),
+the weights, scalers and history columns are memory-mapped from the shared
+store instead of being loaded per process, so several service processes
+behind one port-balancer share one copy.
+
+Every batch is checked against a `BurstIndex` (src/burst_index.py), so the
+response carries near-duplicate and fan-out burst features next to the score;
+the batch enters the index only once it has been scored.
+
+A `ScoringMonitor` (src/monitor.py) folds every batch's scaled features,
+probabilities and stage latencies into streaming histograms and checks them
+for drift every `--monitor-interval` seconds (`metrics/monitor.json`).
+
+Endpoints:
+    GET  /health        -> model / history status
+    POST /score         -> one transaction (REQUIRED_INPUT_FIELDS schema)
+    POST /score/batch   -> {"transactions": [...]} or a JSON list
+    GET  /shadow        -> shadow-model comparison summary
+    GET  /monitor       -> last drift check and live latency percentiles
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from aiohttp import web
+
+from .gnn_core import MODEL_DIR, MODEL_PATH, load_artifacts, load_model, build_local_graph, predict_proba
+from .burst_index import FEATURE_NAMES as BURST_FEATURES, BurstIndex
+from .gnn_drive_inference import DATA_PATH, HistoryIndex, load_local_csv, update_features
+from .monitor import INTERVAL as MONITOR_INTERVAL, ScoringMonitor, load_snapshot
+from .risk_engine import composite_risk_index
+from .shadow import SHADOW_DIR, ComparisonStore, ShadowScorer
+from .shared_store import ENV_VAR as SHARED_STORE_ENV, SharedStore
+from .simulator import REQUIRED_INPUT_FIELDS
+from .state_checkpoint import restore_stream
+
+MAX_BATCH_SIZE = 1000
+
+
+class ScoringEngine:
+    """Holds the history frame (or streaming account state), scalers and EdgeSAGE weights in memory."""
+
+    def __init__(self, history_path: str = DATA_PATH, model_dir: str = MODEL_DIR, model_path: str = MODEL_PATH,
+                 checkpoint_dir: str = None, shadow_model_path: str = None, shadow_model_dir: str = None,
+                 shadow_store: str = SHADOW_DIR, shared_store: str = None,
+                 monitor_interval: float = MONITOR_INTERVAL):
+        t0 = time.perf_counter()
+        store = SharedStore(shared_store) if shared_store else None
+        if store is not None and store.fresh("model", model_path):
+            self.artifacts = store.model_artifacts()
+            self.model = store.load_model()
+        else:
+            self.artifacts = load_artifacts(model_dir)
+            self.model = load_model(self.artifacts, model_path)
+        self.shadow = None
+        if shadow_model_path:
+            self.shadow = ShadowScorer(shadow_model_path, self.artifacts, shadow_model_dir, ComparisonStore(shadow_store))
+        if checkpoint_dir:
+            self.stream = restore_stream(checkpoint_dir)
+            self.history_df = None
+            self.history_index = None
+        else:
+            self.stream = None
+            self.history_df = store.history_frame(history_path) if store is not None else None
+            if self.history_df is None:
+                self.history_df = load_local_csv(history_path)
+            self.history_index = HistoryIndex(self.history_df)     # per-account lookups instead of frame scans
+        # Short windows: the history tail warms them; a restored stream starts them empty.
+        self.burst = BurstIndex().warm_start(self.history_df)
+        self.monitor = ScoringMonitor(interval=monitor_interval)
+        if monitor_interval > 0:
+            self.monitor.start()
+        self.started_at = time.time()
+        self.load_seconds = time.perf_counter() - t0
+        self.requests_served = 0
+        self.transactions_scored = 0
+        print(f"✅ Scoring engine ready in {self.load_seconds:.1f}s")
+
+    @staticmethod
+    def validate(record) -> dict:
+        """Raise ValueError unless `record` is a dict carrying every required field."""
+        if not isinstance(record, dict):
+            raise ValueError("Each transaction must be a JSON object.")
+        missing = [f for f in REQUIRED_INPUT_FIELDS if f not in record]
+        if missing:
+            raise ValueError(f"Missing fields: {missing}")
+        return record
+
+    def score(self, records: list) -> list:
+        """Enrich, predict and compute RI for a batch of raw transactions."""
+        t0 = time.perf_counter()
+        records = [self.validate(r) for r in records]
+        burst_rows = [(r["orig_id"], r["dest_id"], r["step"], r["amount"]) for r in records]
+        burst = self.burst.preview(burst_rows)
+        if self.stream is not None:
+            enriched = pd.DataFrame([self.stream.process(r) for r in records])
+        else:
+            enriched = update_features(json.dumps(records), self.history_df, self.history_index)
+        enriched = enriched.assign(**pd.DataFrame(burst, columns=BURST_FEATURES, index=enriched.index))
+        t_enrich = time.perf_counter()
+
+        x, edge_index, edge_attr, _ = build_local_graph(
+            enriched, self.artifacts["node_scaler"], self.artifacts["edge_scaler"]
+        )
+        shadow_future = self.shadow.submit(enriched, (x, edge_index, edge_attr)) if self.shadow is not None else None
+        t_model = time.perf_counter()
+        probs = predict_proba(self.model, x, edge_index, edge_attr)
+        t_done = time.perf_counter()
+        if shadow_future is not None:
+            self.shadow.record(
+                shadow_future, [r.get("transaction_id") for r in records], enriched["step"].to_numpy(),
+                probs, (time.perf_counter() - t_model) * 1000,
+            )
+        risk = composite_risk_index(prob=probs, amount=enriched["amount"].astype(float).to_numpy(), verbose=False)
+        t_risk = time.perf_counter()
+        self.burst.commit(burst_rows)          # a batch that failed above never enters the windows
+
+        results = []
+        for i, rec in enumerate(records):
+            out = {k: rec[k] for k in REQUIRED_INPUT_FIELDS}
+            if "transaction_id" in rec:
+                out["transaction_id"] = rec["transaction_id"]
+            out.update({
+                "fraud_prob_pred": float(probs[i]),
+                "isFraud_pred": int(probs[i] > 0.5),
+                "RI": risk["RI"][i],
+                "risk_level": risk["risk_level"][i],
+                "recommendation": risk["recommendation"][i],
+                **burst[i],
+            })
+            results.append(out)
+
+        self.monitor.observe(x.numpy(), edge_attr.numpy(), probs)
+        for stage, seconds in (("enrich", t_enrich - t0), ("graph", t_model - t_enrich), ("model", t_done - t_model),
+                               ("risk", t_risk - t_done), ("batch", time.perf_counter() - t0)):
+            self.monitor.observe_latency(stage, seconds)
+        self.requests_served += 1
+        self.transactions_scored += len(results)
+        return results
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "model_loaded": self.model is not None,
+            "history_rows": int(len(self.history_df)) if self.history_df is not None else None,
+            "stream": self.stream.stats() if self.stream is not None else None,
+            "burst": self.burst.stats(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "load_s": round(self.load_seconds, 2),
+            "requests_served": self.requests_served,
+            "transactions_scored": self.transactions_scored,
+            "shadow": self.shadow.summary() if self.shadow is not None else None,
+            "monitor": self.monitor.summary(),
+        }
+
+    def close(self):
+        self.monitor.stop()
+        if self.shadow is not None:
+            self.shadow.close()
+
+
+# ==================== HTTP handlers ====================
+ENGINE_KEY = web.AppKey("engine", ScoringEngine)
+EXECUTOR_KEY = web.AppKey("executor", ThreadPoolExecutor)
+
+
+async def _run_scoring(request: web.Request, records: list) -> list:
+    # Torch inference and pandas enrichment are blocking: run them on the
+    # single scoring thread so the event loop keeps accepting connections.
+    loop = asyncio.get_running_loop()
+    engine = request.app[ENGINE_KEY]
+    return await loop.run_in_executor(request.app[EXECUTOR_KEY], engine.score, records)
+
+
+async def _read_json(request: web.Request):
+    try:
+        return await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Invalid JSON format."}), content_type="application/json")
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response(request.app[ENGINE_KEY].health())
+
+
+async def handle_shadow(request: web.Request) -> web.Response:
+    shadow = request.app[ENGINE_KEY].shadow
+    if shadow is None:
+        return web.json_response({"error": "Shadow scoring is not enabled."}, status=404)
+    return web.json_response(shadow.summary())
+
+
+async def handle_monitor(request: web.Request) -> web.Response:
+    monitor = request.app[ENGINE_KEY].monitor
+    return web.json_response({"live": monitor.summary(), "last_check": load_snapshot(monitor.snapshot_path)})
+
+
+async def handle_score(request: web.Request) -> web.Response:
+    payload = await _read_json(request)
+    try:
+        results = await _run_scoring(request, [payload])
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    return web.json_response(results[0])
+
+
+async def handle_score_batch(request: web.Request) -> web.Response:
+    payload = await _read_json(request)
+    records = payload.get("transactions") if isinstance(payload, dict) else payload
+    if not isinstance(records, list) or not records:
+        return web.json_response({"error": "Expected a non-empty list of transactions."}, status=400)
+    if len(records) > MAX_BATCH_SIZE:
+        return web.json_response({"error": f"Batch too large (max {MAX_BATCH_SIZE})."}, status=413)
+    try:
+        results = await _run_scoring(request, records)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    return web.json_response({"count": len(results), "results": results})
+
+
+def create_app(engine: ScoringEngine) -> web.Application:
+    app = web.Application(client_max_size=16 * 1024 ** 2)
+    app[ENGINE_KEY] = engine
+    app[EXECUTOR_KEY] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scoring")
+    app.router.add_get("/health", handle_health)
+    app.router.add_post("/score", handle_score)
+    app.router.add_post("/score/batch", handle_score_batch)
+    app.router.add_get("/shadow", handle_shadow)
+    app.router.add_get("/monitor", handle_monitor)
+
+    async def _shutdown(app):
+        app[EXECUTOR_KEY].shutdown(wait=False)
+        app[ENGINE_KEY].close()
+
+    app.on_cleanup.append(_shutdown)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pulse4 local scoring API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--history", default=DATA_PATH, help="history CSV used for feature enrichment")
+    parser.add_argument("--checkpoint-dir", default=None, help="restore streaming account state from this folder")
+    parser.add_argument("--shadow-model", default=None, help="candidate checkpoint scored alongside the live model")
+    parser.add_argument("--shadow-model-dir", default=None, help="candidate's own config/scalers folder (default: shared)")
+    parser.add_argument("--shadow-store", default=SHADOW_DIR, help="folder for the comparison store")
+    parser.add_argument("--shared-store", default=os.environ.get(SHARED_STORE_ENV),
+                        help="attach model and history from a published shared store (default: $PULSE4_SHARED_STORE)")
+    parser.add_argument("--monitor-interval", type=float, default=MONITOR_INTERVAL,
+                        help="seconds between drift checks (0 disables the scheduled check)")
+    args = parser.parse_args()
+
+    engine = ScoringEngine(history_path=args.history, checkpoint_dir=args.checkpoint_dir,
+                           shadow_model_path=args.shadow_model, shadow_model_dir=args.shadow_model_dir,
+                           shadow_store=args.shadow_store, shared_store=args.shared_store,
+                           monitor_interval=args.monitor_interval)
+    web.run_app(create_app(engine), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
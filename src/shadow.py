@@ -0,0 +1,197 @@
+"""
+Shadow scoring: run a candidate EdgeSAGE checkpoint next to the live model.
+
+The scoring engine enriches each batch once; `ShadowScorer.submit` hands the
+same graph tensors (or, if the candidate ships its own scalers, the same
+enriched frame) to a background thread that runs the candidate while the
+primary model scores.  Responses never wait for the shadow model.
+
+Each finished batch is recorded in a `ComparisonStore`: per-edge primary and
+shadow probabilities go to zstd Parquet parts under the store folder, and
+running aggregates (agreement at 0.5, |delta| histogram, prediction flips,
+both models' latency) are kept in memory for `/shadow` and `/health`.
+At most `max_pending` batches are in flight on the shadow thread; batches
+arriving while it is full are skipped and counted as `dropped`, so a slow
+candidate cannot queue up memory behind the live traffic.
+
+    python -m src.scoring_service --shadow-model model/candidate.pth
+    df = ComparisonStore.load("shadow")        # all recorded edges
+"""
+import glob
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .gnn_core import BASE_DIR, build_local_graph, load_artifacts, load_model, predict_proba
+
+SHADOW_DIR = os.path.join(BASE_DIR, "shadow")
+THRESHOLD = 0.5
+DELTA_BINS = np.linspace(0.0, 1.0, 101)
+
+
+class ComparisonStore:
+    """Per-edge comparison rows flushed to Parquet parts, plus in-memory running aggregates."""
+
+    def __init__(self, root: str = SHADOW_DIR, flush_rows: int = 50_000):
+        self.root = root
+        self.flush_rows = flush_rows
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._rows = []
+        self._batches = []
+        self._buffered = 0
+        self._part = len(glob.glob(os.path.join(root, "edges-*.parquet")))
+        self._next_batch = self._last_batch_on_disk() + 1
+        self.n_edges = 0
+        self.n_batches = 0
+        self.agree = 0
+        self.flips_up = 0            # primary < 0.5 <= shadow
+        self.flips_down = 0          # shadow < 0.5 <= primary
+        self.abs_delta_sum = 0.0
+        self.abs_delta_max = 0.0
+        self.delta_hist = np.zeros(len(DELTA_BINS) - 1, dtype=np.int64)
+        self.primary_ms = 0.0
+        self.shadow_ms = 0.0
+
+    def add(self, transaction_ids, steps, primary: np.ndarray, shadow: np.ndarray, primary_ms: float, shadow_ms: float):
+        primary = np.asarray(primary, dtype=np.float32)
+        shadow = np.asarray(shadow, dtype=np.float32)
+        delta = np.abs(shadow - primary)
+        p_pos, s_pos = primary > THRESHOLD, shadow > THRESHOLD
+        with self._lock:
+            batch = self._next_batch
+            self._next_batch += 1
+            self.n_batches += 1
+            self.n_edges += len(primary)
+            self.agree += int((p_pos == s_pos).sum())
+            self.flips_up += int((~p_pos & s_pos).sum())
+            self.flips_down += int((p_pos & ~s_pos).sum())
+            self.abs_delta_sum += float(delta.sum())
+            self.abs_delta_max = max(self.abs_delta_max, float(delta.max(initial=0.0)))
+            self.delta_hist += np.histogram(delta, bins=DELTA_BINS)[0]
+            self.primary_ms += primary_ms
+            self.shadow_ms += shadow_ms
+            self._rows.append(pa.table({
+                "batch": pa.array(np.full(len(primary), batch, dtype=np.int32)),
+                "transaction_id": pa.array([None if t is None else str(t) for t in transaction_ids], pa.string()),
+                "step": pa.array(np.asarray(steps, dtype=np.int32)),
+                "p_primary": pa.array(primary),
+                "p_shadow": pa.array(shadow),
+            }))
+            self._batches.append({"batch": batch, "ts": time.time(), "edges": len(primary),
+                                  "primary_ms": round(primary_ms, 3), "shadow_ms": round(shadow_ms, 3)})
+            self._buffered += len(primary)
+            if self._buffered >= self.flush_rows:
+                self._flush_locked()
+
+    def _last_batch_on_disk(self) -> int:
+        """Highest batch id already flushed under `root` (ids keep increasing across restarts), -1 if none."""
+        parts = sorted(glob.glob(os.path.join(self.root, "batches-*.parquet")))
+        if not parts:
+            return -1
+        ids = pq.read_table(parts[-1], columns=["batch"]).column("batch").to_numpy()
+        return int(ids.max()) if len(ids) else -1
+
+    def _flush_locked(self):
+        if not self._rows:
+            return
+        name = f"{self._part:05d}.parquet"
+        pq.write_table(pa.concat_tables(self._rows), os.path.join(self.root, f"edges-{name}"), compression="zstd")
+        pq.write_table(pa.Table.from_pylist(self._batches), os.path.join(self.root, f"batches-{name}"), compression="zstd")
+        self._part += 1
+        self._rows, self._batches, self._buffered = [], [], 0
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def summary(self) -> dict:
+        with self._lock:
+            n, hist = self.n_edges, self.delta_hist.copy()
+            out = {
+                "edges": n,
+                "batches": self.n_batches,
+                "agreement": round(self.agree / n, 6) if n else None,
+                "flips_up": self.flips_up,
+                "flips_down": self.flips_down,
+                "mean_abs_delta": round(self.abs_delta_sum / n, 6) if n else None,
+                "max_abs_delta": round(self.abs_delta_max, 6),
+                "primary_ms_per_batch": round(self.primary_ms / self.n_batches, 3) if self.n_batches else None,
+                "shadow_ms_per_batch": round(self.shadow_ms / self.n_batches, 3) if self.n_batches else None,
+                "shadow_cost_ratio": round(self.shadow_ms / self.primary_ms, 3) if self.primary_ms else None,
+            }
+        if n:
+            cdf = np.cumsum(hist) / n
+            out["p50_abs_delta"] = float(DELTA_BINS[1:][np.searchsorted(cdf, 0.5)])
+            out["p99_abs_delta"] = float(DELTA_BINS[1:][np.searchsorted(cdf, 0.99)])
+        return out
+
+    @staticmethod
+    def load(root: str = SHADOW_DIR, kind: str = "edges") -> pd.DataFrame:
+        """All flushed rows of one kind ("edges" or "batches"), with a `delta` column for edges."""
+        parts = sorted(glob.glob(os.path.join(root, f"{kind}-*.parquet")))
+        if not parts:
+            return pd.DataFrame()
+        df = pd.concat([pq.read_table(p).to_pandas() for p in parts], ignore_index=True)
+        if kind == "edges":
+            df["delta"] = df["p_shadow"] - df["p_primary"]
+        return df
+
+
+class ShadowScorer:
+    """Candidate model scored on a background thread against the engine's primary model."""
+
+    def __init__(self, model_path: str, primary_artifacts: dict, model_dir: str = None, store: ComparisonStore = None,
+                 max_pending: int = 1):
+        # Same scalers as the primary model -> the graph tensors are shared as-is.
+        self.shares_inputs = model_dir is None
+        self.artifacts = primary_artifacts if self.shares_inputs else load_artifacts(model_dir)
+        self.model = load_model(self.artifacts, model_path)
+        self.model_path = model_path
+        self.store = store or ComparisonStore()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.errors = 0
+        self.dropped = 0
+
+    def _run(self, enriched: pd.DataFrame, tensors):
+        t0 = time.perf_counter()
+        if not self.shares_inputs:
+            tensors = build_local_graph(enriched, self.artifacts["node_scaler"], self.artifacts["edge_scaler"])[:3]
+        x, edge_index, edge_attr = tensors
+        probs = predict_proba(self.model, x, edge_index, edge_attr)
+        return probs, (time.perf_counter() - t0) * 1000
+
+    def submit(self, enriched: pd.DataFrame, tensors: tuple):
+        """Start scoring the batch; returns a future of (probs, ms), or None if the batch was dropped."""
+        if not self._slots.acquire(blocking=False):
+            self.dropped += 1
+            return None
+        future = self._executor.submit(self._run, enriched, tensors)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def record(self, future, transaction_ids, steps, primary: np.ndarray, primary_ms: float):
+        """Store the comparison once the shadow result is ready (never blocks the caller)."""
+        def _done(f):
+            try:
+                shadow, shadow_ms = f.result()
+                self.store.add(transaction_ids, steps, primary, shadow, primary_ms, shadow_ms)
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Shadow scoring failed: {e}")
+        future.add_done_callback(_done)
+
+    def summary(self) -> dict:
+        return {"model_path": self.model_path, "shared_inputs": self.shares_inputs, "errors": self.errors,
+                "dropped": self.dropped, **self.store.summary()}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.store.flush()
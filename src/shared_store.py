@@ -0,0 +1,384 @@
+"""
+Shared read-only data for multi-worker deployments.
+
+Every Streamlit session, scoring-service process and rescore worker used to
+parse the predictions CSV, rebuild the risk index / temporal graph and load
+the model for itself, so memory grew by a full copy per worker.  `publish`
+runs once, in a loader process, and writes those structures as flat .npy
+arrays under one root (by default in /dev/shm, i.e. shared memory):
+
+    risk_index/       RiskIndex.to_arrays(): rows, step partitions, account postings, tx-id order
+    temporal_graph/   TemporalGraph.to_arrays(): edge arrays, CSR adjacency
+    history/          the raw feature dataset, one array per column
+    graph/            rescore.prepare_graph() over the history: node feature matrix, edge list, edge attributes
+    model/            EdgeSAGE weights (one array per tensor), config.json, scalers.pkl, account mapping
+
+Workers set PULSE4_SHARED_STORE=<root> and attach with np.load(mmap_mode="r"):
+the pages are the same physical memory in every process, so another worker
+costs little more than its own interpreter.  A bundle is only used while
+its source file is unchanged (path, size and mtime are recorded in
+manifest.json); otherwise callers fall back to building their own copy.
+Publishing builds into a temporary folder and renames it into place, so
+attached workers keep their (unlinked) maps and switch to the new version on
+their next lookup.
+
+    python -m src.shared_store publish --root /dev/shm/pulse4
+    PULSE4_SHARED_STORE=/dev/shm/pulse4 streamlit run app.py
+    python -m src.shared_store info --root /dev/shm/pulse4
+"""
+import argparse
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREDICTIONS_PATH = os.path.join(BASE_DIR, "data", "test_predictions_v2.0.csv")
+DATA_PATH = os.path.join(BASE_DIR, "data", "dataset_transaction_raw with feature_v2.0.csv")
+MODEL_DIR = os.path.join(BASE_DIR, "model")
+ENV_VAR = "PULSE4_SHARED_STORE"
+DEFAULT_ROOT = "/dev/shm/pulse4" if os.path.isdir("/dev/shm") else os.path.join(BASE_DIR, "shared_store")
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+BUNDLES = ("predictions", "history", "graph", "model")     # publish groups; "predictions" writes two bundles
+
+
+# ==================== 1️⃣ 数组读写 ====================
+def _stamp(path: str) -> dict:
+    path = os.path.realpath(path)
+    return {"path": path, "size": os.path.getsize(path), "mtime": os.path.getmtime(path)}
+
+
+def _save_arrays(folder: str, arrays: dict) -> int:
+    """One .npy per array; names with '/' become sub-folders.  Returns the bytes written."""
+    total = 0
+    for name, arr in arrays.items():
+        arr = np.asarray(arr)
+        if arr.dtype == object:
+            arr = arr.astype(str)                     # fixed-width unicode can be mapped; object arrays cannot
+        path = os.path.join(folder, *name.split("/")) + ".npy"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.save(path, arr, allow_pickle=False)
+        total += arr.nbytes
+    return total
+
+
+def _load_arrays(folder: str) -> dict:
+    """Read-only memory maps of every .npy under `folder`, keyed by the names given to _save_arrays."""
+    arrays = {}
+    for dirpath, _, files in os.walk(folder):
+        for f in files:
+            if not f.endswith(".npy"):
+                continue
+            path = os.path.join(dirpath, f)
+            name = os.path.relpath(path, folder)[:-4].replace(os.sep, "/")
+            try:
+                arrays[name] = np.load(path, mmap_mode="r").view(np.ndarray)
+            except ValueError:                        # empty arrays cannot be mapped
+                arrays[name] = np.load(path)
+    return arrays
+
+
+# ==================== 2️⃣ 发布 ====================
+def _history_arrays(df: pd.DataFrame):
+    """Column arrays of the history frame; categoricals are stored as codes + categories."""
+    arrays, categories = {}, {}
+    for c in df.columns:
+        col = df[c]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            arrays[c] = col.cat.codes.to_numpy()
+            categories[c] = [str(v) for v in col.cat.categories]
+        else:
+            arrays[c] = col.to_numpy()
+    return arrays, {"columns": list(df.columns), "categories": categories}
+
+
+def _model_arrays(model_dir: str, model_path: str) -> dict:
+    import torch
+    state = torch.load(model_path, map_location="cpu")
+    arrays = {f"state/{k}": v.detach().cpu().numpy() for k, v in state.items()}
+    with open(os.path.join(model_dir, "mapping.pkl"), "rb") as f:
+        mapping = pickle.load(f)
+    # node2idx as two sorted arrays: ids are resolved by binary search instead of a per-process dict
+    keys = np.asarray(list(mapping["node2idx"].keys()))
+    if keys.dtype == object:
+        keys = keys.astype(str)
+    order = np.argsort(keys, kind="stable")
+    arrays.update({
+        "node_keys": keys[order],
+        "node_idx": np.asarray(list(mapping["node2idx"].values()), dtype=np.int64)[order],
+        "unique_nodes": np.asarray(mapping["unique_nodes"]),
+    })
+    return arrays
+
+
+def publish(root: str = DEFAULT_ROOT, predictions: str = PREDICTIONS_PATH, history: str = DATA_PATH,
+            model_dir: str = MODEL_DIR, model_path: str = None, partitions: int = None,
+            bundles=BUNDLES) -> dict:
+    """Build the requested bundles into `<root>.tmp` and swap it into place; returns the manifest."""
+    from .archive import load_history
+    from .gnn_core import load_artifacts
+    from .rescore import prepare_graph
+    from .risk_index import COLUMNS as INDEX_COLUMNS, RiskIndex
+    from .temporal_graph import COLUMNS as GRAPH_COLUMNS, TemporalGraph
+
+    model_path = model_path or os.path.join(model_dir, "best_model.pth")
+    tmp = f"{root}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    manifest = {"format": FORMAT_VERSION, "published_at": time.strftime("%Y-%m-%d %H:%M:%S"), "bundles": {}}
+
+    def add(name, source, arrays, meta=None):
+        nbytes = _save_arrays(os.path.join(tmp, name), arrays)
+        manifest["bundles"][name] = {"source": source, "meta": meta or {}, "arrays": len(arrays), "bytes": nbytes}
+        print(f"   {name:<15} {len(arrays):>5} arrays {nbytes / 1e6:>10.1f} MB")
+
+    t0 = time.perf_counter()
+    if "predictions" in bundles:
+        usecols = set(INDEX_COLUMNS) | set(GRAPH_COLUMNS)
+        df = load_history(predictions, usecols)
+        add("risk_index", _stamp(predictions), RiskIndex(df).to_arrays())
+        graph = TemporalGraph(df)
+        graph.version = os.path.getmtime(predictions)
+        arrays, meta = graph.to_arrays()
+        add("temporal_graph", _stamp(predictions), arrays, meta)
+        del df, graph
+
+    if "history" in bundles or "graph" in bundles:
+        from .dataset_loader import load_dataset
+        df = load_dataset(history)
+        if "history" in bundles:
+            arrays, meta = _history_arrays(df)
+            add("history", _stamp(history), arrays, meta)
+        if "graph" in bundles:
+            n_parts = partitions or 4 * (os.cpu_count() or 1)
+            add("graph", _stamp(history), prepare_graph(df, load_artifacts(model_dir), n_parts),
+                {"partitions": n_parts, "model_dir": os.path.realpath(model_dir)})
+        del df
+
+    if "model" in bundles:
+        add("model", _stamp(model_path), _model_arrays(model_dir, model_path))
+        for name in ("config.json", "scalers.pkl"):
+            shutil.copy2(os.path.join(model_dir, name), os.path.join(tmp, "model", name))
+
+    with open(os.path.join(tmp, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    old = f"{root}.old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(root):
+        os.replace(root, old)
+    os.replace(tmp, root)
+    shutil.rmtree(old, ignore_errors=True)          # attached workers keep their maps of the unlinked files
+    total = sum(b["bytes"] for b in manifest["bundles"].values())
+    print(f"✅ Shared store published to {root}: {total / 1e6:.1f} MB in {time.perf_counter() - t0:.1f}s")
+    return manifest
+
+
+# ==================== 3️⃣ 挂载 ====================
+class SharedStore:
+    """Read-only view of a published root; arrays are mapped on first use and shared by every caller."""
+
+    def __init__(self, root: str):
+        self.root = root
+        with open(os.path.join(root, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"shared store format {self.manifest.get('format')} != {FORMAT_VERSION}")
+        self._arrays = {}
+        self._objects = {}
+        self._stale = set()
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def has(self, name: str) -> bool:
+        return name in self.manifest["bundles"]
+
+    def meta(self, name: str) -> dict:
+        return self.manifest["bundles"][name]["meta"]
+
+    def arrays(self, name: str) -> dict:
+        with self._lock:
+            if name not in self._arrays:
+                self._arrays[name] = _load_arrays(self.path(name))
+            return self._arrays[name]
+
+    def fresh(self, name: str, path: str = None) -> bool:
+        """
+        True if the bundle was published from `path` (when given) and that
+        file is unchanged.  A source that no longer exists here is trusted:
+        the store is then the only copy.
+        """
+        entry = self.manifest["bundles"].get(name)
+        if entry is None:
+            return False
+        src = entry["source"]
+        if path is not None and os.path.realpath(path) != src["path"]:
+            return False
+        if not os.path.exists(src["path"]) or _stamp(src["path"]) == src:
+            return True
+        if name not in self._stale:
+            self._stale.add(name)
+            print(f"⚠️ Shared store bundle '{name}' is stale ({src['path']} changed); building a local copy.")
+        return False
+
+    def _object(self, key: str, build):
+        with self._lock:
+            obj = self._objects.get(key)
+        if obj is None:
+            obj = build()
+            with self._lock:
+                obj = self._objects.setdefault(key, obj)
+        return obj
+
+    # ---------- data ----------
+    def risk_index(self, path: str = None):
+        """RiskIndex over the mapped arrays, or None if the bundle does not cover `path`."""
+        if not self.fresh("risk_index", path):
+            return None
+        from .risk_index import RiskIndex
+        return self._object("risk_index", lambda: RiskIndex.from_arrays(self.arrays("risk_index")))
+
+    def temporal_graph(self, path: str = None):
+        if not self.fresh("temporal_graph", path):
+            return None
+        from .temporal_graph import TemporalGraph
+        return self._object("temporal_graph", lambda: TemporalGraph.from_arrays(
+            self.arrays("temporal_graph"), self.meta("temporal_graph")))
+
+    def history_frame(self, path: str = None) -> pd.DataFrame:
+        """The history dataset as a DataFrame over the mapped columns (numeric columns are not copied)."""
+        if not self.fresh("history", path):
+            return None
+
+        def build():
+            arrays, meta = self.arrays("history"), self.meta("history")
+            cols = {}
+            for c in meta["columns"]:
+                if c in meta["categories"]:
+                    cols[c] = pd.Categorical.from_codes(arrays[c], categories=meta["categories"][c])
+                else:
+                    cols[c] = arrays[c]
+            return pd.DataFrame(cols, copy=False)
+        return self._object("history", build)
+
+    def rescore_graph(self, path: str = None) -> dict:
+        """prepare_graph() arrays (x, src, dst, edge_attr, part) over the published history."""
+        return self.arrays("graph") if self.fresh("graph", path) else None
+
+    # ---------- model ----------
+    def model_artifacts(self) -> dict:
+        """load_artifacts() equivalent; node2idx is replaced by `node_codes`."""
+        def build():
+            with open(os.path.join(self.path("model"), "config.json")) as f:
+                config = json.load(f)
+            with open(os.path.join(self.path("model"), "scalers.pkl"), "rb") as f:
+                scalers = pickle.load(f)
+            return {
+                "config": config,
+                "node_scaler": scalers["node_scaler"],
+                "edge_scaler": scalers["edge_scaler"],
+                "unique_nodes": self.arrays("model")["unique_nodes"],
+            }
+        return self._object("artifacts", build)
+
+    def node_codes(self, ids) -> np.ndarray:
+        """mapping.pkl's node2idx for an array of account ids; raises KeyError on unknown accounts."""
+        arrays = self.arrays("model")
+        keys, idx = arrays["node_keys"], arrays["node_idx"]
+        ids = np.asarray(ids)
+        if keys.dtype.kind == "U":
+            ids = ids.astype(str)
+        pos = np.searchsorted(keys, ids)
+        pos[pos == len(keys)] = 0
+        missing = keys[pos] != ids
+        if missing.any():
+            raise KeyError(f"{int(missing.sum())} account ids are not in the model mapping, e.g. {ids[missing][0]}")
+        return idx[pos]
+
+    def load_model(self, device=None):
+        """EdgeSAGE whose parameters are the mapped weight arrays (assigned, not copied)."""
+        import torch
+        from .gnn_core import DEVICE, EdgeSAGE
+        artifacts = self.model_artifacts()
+        model = EdgeSAGE(
+            node_in=len(artifacts["node_scaler"].mean_),
+            edge_in=len(artifacts["edge_scaler"].mean_),
+            hidden_dim=artifacts["config"]["EMBED_DIM"],
+        )
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)          # non-writable arrays: inference never writes them
+            state = {k[len("state/"):]: torch.from_numpy(v) for k, v in self.arrays("model").items()
+                     if k.startswith("state/")}
+            model.load_state_dict(state, assign=True)
+        return model.to(device or DEVICE).eval()
+
+    def info(self) -> dict:
+        return {
+            "root": self.root,
+            "published_at": self.manifest["published_at"],
+            "bundles": {name: {"bytes": b["bytes"], "arrays": b["arrays"], "fresh": self.fresh(name),
+                               "source": b["source"]["path"]}
+                        for name, b in self.manifest["bundles"].items()},
+        }
+
+
+_attached = {}
+_attached_lock = threading.Lock()
+
+
+def attached(root: str = None):
+    """The store named by PULSE4_SHARED_STORE (reopened after a republish), or None."""
+    root = root or os.environ.get(ENV_VAR)
+    if not root:
+        return None
+    try:
+        st = os.stat(os.path.join(root, MANIFEST))
+    except OSError:
+        return None
+    key = (st.st_ino, st.st_mtime_ns)
+    with _attached_lock:
+        hit = _attached.get(root)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+    store = SharedStore(root)
+    with _attached_lock:
+        _attached[root] = (key, store)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish / inspect the shared read-only store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pub = sub.add_parser("publish", help="build the bundles and swap them into place")
+    pub.add_argument("--root", default=DEFAULT_ROOT)
+    pub.add_argument("--predictions", default=PREDICTIONS_PATH)
+    pub.add_argument("--history", default=DATA_PATH, help="raw feature dataset for history/ and graph/")
+    pub.add_argument("--model-dir", default=MODEL_DIR)
+    pub.add_argument("--model-path", default=None, help="default: <model-dir>/best_model.pth")
+    pub.add_argument("--partitions", type=int, default=None, help="rescore partitions baked into graph/")
+    pub.add_argument("--bundles", default=",".join(BUNDLES), help=f"comma-separated subset of {','.join(BUNDLES)}")
+    info = sub.add_parser("info", help="bundle sizes and freshness")
+    info.add_argument("--root", default=os.environ.get(ENV_VAR) or DEFAULT_ROOT)
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        bundles = [b.strip() for b in args.bundles.split(",") if b.strip()]
+        unknown = set(bundles) - set(BUNDLES)
+        if unknown:
+            parser.error(f"unknown bundles: {sorted(unknown)}")
+        publish(args.root, args.predictions, args.history, args.model_dir, args.model_path, args.partitions, bundles)
+        print(f"   Workers attach with {ENV_VAR}={args.root}")
+    else:
+        print(json.dumps(SharedStore(args.root).info(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
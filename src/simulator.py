@@ -3,8 +3,6 @@ import os
 import pandas as pd
 from datetime import datetime
 from .data_utils import resolve_today_csv, _resolve_folder
-from .gnn_drive_inference import json_processing
-import streamlit as st
 
 REQUIRED_INPUT_FIELDS = [
     "step","orig_id","dest_id","amount",
@@ -15,15 +13,16 @@ REQUIRED_INPUT_FIELDS = [
 
 
 def save_and_predict(user_json_str: str):
-    
+    """Run the simulated transaction through enrichment + inference; returns the status dict (the UI renders it)."""
+    # 推理链路（历史 CSV、特征更新、模型子进程）在第一次点击时才导入
+    from .gnn_drive_inference import json_processing
     try:
         data = json.loads(user_json_str)
       
 
         pred = json_processing(data)
         print(pred)
-        st.write("Prediction Status:")
-        st.json(pred)
+        return pred
     except json.JSONDecodeError:
         return {"error": "Invalid JSON format."}
     except Exception as e:
@@ -0,0 +1,293 @@
+"""
+Checkpoint / restore for the in-memory feature state.
+
+A checkpoint is a directory of plain `.npy` arrays (memory-mappable with
+`np.load(..., mmap_mode="r")`) plus a small `manifest.json`:
+
+    ckpt_step000743/
+        manifest.json
+        orig_ids.npy  orig_offsets.npy  orig_step.npy  orig_count.npy  orig_sum.npy  orig_m2.npy
+        dest_ids.npy  dest_offsets.npy  ...
+
+Set PULSE4_CHECKPOINT_DIR to make the inference path (`json_processing`)
+enrich from the latest checkpoint instead of the history CSV.
+
+Per-account window buckets are stored flattened (CSR style: one offsets
+array per role).  On restore the window totals are re-derived from the
+buckets, and only the transactions after the manifest's `last_step` are
+replayed, so a restart no longer parses the full history CSV.
+"""
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .data_utils import _resolve_folder
+from .feature_stream import WINDOWS, W30D, AccountWindows, FeatureStream
+
+CHECKPOINT_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "checkpoints")
+CHECKPOINT_VERSION = 2              # 2: buckets store squared deviations (m2) instead of sums of squares
+KEEP_LAST = 3
+ENV_VAR = "PULSE4_CHECKPOINT_DIR"
+
+
+# ==================== 序列化 ====================
+def _pack_role(accounts: dict) -> dict:
+    """Flatten {account_id: AccountWindows} into CSR arrays, keeping only live 30-day buckets."""
+    ids = list(accounts.keys())
+    offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+    steps, counts, sums, m2 = [], [], [], []
+    for i, acc_id in enumerate(ids):
+        live = accounts[acc_id].buckets[accounts[acc_id].heads[W30D]:]
+        offsets[i + 1] = offsets[i] + len(live)
+        for b in live:
+            steps.append(b[0])
+            counts.append(b[1])
+            sums.append(b[2])
+            m2.append(b[3])
+    return {
+        "ids": np.array(ids, dtype=str),
+        "offsets": offsets,
+        "step": np.array(steps, dtype=np.int32),
+        "count": np.array(counts, dtype=np.int32),
+        "sum": np.array(sums, dtype=np.float64),
+        "m2": np.array(m2, dtype=np.float64),
+    }
+
+
+def _unpack_role(arrays: dict, last_step) -> dict:
+    """Rebuild {account_id: AccountWindows}; totals are merged from the buckets, then advanced."""
+    ids, offsets = arrays["ids"], arrays["offsets"]
+    steps = arrays["step"].tolist()
+    counts = arrays["count"].tolist()
+    sums = arrays["sum"].tolist()
+    m2 = arrays["m2"].tolist()
+    accounts = {}
+    for i, acc_id in enumerate(ids.tolist()):
+        lo, hi = int(offsets[i]), int(offsets[i + 1])
+        acc = AccountWindows()
+        acc.buckets = [[steps[j], counts[j], sums[j], m2[j]] for j in range(lo, hi)]
+        for b in acc.buckets:
+            for w in range(len(WINDOWS)):
+                acc.merge(w, b[1], b[2], b[3])
+        if last_step is not None:
+            # Eviction is monotonic, so advancing to the global last step is
+            # equivalent to the account's own (earlier) position for any later event.
+            acc.advance(last_step)
+        accounts[acc_id] = acc
+    return accounts
+
+
+def save_checkpoint(stream: FeatureStream, root: str = CHECKPOINT_ROOT, keep_last: int = KEEP_LAST) -> str:
+    """
+    Write a checkpoint of `stream` under `root`.  The directory is written
+    under a temp name and renamed, so readers never see a half-written
+    checkpoint.
+    """
+    os.makedirs(root, exist_ok=True)
+    last_step = -1 if stream.last_step is None else int(stream.last_step)
+    name = f"ckpt_step{last_step:06d}"
+    final_dir = os.path.join(root, name)
+    tmp_dir = os.path.join(root, f".{name}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    files = {}
+
+    def _write(key, arr):
+        np.save(os.path.join(tmp_dir, f"{key}.npy"), arr)
+        files[key] = {"dtype": str(arr.dtype), "shape": list(arr.shape)}
+
+    for role in ("orig", "dest"):
+        for key, arr in _pack_role(getattr(stream, role)).items():
+            _write(f"{role}_{key}", arr)
+
+    manifest = {
+        "version": CHECKPOINT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "last_step": stream.last_step,
+        "events": stream.events,
+        "windows": list(WINDOWS),
+        "files": files,
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+
+    for old in list_checkpoints(root)[:-keep_last] if keep_last else []:
+        shutil.rmtree(old, ignore_errors=True)
+    print(f"💾 Checkpoint saved: {final_dir} ({stream.events} events, last_step={stream.last_step})")
+    return final_dir
+
+
+def list_checkpoints(root: str = CHECKPOINT_ROOT) -> list:
+    """Completed checkpoint directories, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    names = sorted(n for n in os.listdir(root)
+                   if n.startswith("ckpt_step") and os.path.exists(os.path.join(root, n, "manifest.json")))
+    return [os.path.join(root, n) for n in names]
+
+
+def load_checkpoint(path: str, mmap: bool = True) -> dict:
+    """
+    Load a checkpoint directory (or the latest one under a root folder).
+    Returns {"path", "stream", "manifest"}; the bucket arrays are
+    memory-mapped read-only while unpacking when `mmap` is true.
+    """
+    if not os.path.exists(os.path.join(path, "manifest.json")):
+        found = list_checkpoints(path)
+        if not found:
+            raise FileNotFoundError(f"No checkpoint found under {path}")
+        path = found[-1]
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != CHECKPOINT_VERSION or manifest.get("windows") != list(WINDOWS):
+        raise ValueError(f"Incompatible checkpoint {path}: {manifest.get('version')}, windows={manifest.get('windows')}")
+
+    mode = "r" if mmap else None
+
+    def _read(key):
+        return np.load(os.path.join(path, f"{key}.npy"), mmap_mode=mode)
+
+    stream = FeatureStream()
+    stream.last_step = manifest["last_step"]
+    stream.events = manifest["events"]
+    for role in ("orig", "dest"):
+        arrays = {k: _read(f"{role}_{k}") for k in ("ids", "offsets", "step", "count", "sum", "m2")}
+        setattr(stream, role, _unpack_role(arrays, stream.last_step))
+
+    return {"path": path, "stream": stream, "manifest": manifest}
+
+
+# ==================== 增量回放 ====================
+def _csv_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """The dtypes pd.read_csv gives the same file: int64, float64, and plain strings for categories."""
+    for c in df.columns:
+        kind = df[c].dtype.kind
+        if kind in "iu":
+            df[c] = df[c].astype(np.int64)
+        elif kind == "f":
+            df[c] = df[c].astype(np.float64)
+        elif isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype(df[c].cat.categories.dtype)
+    return df
+
+
+def _read_day(fpath: str) -> pd.DataFrame:
+    """
+    A day partition with the values and dtypes of pd.read_csv, from its
+    Parquet cache (written by src/drive_sync.py) when that is fresh and
+    lossless (float64 floats); a float32 cache falls back to the CSV.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from .dataset_loader import _cache_is_fresh, cache_path
+    if _cache_is_fresh(fpath):
+        cpath = cache_path(fpath)
+        if all(not pa.types.is_floating(f.type) or f.type == pa.float64() for f in pq.read_schema(cpath)):
+            return _csv_dtypes(pd.read_parquet(cpath))
+    return pd.read_csv(fpath)
+
+
+def iter_pending_daily_frames(last_step, folder: str = "daily_data"):
+    """
+    Yield one step-sorted DataFrame per daily partition with step > last_step.
+    A day file holds steps [24*d, 24*d + 23], so only files from the
+    checkpoint's day onwards are parsed.
+    """
+    folder_path = _resolve_folder(folder)
+    first_day = -1 if last_step is None else int(last_step) // 24
+    for fname in sorted(f for f in os.listdir(folder_path) if f.endswith(".csv")):
+        fpath = os.path.join(folder_path, fname)
+        try:
+            head = pd.read_csv(fpath, usecols=["step"], nrows=1)
+        except (ValueError, pd.errors.EmptyDataError):
+            continue
+        if head.empty or int(head["step"].iloc[0]) // 24 < first_day:
+            continue
+        day = _read_day(fpath)
+        if last_step is not None:
+            day = day[day["step"] > last_step]
+        if not day.empty:
+            yield day.sort_values("step", kind="stable")
+
+
+def iter_pending_daily(last_step, folder: str = "daily_data"):
+    """Yield records with step > last_step from the daily partitions."""
+    for day in iter_pending_daily_frames(last_step, folder):
+        yield from day.to_dict("records")
+
+
+def restore_stream(root: str = CHECKPOINT_ROOT, pending=None, folder: str = "daily_data") -> FeatureStream:
+    """
+    Load the latest checkpoint and fold in the transactions after its step.
+    `pending` overrides the replay source (any iterable of records);
+    by default the daily partitions are scanned.
+    """
+    t0 = time.perf_counter()
+    ckpt = load_checkpoint(root)
+    stream = ckpt["stream"]
+    restored_at, ckpt_step = stream.events, stream.last_step
+    records = pending if pending is not None else iter_pending_daily(ckpt_step, folder)
+    for rec in records:
+        if ckpt_step is not None and int(rec["step"]) <= ckpt_step:
+            continue
+        stream.update(str(rec["orig_id"]), str(rec["dest_id"]), int(rec["step"]), float(rec["amount"]))
+    print(f"✅ Restored {ckpt['path']} + {stream.events - restored_at} replayed events "
+          f"in {time.perf_counter() - t0:.2f}s")
+    return stream
+
+
+class CheckpointWriter:
+    """
+    Periodic checkpoints for a step-ordered feed.  Call `maybe_save(step)`
+    *before* processing each event: when the feed moves to a new step at
+    least `every_steps` after the last checkpoint, the state is complete up
+    to `stream.last_step` and is written out.
+    """
+
+    def __init__(self, stream: FeatureStream, root: str = CHECKPOINT_ROOT, every_steps: int = 24,
+                 keep_last: int = KEEP_LAST):
+        self.stream = stream
+        self.root = root
+        self.every_steps = every_steps
+        self.keep_last = keep_last
+        self._saved_step = stream.last_step
+
+    def maybe_save(self, next_step: int):
+        last = self.stream.last_step
+        if last is None or next_step <= last:
+            return None
+        if self._saved_step is None or last - self._saved_step >= self.every_steps:
+            self._saved_step = last
+            return save_checkpoint(self.stream, self.root, keep_last=self.keep_last)
+        return None
+
+
+def main():
+    """Build a first checkpoint from the history CSV (the slow path, run once)."""
+    import argparse
+    from .gnn_drive_inference import DATA_PATH, load_local_csv
+
+    parser = argparse.ArgumentParser(description="Bootstrap a feature-state checkpoint from the history CSV")
+    parser.add_argument("--history", default=DATA_PATH)
+    parser.add_argument("--root", default=CHECKPOINT_ROOT)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    history = load_local_csv(args.history)
+    stream = FeatureStream()
+    stream.warm_start(history)
+    save_checkpoint(stream, args.root)
+    print(f"✅ Bootstrap finished in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Temporal graph index over the prediction file.
+
+Edges keep their file order (edge id = row); each node has an outgoing and
+an incoming adjacency list (CSR) sorted by step, so the edges of a node in
+any step window are two binary searches, and the edges of the whole window
+are two binary searches on the step-sorted edge order.
+
+Daily snapshot summaries (per-node edge degree, risky-edge degree and
+connected-component ids) are built on the first `summary(...)` call, so
+graph builds that only walk edges never pay for them.  Node names are
+looked up by binary search over a sorted order, so the whole graph is flat
+arrays (`to_arrays` / `from_arrays`) that src/shared_store.py can publish
+once for every worker to memory-map.  `summary(...)`
+merges the full days of a window with the partial days at its ends:
+degrees add up, and components are merged by connecting every node to the
+components it belonged to on each day.
+
+    tg = get_temporal_graph(PREDICTIONS_PATH)
+    G = tg.to_networkx(tg.node_edges("241080", "both", 0, 167))
+    labels = classify_fraud_patterns(tg.risk_compact(0, 167, min_prob=0.5))
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from .compact_graph import CompactGraph, _tx_array
+from .shared_store import attached
+
+COLUMNS = ["transaction_id", "orig_id", "dest_id", "amount", "fraud_prob_pred", "step"]
+REQUIRED = ["orig_id", "dest_id", "transaction_id", "fraud_prob_pred"]
+STEPS_PER_DAY = 24
+RISKY_THRESHOLD = 0.5
+GRAPH_ARRAYS = ("src", "dst", "nodes", "step", "prob", "amount", "tx", "out_ptr", "out_edges", "out_steps",
+                "in_ptr", "in_edges", "in_steps", "by_step", "sorted_steps", "node_order")
+DAY_ARRAYS = ("nodes", "degree", "risky_degree", "component")
+
+
+def _id_strings(s: pd.Series) -> np.ndarray:
+    """Account ids as strings, '123.0' -> '123' (same as graph_tool._to_str)."""
+    num = pd.to_numeric(s, errors="coerce")
+    if num.notna().all():
+        return num.astype("int64").astype(str).to_numpy()
+    out = s.astype(str).to_numpy(copy=True)
+    ok = num.notna().to_numpy()
+    out[ok] = num[ok].astype("int64").astype(str).to_numpy()
+    return out
+
+
+def _csr(keys: np.ndarray, step: np.ndarray, n: int):
+    """Edge ids grouped by `keys`, each group sorted by (step, edge id)."""
+    order = np.lexsort((np.arange(len(keys)), step, keys))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=indptr[1:])
+    return indptr, order, step[order]
+
+
+class TemporalGraph:
+    def __init__(self, df: pd.DataFrame, risky_threshold: float = RISKY_THRESHOLD):
+        missing = [c for c in REQUIRED if c not in df.columns]
+        if missing:
+            raise ValueError(f"missing columns: {missing}")
+        orig, dest = _id_strings(df["orig_id"]), _id_strings(df["dest_id"])
+        codes, self.nodes = pd.factorize(np.concatenate([orig, dest]))
+        n_edges = len(df)
+        self.src = codes[:n_edges].astype(np.int64)
+        self.dst = codes[n_edges:].astype(np.int64)
+        self.node_order = np.argsort(self.nodes.astype(str), kind="stable")
+        self.step = (df["step"].to_numpy(dtype=np.int64) if "step" in df.columns
+                     else np.zeros(n_edges, dtype=np.int64))
+        self.prob = df["fraud_prob_pred"].astype(float).to_numpy()
+        self.amount = df["amount"].astype(float).to_numpy() if "amount" in df.columns else np.zeros(n_edges)
+        self.tx = _tx_array(df["transaction_id"].to_numpy())          # int64 unless ids are non-numeric
+        self.risky_threshold = risky_threshold
+        self.version = None               # source file mtime, set by get_temporal_graph
+
+        n = len(self.nodes)
+        self.out_ptr, self.out_edges, self.out_steps = _csr(self.src, self.step, n)
+        self.in_ptr, self.in_edges, self.in_steps = _csr(self.dst, self.step, n)
+        self.by_step = np.argsort(self.step, kind="stable")
+        self.sorted_steps = self.step[self.by_step]
+        self._days = None
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.src)
+
+    @property
+    def days(self) -> dict:
+        """Daily snapshot summaries {day: summary}, built on first use."""
+        if self._days is None:
+            days = {}
+            if self.n_edges:
+                for day in range(int(self.sorted_steps[0]) // STEPS_PER_DAY, int(self.sorted_steps[-1]) // STEPS_PER_DAY + 1):
+                    edges = self.window_edges(day * STEPS_PER_DAY, (day + 1) * STEPS_PER_DAY - 1)
+                    if len(edges):
+                        days[day] = self._summarize(edges)
+            self._days = days
+        return self._days
+
+    # ---------- flat arrays (shared store) ----------
+    def to_arrays(self):
+        """
+        (arrays, meta): every array the queries read.  Daily summaries that
+        were already built are flattened to days/<d>/<field>; otherwise the
+        graph that reads the arrays builds them on its first `summary`.
+        """
+        arrays = {name: getattr(self, name) for name in GRAPH_ARRAYS}
+        meta = {"risky_threshold": self.risky_threshold, "version": self.version}
+        if self._days is not None:
+            days = {}
+            for day, s in self._days.items():
+                arrays.update({f"days/{day}/{f}": s[f] for f in DAY_ARRAYS})
+                days[str(day)] = {"n_edges": int(s["n_edges"]), "n_risky": int(s["n_risky"])}
+            meta["days"] = days
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, meta: dict) -> "TemporalGraph":
+        """Graph over arrays from `to_arrays` (e.g. read-only memory maps); nothing is copied."""
+        graph = cls.__new__(cls)
+        for name in GRAPH_ARRAYS:
+            setattr(graph, name, arrays[name])
+        graph.risky_threshold, graph.version = meta["risky_threshold"], meta["version"]
+        graph._days = None
+        if meta.get("days") is not None:
+            graph._days = {
+                int(day): dict({f: arrays[f"days/{day}/{f}"] for f in DAY_ARRAYS}, **counts)
+                for day, counts in meta["days"].items()
+            }
+        return graph
+
+    def node_code(self, node) -> int:
+        """Code of an account id string, or -1."""
+        name = str(node)
+        i = int(np.searchsorted(self.nodes, name, sorter=self.node_order))
+        if i < len(self.node_order) and self.nodes[self.node_order[i]] == name:
+            return int(self.node_order[i])
+        return -1
+
+    # ---------- window queries ----------
+    def window_edges(self, start_step=None, end_step=None) -> np.ndarray:
+        """Edge ids with start_step <= step <= end_step (all edges when no window)."""
+        if start_step is None or end_step is None:
+            return self.by_step
+        lo = np.searchsorted(self.sorted_steps, start_step, side="left")
+        hi = np.searchsorted(self.sorted_steps, end_step, side="right")
+        return self.by_step[lo:hi]
+
+    @staticmethod
+    def _slice(ptr, edges, steps, i, start_step, end_step):
+        lo, hi = ptr[i], ptr[i + 1]
+        if start_step is not None and end_step is not None:
+            lo, hi = (lo + np.searchsorted(steps[lo:hi], start_step, side="left"),
+                      lo + np.searchsorted(steps[lo:hi], end_step, side="right"))
+        return edges[lo:hi]
+
+    def node_edges(self, node, role: str = "both", start_step=None, end_step=None) -> np.ndarray:
+        """Edge ids touching `node` in the window, in file order.  role: both | origin | destination."""
+        i = self.node_code(node)
+        if i < 0:
+            return np.empty(0, dtype=np.int64)
+        parts = []
+        if role in ("both", "origin"):
+            parts.append(self._slice(self.out_ptr, self.out_edges, self.out_steps, i, start_step, end_step))
+        if role in ("both", "destination"):
+            parts.append(self._slice(self.in_ptr, self.in_edges, self.in_steps, i, start_step, end_step))
+        return np.unique(np.concatenate(parts))
+
+    # ---------- NetworkX views ----------
+    def to_networkx(self, edges, risk_threshold: float = None) -> "nx.Graph":
+        """
+        Undirected graph over `edges` (added in the given order, so a repeated
+        pair keeps the attributes of its last edge).  Edge attributes match
+        what graph_tool uses: fraud_prob_pred / prob, tx_id / tx, amount, fraud.
+        """
+        import networkx as nx
+        threshold = self.risky_threshold if risk_threshold is None else risk_threshold
+        names = self.nodes
+        G = nx.Graph()
+        G.add_edges_from(
+            (names[u], names[v], {"fraud_prob_pred": p, "prob": p, "tx_id": t, "tx": t, "amount": a, "fraud": p > threshold})
+            for u, v, p, t, a in zip(self.src[edges], self.dst[edges], self.prob[edges].tolist(),
+                                     self.tx[edges].astype(str), self.amount[edges].tolist())
+        )
+        return G
+
+    def compact(self, edges, risk_threshold: float = None) -> CompactGraph:
+        """Same graph as to_networkx(edges) as a CompactGraph (typed arrays + CSR)."""
+        threshold = self.risky_threshold if risk_threshold is None else risk_threshold
+        return CompactGraph.from_codes(self.src[edges], self.dst[edges], self.nodes, self.prob[edges],
+                                       self.amount[edges], self.tx[edges], threshold)
+
+    def _risk_edges(self, start_step, end_step, min_prob: float, client) -> np.ndarray:
+        edges = self.window_edges(start_step, end_step) if client is None else self.node_edges(client, "both", start_step, end_step)
+        edges = edges[self.prob[edges] >= min_prob]
+        return edges[np.argsort(-self.prob[edges], kind="stable")]
+
+    def risk_graph(self, start_step=None, end_step=None, min_prob: float = 0.5, risk_threshold: float = None,
+                   client=None) -> "nx.Graph":
+        """
+        Graph of the window's edges with fraud_prob_pred >= min_prob (only those
+        touching `client` if given), highest probability first.
+        """
+        edges = self._risk_edges(start_step, end_step, min_prob, client)
+        return self.to_networkx(edges, min_prob if risk_threshold is None else risk_threshold)
+
+    def risk_compact(self, start_step=None, end_step=None, min_prob: float = 0.5, risk_threshold: float = None,
+                     client=None) -> CompactGraph:
+        """risk_graph as a CompactGraph."""
+        edges = self._risk_edges(start_step, end_step, min_prob, client)
+        return self.compact(edges, min_prob if risk_threshold is None else risk_threshold)
+
+    # ---------- snapshot summaries ----------
+    def _summarize(self, edges: np.ndarray) -> dict:
+        ends = np.concatenate([self.src[edges], self.dst[edges]])
+        risky = np.tile(self.prob[edges] > self.risky_threshold, 2)
+        nodes, inv = np.unique(ends, return_inverse=True)
+        k = len(nodes)
+        half = len(edges)
+        adj = coo_matrix((np.ones(half, dtype=np.int8), (inv[:half], inv[half:])), shape=(k, k))
+        _, comp = connected_components(adj, directed=False)
+        return {
+            "nodes": nodes,
+            "degree": np.bincount(inv, minlength=k),
+            "risky_degree": np.bincount(inv, weights=risky, minlength=k).astype(np.int64),
+            "component": comp,
+            "n_edges": half,
+            "n_risky": int(risky[:half].sum()),
+        }
+
+    @staticmethod
+    def _merge(parts: list) -> dict:
+        parts = [p for p in parts if p["n_edges"]]
+        if not parts:
+            empty = np.empty(0, dtype=np.int64)
+            return {"nodes": empty, "degree": empty, "risky_degree": empty, "component": empty,
+                    "n_components": 0, "n_edges": 0, "n_risky": 0}
+        if len(parts) == 1:
+            p = dict(parts[0])
+            p["n_components"] = int(p["component"].max()) + 1
+            return p
+        nodes, inv = np.unique(np.concatenate([p["nodes"] for p in parts]), return_inverse=True)
+        k = len(nodes)
+        degree = np.bincount(inv, weights=np.concatenate([p["degree"] for p in parts]), minlength=k)
+        risky = np.bincount(inv, weights=np.concatenate([p["risky_degree"] for p in parts]), minlength=k)
+        # Node i -- (day, component c) links; components of this bipartite graph are the merged components.
+        offsets = np.cumsum([0] + [int(p["component"].max()) + 1 for p in parts])
+        comp_ids = np.concatenate([p["component"] + off for p, off in zip(parts, offsets[:-1])])
+        size = k + int(offsets[-1])
+        adj = coo_matrix((np.ones(len(inv), dtype=np.int8), (inv, k + comp_ids)), shape=(size, size))
+        _, labels = connected_components(adj, directed=False)
+        _, component = np.unique(labels[:k], return_inverse=True)
+        return {
+            "nodes": nodes,
+            "degree": degree.astype(np.int64),
+            "risky_degree": risky.astype(np.int64),
+            "component": component,
+            "n_components": int(component.max()) + 1,
+            "n_edges": sum(p["n_edges"] for p in parts),
+            "n_risky": sum(p["n_risky"] for p in parts),
+        }
+
+    def summary(self, start_step=None, end_step=None) -> dict:
+        """
+        Merged snapshot for the window: node codes with their edge degree,
+        risky-edge degree and component id, plus edge / risky-edge totals.
+        Full days come from the daily snapshots; partial days are computed.
+        """
+        if start_step is None or end_step is None:
+            return self._merge(list(self.days.values()))
+        start_step, end_step = int(start_step), int(end_step)
+        first_full = -(-start_step // STEPS_PER_DAY)
+        last_full = (end_step + 1) // STEPS_PER_DAY - 1
+        if first_full > last_full:
+            return self._merge([self._summarize(self.window_edges(start_step, end_step))])
+        parts = [self.days[d] for d in range(first_full, last_full + 1) if d in self.days]
+        if start_step < first_full * STEPS_PER_DAY:
+            parts.append(self._summarize(self.window_edges(start_step, first_full * STEPS_PER_DAY - 1)))
+        if end_step >= (last_full + 1) * STEPS_PER_DAY:
+            parts.append(self._summarize(self.window_edges((last_full + 1) * STEPS_PER_DAY, end_step)))
+        return self._merge(parts)
+
+    def summary_frame(self, start_step=None, end_step=None) -> pd.DataFrame:
+        s = self.summary(start_step, end_step)
+        return pd.DataFrame({
+            "account": self.nodes[s["nodes"]] if len(s["nodes"]) else [],
+            "degree": s["degree"],
+            "risky_degree": s["risky_degree"],
+            "component": s["component"],
+        })
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_temporal_graph(path: str) -> TemporalGraph:
+    """Cached TemporalGraph for `path`, rebuilt when the file changes (attached from the shared store if published)."""
+    store = attached()
+    if store is not None:
+        graph = store.temporal_graph(path)
+        if graph is not None:
+            return graph
+    mtime = os.path.getmtime(path)
+    with _cache_lock:
+        hit = _cache.get(path)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+    from .archive import load_history
+    graph = TemporalGraph(load_history(path, COLUMNS))
+    graph.version = mtime
+    with _cache_lock:
+        _cache[path] = (mtime, graph)
+    return graph
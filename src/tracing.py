@@ -0,0 +1,277 @@
+"""
+Lightweight tracing for the dashboard and `src` hot paths.
+
+    with request_trace("risk_graph") as trace:       # one per user action
+        html = render_person_graph(...)               # @traced functions nest as child spans
+    print(trace.format_tree())
+
+- `span(name)` / `@traced()` time a block or function.  Spans opened while a
+  request trace is active become children in its timing tree; every span is
+  also aggregated into a per-name latency histogram.
+- `request_trace(..., profile=True)` (or `PULSE4_PROFILE_RATE` > 0) runs a
+  stack-sampling profiler on the request thread and attaches collapsed
+  stacks (flamegraph format) to the trace.
+- `prometheus_text()` renders the histograms in Prometheus text format;
+  `write_prometheus(path)` writes them to a file and `start_metrics_server`
+  serves them on `/metrics`.
+"""
+import contextvars
+import functools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROFILE_RATE = float(os.getenv("PULSE4_PROFILE_RATE", "0"))
+METRICS_FILE = os.getenv("PULSE4_METRICS_FILE", "")
+RECENT_TRACES = deque(maxlen=50)
+
+_current = contextvars.ContextVar("pulse4_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "duration", "children")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration = None
+        self.children = []
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "ms": round((self.duration or 0.0) * 1000, 3),
+            **({"attrs": self.attrs} if self.attrs else {}),
+            "children": [c.to_dict() for c in self.children],
+        }
+
+
+class _Histograms:
+    """Per-span-name latency histograms (cumulative buckets, Prometheus style)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            h = self._data.get(name)
+            if h is None:
+                h = self._data[name] = [[0] * len(BUCKETS), 0.0, 0]
+            for i, b in enumerate(BUCKETS):
+                if seconds <= b:
+                    h[0][i] += 1
+            h[1] += seconds
+            h[2] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {k: (list(v[0]), v[1], v[2]) for k, v in self._data.items()}
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+
+HISTOGRAMS = _Histograms()
+
+
+# ==================== Spans ====================
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block; nests under the active span if there is one."""
+    parent = _current.get()
+    s = Span(name, attrs)
+    token = _current.set(s)
+    try:
+        yield s
+    finally:
+        s.duration = time.perf_counter() - s.start
+        _current.reset(token)
+        if parent is not None:
+            parent.children.append(s)
+        HISTOGRAMS.observe(name, s.duration)
+
+
+def traced(name: str = None):
+    """Decorator form of `span`; the span name defaults to the function name."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ==================== Sampling profiler ====================
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005, max_depth: int = 40):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="pulse4-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            parts = []
+            while frame is not None and len(parts) < self.max_depth:
+                code = frame.f_code
+                parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if parts:
+                self.stacks[";".join(reversed(parts))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+class RequestTrace:
+    def __init__(self, root: Span):
+        self.root = root
+        self.profile = None           # Counter of collapsed stacks when sampled
+        self.finished_at = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.root.duration or 0.0) * 1000
+
+    def to_dict(self) -> dict:
+        d = self.root.to_dict()
+        if self.profile:
+            d["profile"] = dict(self.profile.most_common(50))
+        return d
+
+    def format_tree(self, min_ms: float = 0.0) -> str:
+        total = self.root.duration or 1e-12
+        lines = []
+
+        def walk(s: Span, depth: int):
+            ms = (s.duration or 0.0) * 1000
+            if depth and ms < min_ms:
+                return
+            child_ms = sum((c.duration or 0.0) for c in s.children) * 1000
+            self_ms = f"  self {ms - child_ms:.1f} ms" if s.children else ""
+            lines.append(f"{'  ' * depth}{s.name:<{40 - 2 * depth}} {ms:>10.1f} ms {100 * (s.duration or 0) / total:>5.1f}%{self_ms}")
+            for c in s.children:
+                walk(c, depth + 1)
+
+        walk(self.root, 0)
+        return "\n".join(lines)
+
+    def collapsed_profile(self) -> str:
+        """Profile samples in collapsed-stack format (`a;b;c count`), for flamegraph tools."""
+        if not self.profile:
+            return ""
+        return "\n".join(f"{stack} {n}" for stack, n in self.profile.most_common())
+
+
+@contextmanager
+def request_trace(name: str, profile: bool = None, **attrs):
+    """
+    Root span for one user request.  Yields a RequestTrace that is complete
+    once the block exits; finished traces are kept in RECENT_TRACES and, if
+    PULSE4_METRICS_FILE is set, the metrics file is refreshed.
+    """
+    if profile is None:
+        profile = PROFILE_RATE > 0 and random.random() < PROFILE_RATE
+    sampler = StackSampler(threading.get_ident()).start() if profile else None
+    with span(f"request:{name}", **attrs) as root:
+        trace = RequestTrace(root)
+        try:
+            yield trace
+        finally:
+            if sampler is not None:
+                trace.profile = sampler.stop()
+    trace.finished_at = time.time()
+    RECENT_TRACES.append(trace)
+    if METRICS_FILE:
+        try:
+            write_prometheus(METRICS_FILE)
+        except OSError as e:
+            print(f"⚠️ Failed to write metrics file: {e}")
+
+
+# ==================== Export ====================
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(prefix: str = "pulse4") -> str:
+    """All span histograms in Prometheus text exposition format."""
+    metric = f"{prefix}_span_seconds"
+    out = [f"# HELP {metric} Wall time of traced spans.", f"# TYPE {metric} histogram"]
+    for name, (buckets, total, count) in sorted(HISTOGRAMS.snapshot().items()):
+        lbl = _label(name)
+        for b, n in zip(BUCKETS, buckets):
+            out.append(f'{metric}_bucket{{span="{lbl}",le="{b}"}} {n}')
+        out.append(f'{metric}_bucket{{span="{lbl}",le="+Inf"}} {count}')
+        out.append(f'{metric}_sum{{span="{lbl}"}} {total:.6f}')
+        out.append(f'{metric}_count{{span="{lbl}"}} {count}')
+    return "\n".join(out) + "\n"
+
+
+def write_prometheus(path: str) -> str:
+    """Atomically write the metrics file (e.g. for the node_exporter textfile collector)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+    return path
+
+
+def summary_rows() -> list:
+    """Per-span count / mean / total, slowest first (for the dashboard table)."""
+    rows = []
+    for name, (_, total, count) in HISTOGRAMS.snapshot().items():
+        rows.append({"span": name, "count": count, "mean_ms": round(1000 * total / count, 2), "total_s": round(total, 3)})
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1"):
+    """Serve /metrics from a daemon thread (idempotent within a process)."""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=_server.serve_forever, name="pulse4-metrics", daemon=True).start()
+    return _server
@@ -1,33 +1,45 @@
+import os
+
 import pandas as pd
 
+from .risk_index import get_risk_index
+from .tracing import span, traced
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREDICTIONS_PATH = os.path.join(BASE_DIR, "data", "test_predictions_v2.0.csv")
+PAGE_SIZE = 200
+
+def _index():
+    # 索引按文件 mtime 缓存：文件不变则不重新读 CSV，文件更新后自动重建（Tab3 仍然是最新数据）
+    with span("risk_index"):
+        return get_risk_index(PREDICTIONS_PATH)
+
+@traced()
 def get_transactions(client_name: str = "", min_prob: float = 0.5, start_step: int = None, end_step: int = None, probability_threshold:float = None) -> pd.DataFrame:
     """
-    Return filtered transactions, re-reading the CSV each call (so Tab3 always fresh).
-    This function will only read from the specific file: 'data/test_predictions_v2.0.csv'.
+    Return filtered transactions sorted by fraud probability (descending).
+    Served from the precomputed risk index over 'data/test_predictions_v2.0.csv',
+    which is rebuilt whenever the file changes (archived days included, see src/archive.py).
     """
-    # 读取数据
-    file_path = "/home/yjing/Pulse4_Project/data/test_predictions_v2.0.csv"
-    df = pd.read_csv(file_path)
-
-    if df.empty:
-        return df
-
-    # 选择需要的列
-    cols = [c for c in ["transaction_id", "orig_id", "dest_id", "amount", "fraud_prob_pred", "isFraud_pred", "step"] if c in df.columns]
-    df = df[cols].copy()
-
-    # 根据客户名过滤数据
-    if client_name:
-        s = str(client_name)
-        df = df[(df["orig_id"].astype(str) == s) | (df["dest_id"].astype(str) == s)]
-
-    # 根据欺诈概率过滤
-    if "fraud_prob_pred" in df.columns:
-        df = df[df["fraud_prob_pred"].astype(float) >= float(min_prob)]
-
-    # 根据 step 过滤数据（如果提供了 start_step 和 end_step）
-    if start_step is not None and end_step is not None:
-        df = df[(df["step"] >= start_step) & (df["step"] <= end_step)]
-    
-    # 按照欺诈概率排序
-    return df.sort_values(by="fraud_prob_pred", ascending=False, na_position="last")
+    return _index().query(min_prob=float(min_prob), start_step=start_step, end_step=end_step, client_name=client_name)
+
+@traced()
+def count_transactions(client_name: str = "", min_prob: float = 0.5, start_step: int = None, end_step: int = None) -> int:
+    """Number of rows `get_transactions` would return (binary search per step, no materialisation)."""
+    return _index().count(min_prob=float(min_prob), start_step=start_step, end_step=end_step, client_name=client_name)
+
+@traced()
+def get_transactions_page(client_name: str = "", min_prob: float = 0.5, start_step: int = None, end_step: int = None, page: int = 0, page_size: int = PAGE_SIZE) -> pd.DataFrame:
+    """One page (0-based) of the `get_transactions` listing, merged lazily from the per-step sorted runs."""
+    return _index().page(page, page_size, min_prob=float(min_prob), start_step=start_step, end_step=end_step, client_name=client_name)
+
+@traced()
+def top_transactions(k: int = 20, start_step: int = None, end_step: int = None, min_prob: float = 0.0) -> pd.DataFrame:
+    """The k riskiest transactions in the step window."""
+    return _index().top(k, start_step=start_step, end_step=end_step, min_prob=float(min_prob))
+
+
+def whatif_window(start_step: int = None, end_step: int = None):
+    """What-if engine (src/whatif.py) for the step window: threshold queries and curves by binary search."""
+    from .whatif import get_whatif
+    return get_whatif(PREDICTIONS_PATH).window(start_step, end_step)
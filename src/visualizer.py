@@ -1,7 +1,7 @@
-import streamlit as st
 import plotly.graph_objects as go
 
 def risk_radar():
+    """Risk profile radar chart; the caller renders it (e.g. st.plotly_chart(fig, use_container_width=True))."""
     categories = ['Credit', 'Frequency', 'Amount', 'Diversity', 'Geo']
     values = [0.8, 0.6, 0.9, 0.7, 0.4]
 
@@ -17,4 +17,23 @@ def risk_radar():
         template='plotly_dark',
         margin=dict(t=10, b=10, l=10, r=10)
     )
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+
+def threshold_curve(curve, threshold=None, score_label="P(fraud)"):
+    """Flagged transactions and amount vs threshold (a whatif curve DataFrame), with the current threshold marked."""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=curve["threshold"], y=curve["count"], name="Flagged transactions", mode="lines"))
+    fig.add_trace(go.Scatter(x=curve["threshold"], y=curve["amount"], name="Flagged amount", mode="lines",
+                             yaxis="y2", line=dict(dash="dot")))
+    if threshold is not None:
+        fig.add_vline(x=threshold, line=dict(color="#ff4d4d", width=1))
+    fig.update_layout(
+        xaxis=dict(title=f"{score_label} threshold"),
+        yaxis=dict(title="Transactions", rangemode="tozero"),
+        yaxis2=dict(title="Amount", overlaying="y", side="right", rangemode="tozero"),
+        legend=dict(orientation="h", y=1.1),
+        template="plotly_dark",
+        margin=dict(t=30, b=10, l=10, r=10),
+    )
+    return fig
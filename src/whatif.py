@@ -0,0 +1,155 @@
+"""
+Threshold sweeps and what-if queries over the predictions.
+
+"How many transactions, and how much money, are flagged at P >= t (or at
+RI >= r with weights σ)?"  A `_Sorted` holds the scores of a step window in
+ascending order with prefix sums of the count and the amount, so a query is
+one binary search and a 101-point threshold curve is one vectorized
+searchsorted.
+
+- Windows come from the risk index (src/risk_index.py): its rows are ordered
+  by step, so a step window is a contiguous slice of its arrays, sorted once
+  per window and kept in a small LRU.
+- RI uses `risk_engine.risk_index_values` with A₀ = P95 of all amounts (the
+  A₀ of `composite_risk_index`).  Each σ is one vectorized pass and one sort
+  over the window, cached per σ; thresholds are then binary searches as well.
+
+    wi = get_whatif(PREDICTIONS_PATH).window(0, 743)
+    wi.flagged(0.7)                                   # {"count", "amount", "share", "amount_share"}
+    wi.flagged(0.9, sigma=(0.5, 0.4, 0.1))            # RI >= 0.9 with other weights
+    wi.curve(metric="ri", sigma=(0.5, 0.4, 0.1))      # threshold / count / amount DataFrame
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .risk_engine import RISK_LEVELS, SIGMAS, risk_index_values
+from .risk_index import get_risk_index
+
+MAX_WINDOWS = 16
+MAX_SIGMAS = 8
+CAP_PERCENTILE = 95
+
+
+class _Sorted:
+    """Scores in ascending order with prefix sums of count and amount."""
+
+    def __init__(self, scores: np.ndarray, amount: np.ndarray):
+        order = np.argsort(scores, kind="stable")
+        self.scores = scores[order]
+        self.cum_amount = np.concatenate([[0.0], np.cumsum(amount[order], dtype=np.float64)])
+
+    def at_least(self, threshold):
+        """(count, amount) with score >= threshold; vectorized over an array of thresholds."""
+        n = len(self.scores)
+        cut = np.searchsorted(self.scores, threshold, side="left")
+        return n - cut, self.cum_amount[-1] - self.cum_amount[cut]
+
+
+class WindowWhatIf:
+    """What-if queries over one step window."""
+
+    def __init__(self, prob: np.ndarray, amount: np.ndarray, A0: float, steps: tuple):
+        self.prob = prob
+        self.amount = np.nan_to_num(amount.astype(np.float64))
+        self.A0 = A0
+        self.steps = steps
+        self.total = len(prob)
+        self.total_amount = float(self.amount.sum())
+        self._by_prob = _Sorted(prob, self.amount)
+        self._by_ri = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _ri(self, sigma) -> _Sorted:
+        key = tuple(round(float(s), 6) for s in sigma)
+        with self._lock:
+            hit = self._by_ri.get(key)
+            if hit is not None:
+                self._by_ri.move_to_end(key)
+                return hit
+        ri = _Sorted(risk_index_values(self.prob, self.amount, self.A0, *key), self.amount)
+        with self._lock:
+            self._by_ri[key] = ri
+            while len(self._by_ri) > MAX_SIGMAS:
+                self._by_ri.popitem(last=False)
+        return ri
+
+    def _sorted(self, metric: str, sigma) -> _Sorted:
+        if metric == "prob":
+            return self._by_prob
+        if metric == "ri":
+            return self._ri(SIGMAS if sigma is None else sigma)
+        raise ValueError(f"metric must be 'prob' or 'ri', got {metric!r}")
+
+    def flagged(self, threshold: float, metric: str = None, sigma=None) -> dict:
+        """Transactions and amount at score >= threshold (metric "prob", or "ri" when sigma is given)."""
+        metric = metric or ("prob" if sigma is None else "ri")
+        count, amount = self._sorted(metric, sigma).at_least(float(threshold))
+        return {
+            "threshold": float(threshold), "metric": metric, "count": int(count), "amount": float(amount),
+            "share": count / self.total if self.total else 0.0,
+            "amount_share": amount / self.total_amount if self.total_amount else 0.0,
+        }
+
+    def curve(self, thresholds=None, metric: str = "prob", sigma=None) -> pd.DataFrame:
+        """Flagged count / amount for every threshold (default: 101 points over the metric's range)."""
+        s = self._sorted(metric, sigma)
+        if thresholds is None:
+            lo, hi = (0.0, 1.0) if metric == "prob" or not self.total else (float(s.scores[0]), float(s.scores[-1]))
+            thresholds = np.linspace(lo, hi, 101)
+        thresholds = np.asarray(thresholds, dtype=float)
+        count, amount = s.at_least(thresholds)
+        return pd.DataFrame({"threshold": thresholds, "count": count, "amount": amount,
+                             "share": count / max(self.total, 1), "amount_share": amount / (self.total_amount or 1.0)})
+
+    def risk_levels(self, sigma=None) -> dict:
+        """Transactions per RI risk level (the cut-offs of composite_risk_index) at weights sigma."""
+        count, _ = self._ri(SIGMAS if sigma is None else sigma).at_least(np.asarray(RISK_LEVELS))
+        high, suspicious, normal = (int(c) for c in count)
+        return {"High Risk": high, "Suspicious Risk": suspicious - high, "Normal Risk": normal - suspicious,
+                "Low Risk": self.total - normal}
+
+
+class WhatIf:
+    """Per-window engines over one RiskIndex."""
+
+    def __init__(self, index):
+        self.index = index
+        amount = index.data["amount"].astype(np.float64)
+        self.A0 = float(np.nanpercentile(amount, CAP_PERCENTILE)) if len(amount) else 1.0
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def window(self, start_step=None, end_step=None) -> WindowWhatIf:
+        """Engine for steps [start_step, end_step] (all steps if either is None), built once per window."""
+        idx = self.index
+        key = a, b = idx.window_rows(start_step, end_step)
+        with self._lock:
+            hit = self._windows.get(key)
+            if hit is not None:
+                self._windows.move_to_end(key)
+                return hit
+        engine = WindowWhatIf(idx.prob[a:b], idx.data["amount"][a:b], self.A0, (start_step, end_step))
+        with self._lock:
+            self._windows[key] = engine
+            while len(self._windows) > MAX_WINDOWS:
+                self._windows.popitem(last=False)
+        return engine
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_whatif(path: str) -> WhatIf:
+    """Cached WhatIf for the predictions file, rebuilt whenever its risk index is."""
+    index = get_risk_index(path)
+    with _cache_lock:
+        hit = _cache.get(path)
+        if hit is not None and hit.index is index:
+            return hit
+        engine = WhatIf(index)
+        _cache[path] = engine
+    return engine